@@ -1,24 +1,32 @@
+import time
+startup_time = time.perf_counter()  # For --profile-startup
+
 import os
 import sys
-import json
-import cv2
-
-import numpy as np
-import matplotlib.pyplot as plt
+import subprocess
 
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput, QMediaDevices, QAudioSink
+from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PyQt6.QtMultimediaWidgets import QVideoWidget
 
-from pydub import AudioSegment
-from io import BytesIO
-from multiprocessing import Process
-
-from convert_subs import*
-from gen_subs import *
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Process, Queue
+from queue import Empty
+
+# Only light modules are imported up front: cv2 is imported when a video is
+# opened, and gen_subs/subs_server leave whisper (and torch) to the
+# transcription processes, so the window appears without waiting for them
+from cues import Cue, ms_to_timecode, sidecar_path, SIDECAR_EXTENSIONS
+from convert_subs import load_subtitle, export_subtitle
+from lazy_subs import LazyCueList, cue_times, sort_cues, should_load_lazily
+from waveform import peaks_for_video
+from edit_journal import EditJournal, journal_path, cue_values, add_op, delete_op, edit_op, apply_op, sorted_row, find_cue
+from gen_subs import format_timings, MODEL_SIZES
+from subs_server import serve, submit_job, shutdown_server
 
 if getattr(sys, 'frozen', False):
     runpath = os.path.dirname(sys.executable)
@@ -27,12 +35,150 @@ else:
 
 max_subtitle_length = 200
 
+# Subtitle file kept next to each video: "json", or "cues" for the compact
+# binary sidecar (JSON then stays available through Export)
+SIDECAR_FORMAT = os.environ.get("SUBTITLER_SIDECAR", "json")
+
+# Edits are saved once this long has passed without another one
+AUTOSAVE_DELAY_MS = 1000
+
+# Helper functions to convert between milliseconds and QTime
+def ms_to_qtime(ms):
+    return QTime(0, 0, 0).addMSecs(int(ms))
+
+def qtime_to_ms(qtime):
+    return QTime(0, 0, 0).msecsTo(qtime)
+
+def write_sidecar(subtitles, file_path):
+    """
+    Write subtitles to file_path atomically: export_subtitle streams the cues
+    to a temporary file that then replaces the old one, so a crash never
+    leaves a half-written sidecar. subtitles must not map file_path (see
+    VideoPlayer.releaseSidecar).
+    """
+    export_subtitle(subtitles, file_path)
+    print(f"Subtitles saved to {file_path}")
+
+def snapshot_cues(subtitles):
+    """Copy of subtitles whose cues are copies too, for writing on another thread."""
+    if isinstance(subtitles, LazyCueList):
+        return subtitles.snapshot()
+    return [cue.copy() for cue in subtitles]
+
 def crop_subtitle(subtitle):
     if len(subtitle) >= max_subtitle_length:
         return subtitle[:max_subtitle_length] + "..."
     else:
         return subtitle
 
+class SubtitleIndex:
+    """
+    Sorted index of subtitle times in integer milliseconds for playhead lookups.
+
+    Lookups bisect on the start times and try the previous hit and its
+    neighbour first, so sequential playback is usually resolved without a
+    search. Rows refer to positions in the subtitle list the index was built
+    from, which does not need to be sorted.
+
+    Edits update the index in place: insert, remove and move mirror the same
+    change to the list, bisecting the affected entry into place, so an edit
+    costs a pass over the row numbers instead of a full rebuild.
+    """
+    def __init__(self):
+        self.rebuild([])
+
+    def rebuild(self, subtitles):
+        # cue_times reads lazily loaded cues from the offset index, without decoding text
+        spans = sorted(
+            (start, row, end)
+            for row, (start, end) in enumerate(cue_times(subtitles))
+        )
+        self.starts = [span[0] for span in spans]
+        self.rows = [span[1] for span in spans]
+        self.ends = [span[2] for span in spans]
+
+        # Running maximum of the end times, so overlapping subtitles are still found
+        self.max_ends = []
+        max_end = -1
+        for end in self.ends:
+            max_end = max(max_end, end)
+            self.max_ends.append(max_end)
+
+        self.last_hit = None
+
+    def shift_rows(self, row, delta):
+        """Renumber entries from row on by delta, after rows were inserted or removed."""
+        self.rows = [r + delta if r >= row else r for r in self.rows]
+
+    def place(self, row, start, end):
+        """Bisect an entry for row into place by (start, row)."""
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start and self.rows[i] < row:
+            i += 1
+        self.starts.insert(i, start)
+        self.rows.insert(i, row)
+        self.ends.insert(i, end)
+        self.max_ends.insert(i, end)
+        self.refresh_max_ends(i)
+
+    def take(self, row):
+        """Remove row's entry."""
+        i = self.rows.index(row)
+        del self.starts[i], self.rows[i], self.ends[i], self.max_ends[i]
+        self.refresh_max_ends(i)
+
+    def refresh_max_ends(self, i):
+        """Recompute the running maximum of the end times from entry i until it agrees again."""
+        max_end = self.max_ends[i - 1] if i > 0 else -1
+        for j in range(i, len(self.ends)):
+            max_end = max(max_end, self.ends[j])
+            if j > i and self.max_ends[j] == max_end:
+                break
+            self.max_ends[j] = max_end
+        self.last_hit = None
+
+    def insert(self, row, subtitle):
+        """Add a subtitle that was just inserted into the list at row."""
+        self.shift_rows(row, 1)
+        self.place(row, subtitle.start, subtitle.end)
+
+    def remove(self, row):
+        """Drop the subtitle that was just deleted from row."""
+        self.take(row)
+        self.shift_rows(row + 1, -1)
+
+    def move(self, row, new_row, subtitle):
+        """Re-index a subtitle that was edited at row and has since moved to new_row."""
+        self.remove(row)
+        self.insert(new_row, subtitle)
+
+    def covers(self, i, position):
+        """True if entry i is the earliest-starting subtitle covering position."""
+        return (
+            self.starts[i] <= position <= self.ends[i]
+            and (i == 0 or self.max_ends[i - 1] < position)
+        )
+
+    def find(self, position):
+        """Return the row of the subtitle at position (ms), or None."""
+        if self.last_hit is not None:
+            for i in (self.last_hit, self.last_hit + 1):
+                if i < len(self.starts) and self.covers(i, position):
+                    self.last_hit = i
+                    return self.rows[i]
+
+        # Walk back from the last subtitle starting at or before position while an
+        # earlier one could still reach it, keeping the earliest that does
+        i = bisect_right(self.starts, position) - 1
+        hit = None
+        while i >= 0 and self.max_ends[i] >= position:
+            if self.ends[i] >= position:
+                hit = i
+            i -= 1
+
+        self.last_hit = hit
+        return self.rows[hit] if hit is not None else None
+
 class SpinnerDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -50,8 +196,8 @@ class SpinnerDialog(QDialog):
 
         # Create and set up the animated spinner
         self.spinnerLabel = QLabel("Generating AI Subs...")
-        spinner_font = QFont(self.fonts.font)
-        spinner_font.setPointSize(24)
+        self.spinnerLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        spinner_font = FontRegistry.font("sans", 24)
         self.spinnerLabel.setFont(spinner_font)
         layout.addWidget(self.spinnerLabel, alignment=Qt.AlignmentFlag.AlignCenter)
 
@@ -73,6 +219,12 @@ class SpinnerDialog(QDialog):
 
         self.setLayout(layout)
 
+    def setProgress(self, progress):
+        """Show how much of the file has been transcribed, as a 0-1 fraction."""
+        if progress is None:
+            return
+        self.spinnerLabel.setText(f"Generating AI Subs...\n{int(progress * 100)}%")
+
     def styleButton(self, button):
         width = 100 # Doubled the width for Sub IN/OUT buttons
         height = 40
@@ -101,47 +253,123 @@ class SpinnerDialog(QDialog):
         event.ignore()
 
 class SubtitleWorker:
-    def __init__(self, file_path):
+    # Long-lived transcription server shared by every job in this session
+    server_process = None
+
+    def __init__(self, file_path, settings=None):
         self.file_path = file_path
+        self.settings = dict(settings or {}, sidecar=SIDECAR_FORMAT)
         self.process = None
+        self.messages = Queue()
+
+    @classmethod
+    def ensure_server(cls, model_name="medium", quantize=False):
+        """
+        Start the transcription server on first use, with the model the first
+        job asks for, so it stays loaded between jobs. If another server is
+        already running, this process exits straight away and jobs go to the
+        existing one.
+        """
+        if cls.server_process is None or not cls.server_process.is_alive():
+            # Not a daemon: the server may start its own pool of transcription workers
+            cls.server_process = Process(target=serve, kwargs={"model_name": model_name, "quantize": quantize})
+            cls.server_process.start()
+
+    @classmethod
+    def stop_server(cls):
+        if cls.server_process and cls.server_process.is_alive():
+            shutdown_server()
+            cls.server_process.join(timeout=5)
+            if cls.server_process.is_alive():
+                cls.server_process.terminate()
+
+    @staticmethod
+    def run(file_path, messages, settings):
+        """Child process: submit the job and relay the server's replies to the GUI."""
+        result = submit_job(file_path, settings=settings, on_message=messages.put)
+        messages.put(result)
 
     def start(self):
-        self.process = Process(target=make_subtitles, args=(self.file_path,))
+        self.ensure_server(self.settings.get("model_name") or "medium", self.settings.get("quantize", False))
+        # The job is submitted from a child process so the GUI thread never blocks on the socket
+        self.process = Process(target=SubtitleWorker.run, args=(self.file_path, self.messages, self.settings))
         self.process.start()
 
+    def poll_messages(self):
+        """Return every reply received so far without blocking."""
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except Empty:
+                return messages
+
     def is_finished(self):
         # Check if the process has finished
         return self.process and not self.process.is_alive()
 
     def stop(self):
+        # Stops waiting for the job; the server finishes it and stays warm for the next one
         if self.process:
             self.process.terminate()
             self.process.join()
             print("Process terminated.")
 
+class FontRegistry:
+    """
+    Process-wide registry for the bundled fonts.
+
+    The font files are registered with QFontDatabase once, on first use, and
+    QFont objects are cached by (role, point size, weight). Callers always get
+    their own copy, so changing it never affects anyone else.
+    """
+    font_files = {
+        "sans": "Louis George Cafe.ttf",
+        "mono": "ConsolaMono-Book.ttf"
+    }
+    families = None
+    fonts = {}
+    # Milliseconds spent registering each font file
+    timings = {}
+
+    @classmethod
+    def register(cls):
+        if cls.families is not None:
+            return
+
+        cls.families = {}
+        for role, file_name in cls.font_files.items():
+            start = time.perf_counter()
+            font_id = QFontDatabase.addApplicationFont(os.path.join(runpath, "fonts", file_name))
+            cls.timings[file_name] = (time.perf_counter() - start) * 1000
+
+            if font_id == -1:
+                print("Failed to load the custom font. Falling back to default.")
+                cls.families[role] = QApplication.font().family()
+            else:
+                cls.families[role] = QFontDatabase.applicationFontFamilies(font_id)[0]
+
+        print(f"Registered fonts in {sum(cls.timings.values()):.1f} ms")
+
+    @classmethod
+    def font(cls, role="sans", point_size=None, weight=None):
+        key = (role, point_size, weight)
+        font = cls.fonts.get(key)
+        if font is None:
+            cls.register()
+            font = QFont(cls.families[role])
+            if point_size is not None:
+                font.setPointSize(point_size)
+            if weight is not None:
+                font.setWeight(weight)
+            cls.fonts[key] = font
+        return QFont(font)
+
 class ConfigureFonts():
     def __init__(self):
-        # Load and set the custom font
-        font_id = QFontDatabase.addApplicationFont(
-            os.path.join(runpath, "fonts", "Louis George Cafe.ttf")
-        )
-        if font_id == -1:
-            print("Failed to load the custom font. Falling back to default.")
-            font_family = QApplication.font().family()
-        else:
-            font_family = QFontDatabase.applicationFontFamilies(font_id)[0]
-        self.font = QFont(font_family)
-
-        # Load and set the custom font
-        mono_font_id = QFontDatabase.addApplicationFont(
-            os.path.join(runpath, "fonts", "ConsolaMono-Book.ttf")
-        )
-        if mono_font_id == -1:
-            print("Failed to load the custom font. Falling back to default.")
-            mono_font_family = QApplication.font().family()
-        else:
-            mono_font_family = QFontDatabase.applicationFontFamilies(mono_font_id)[0]
-        self.mono_font = QFont(mono_font_family)
+        # Copies of the registry's default fonts; the files are only loaded once per process
+        self.font = FontRegistry.font("sans")
+        self.mono_font = FontRegistry.font("mono")
 
 class AddSubtitleDialog(QDialog):
     def __init__(self, start_time, default_end_time, parent=None):
@@ -151,11 +379,10 @@ class AddSubtitleDialog(QDialog):
 
         fonts = ConfigureFonts()
 
-        new_font = QFont(fonts.font)  # Copy the current font
-        new_font.setPointSize(24)
+        new_font = FontRegistry.font("sans", 24)
 
-        self.start_time_edit = QTimeEdit(QTime.fromString(start_time, 'hh:mm:ss.zzz'))
-        self.end_time_edit = QTimeEdit(QTime.fromString(default_end_time, 'hh:mm:ss.zzz'))
+        self.start_time_edit = QTimeEdit(ms_to_qtime(start_time))
+        self.end_time_edit = QTimeEdit(ms_to_qtime(default_end_time))
         self.start_time_edit.setDisplayFormat("hh:mm:ss.zzz")
         self.end_time_edit.setDisplayFormat("hh:mm:ss.zzz")
         self.end_time_edit.setFont(fonts.font)
@@ -189,8 +416,8 @@ class AddSubtitleDialog(QDialog):
 
     def getValues(self):
         return {
-            'start': self.start_time_edit.time().toString('hh:mm:ss.zzz'),
-            'end': self.end_time_edit.time().toString('hh:mm:ss.zzz'),
+            'start': qtime_to_ms(self.start_time_edit.time()),
+            'end': qtime_to_ms(self.end_time_edit.time()),
             'text': self.text_edit.toPlainText(),
             'auto_end': self.auto_end_checkbox.isChecked()
         }
@@ -206,21 +433,20 @@ class EditSubtitleDialog(QDialog):
         self.video_duration_ms = video_duration_ms  # Video duration in milliseconds
 
         # Create start time and end time editors
-        self.start_time_edit = QTimeEdit(QTime.fromString(subtitle['start'], 'hh:mm:ss.zzz'))
-        self.end_time_edit = QTimeEdit(QTime.fromString(subtitle['end'], 'hh:mm:ss.zzz'))
+        self.start_time_edit = QTimeEdit(ms_to_qtime(subtitle.start))
+        self.end_time_edit = QTimeEdit(ms_to_qtime(subtitle.end))
         self.start_time_edit.setDisplayFormat("hh:mm:ss.zzz")
         self.start_time_edit.setFont(fonts.font)
         self.end_time_edit.setDisplayFormat("hh:mm:ss.zzz")
         self.end_time_edit.setFont(fonts.font)
 
-        self.text_edit = QTextEdit(subtitle['text'])
+        self.text_edit = QTextEdit(subtitle.text)
         self.start_time_edit.setFixedWidth(150)
         self.end_time_edit.setFixedWidth(150)
         self.text_edit.setFixedWidth(400)
         self.text_edit.setFixedHeight(200)
 
-        new_font = QFont(fonts.font)
-        new_font.setPointSize(24)
+        new_font = FontRegistry.font("sans", 24)
         self.text_edit.setFont(new_font)
 
         # Create nudge buttons for start time
@@ -260,68 +486,259 @@ class EditSubtitleDialog(QDialog):
         self.setLayout(layout)
         self.text_edit.setFocus()
 
-    # Helper function to get milliseconds from QTime
-    def time_to_milliseconds(self, qtime):
-        return QTime(0, 0, 0).msecsTo(qtime)
-
-    def milliseconds_to_time(self, ms):
-        return QTime(0, 0, 0).addMSecs(int(ms))
-
     # Function to nudge start time back by 500ms
     def nudgeStartBack(self):
-        current_time_ms = self.time_to_milliseconds(self.start_time_edit.time())
+        current_time_ms = qtime_to_ms(self.start_time_edit.time())
         new_time_ms = max(current_time_ms - 500, 0)  # Ensure time doesn't go below 0
-        self.start_time_edit.setTime(self.milliseconds_to_time(new_time_ms))
+        self.start_time_edit.setTime(ms_to_qtime(new_time_ms))
 
     # Function to nudge start time forward by 500ms
     def nudgeStartForward(self):
-        current_time_ms = self.time_to_milliseconds(self.start_time_edit.time())
+        current_time_ms = qtime_to_ms(self.start_time_edit.time())
         new_time_ms = min(current_time_ms + 500, self.video_duration_ms)
-        self.start_time_edit.setTime(self.milliseconds_to_time(new_time_ms))
+        self.start_time_edit.setTime(ms_to_qtime(new_time_ms))
 
     # Function to nudge end time back by 500ms
     def nudgeEndBack(self):
-        current_time_ms = self.time_to_milliseconds(self.end_time_edit.time())
+        current_time_ms = qtime_to_ms(self.end_time_edit.time())
         new_time_ms = max(current_time_ms - 500, 0)  # Ensure time doesn't go below 0
-        self.end_time_edit.setTime(self.milliseconds_to_time(new_time_ms))
+        self.end_time_edit.setTime(ms_to_qtime(new_time_ms))
 
     # Function to nudge end time forward by 500ms
     def nudgeEndForward(self):
-        current_time_ms = self.time_to_milliseconds(self.end_time_edit.time())
+        current_time_ms = qtime_to_ms(self.end_time_edit.time())
         new_time_ms = min(current_time_ms + 500, self.video_duration_ms)
-        self.end_time_edit.setTime(self.milliseconds_to_time(new_time_ms))
+        self.end_time_edit.setTime(ms_to_qtime(new_time_ms))
 
     def getValues(self):
-        return {
-            'start': self.start_time_edit.time().toString('hh:mm:ss.zzz'),
-            'end': self.end_time_edit.time().toString('hh:mm:ss.zzz'),
-            'text': self.text_edit.toPlainText()
-        }
+        return Cue(
+            qtime_to_ms(self.start_time_edit.time()),
+            qtime_to_ms(self.end_time_edit.time()),
+            self.text_edit.toPlainText()
+        )
 
-class SubtitleWidget(QWidget):
-    def __init__(self, start, end, text):
-        super().__init__()
-        layout = QVBoxLayout()
-        layout.setSpacing(5)
+class SubtitleListModel(QAbstractListModel):
+    """
+    List model over the editor's subtitle cues.
 
-        self.fonts = ConfigureFonts()
+    The model shares its list with VideoPlayer.subtitles; changes made through
+    these methods emit the matching row signals, so the view only repaints
+    what changed.
+    """
+    CueRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.subtitles = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.subtitles)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.subtitles):
+            return None
+        subtitle = self.subtitles[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return subtitle.text
+        if role == self.CueRole:
+            return subtitle
+        return None
+
+    def setSubtitles(self, subtitles):
+        self.beginResetModel()
+        self.subtitles = subtitles
+        self.endResetModel()
+
+    def refresh(self):
+        """Signal that rows were reordered in place."""
+        self.layoutAboutToBeChanged.emit()
+        self.layoutChanged.emit()
+
+    def appendSubtitles(self, subtitles):
+        if not subtitles:
+            return
+        first = len(self.subtitles)
+        self.beginInsertRows(QModelIndex(), first, first + len(subtitles) - 1)
+        self.subtitles.extend(subtitles)
+        self.endInsertRows()
+
+    def removeSubtitle(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.subtitles[row]
+        self.endRemoveRows()
+
+    def moveSubtitle(self, row, new_row):
+        """Move the subtitle at row so that it ends up at new_row."""
+        if row == new_row:
+            return
+        # Qt wants the destination as the row to insert before, counted before the move
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), new_row + 1 if new_row > row else new_row)
+        self.subtitles.insert(new_row, self.subtitles.pop(row))
+        self.endMoveRows()
+
+    def subtitleChanged(self, row):
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+class SubtitleDelegate(QStyledItemDelegate):
+    """
+    Paints a subtitle row (timecodes above the text) directly instead of
+    building a widget per row, so only visible rows cost anything.
+    """
+    padding = 8
+    spacing = 5
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.time_font = FontRegistry.font("mono")
+        self.time_font.setPixelSize(14)
+        self.text_font = FontRegistry.font("sans", weight=QFont.Weight.Bold)
+        self.text_font.setPixelSize(16)
+
+        self.time_metrics = QFontMetrics(self.time_font)
+        self.text_metrics = QFontMetrics(self.text_font)
+
+        # Wrapped text heights keyed by (text, width)
+        self.height_cache = {}
+
+    def textWidth(self, option):
+        view = self.parent()
+        width = view.viewport().width() if view is not None else option.rect.width()
+        return max(width - 2 * self.padding, 1)
+
+    def textHeight(self, text, width):
+        key = (text, width)
+        height = self.height_cache.get(key)
+        if height is None:
+            if len(self.height_cache) > 10000:
+                self.height_cache.clear()
+            height = self.text_metrics.boundingRect(
+                0, 0, width, 100000, Qt.TextFlag.TextWordWrap.value, text
+            ).height()
+            self.height_cache[key] = height
+        return height
+
+    def sizeHint(self, option, index):
+        subtitle = index.data(SubtitleListModel.CueRole)
+        width = self.textWidth(option)
+        text_height = self.textHeight(crop_subtitle(subtitle.text.strip()), width)
+        height = 2 * self.padding + self.time_metrics.height() + self.spacing + text_height
+        return QSize(width + 2 * self.padding, height)
+
+    def paint(self, painter, option, index):
+        subtitle = index.data(SubtitleListModel.CueRole)
+        painter.save()
+
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+
+        rect = option.rect.adjusted(self.padding, self.padding, -self.padding, -self.padding)
+
+        painter.setFont(self.time_font)
+        painter.setPen(QColor('gray'))
+        painter.drawText(
+            rect, (Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop).value,
+            f'{ms_to_timecode(subtitle.start)} --> {ms_to_timecode(subtitle.end)}'
+        )
 
-        self.start_label = QLabel(f'{start} --> {end}')
-        self.start_label.setFont(self.fonts.mono_font)
-        self.subtitle_label = QLabel(text.strip())
-        self.subtitle_label.setFont(self.fonts.font)
-        self.subtitle_label.setWordWrap(True)
+        rect.setTop(rect.top() + self.time_metrics.height() + self.spacing)
+        painter.setFont(self.text_font)
+        painter.setPen(QColor('white'))
+        painter.drawText(
+            rect, (Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop).value | Qt.TextFlag.TextWordWrap.value,
+            crop_subtitle(subtitle.text.strip())
+        )
 
-        self.start_label.setStyleSheet("font-size: 14px; color: gray;")
-        self.subtitle_label.setStyleSheet("font-size: 16px; font-weight: bold; color: white;")
+        painter.restore()
 
-        layout.addWidget(self.start_label)
-        layout.addWidget(self.subtitle_label)
+class WaveformWidget(QWidget):
+    """
+    Scrolling waveform timeline. Peaks come from a waveform.PeakPyramid, so a
+    repaint only reduces about two buckets per pixel however long the file
+    is. Subtitle spans are shaded behind the waveform, the wheel zooms around
+    the cursor, and clicking asks to seek there.
+    """
+    seekRequested = pyqtSignal(int)
 
-        self.setLayout(layout)
+    MIN_SPAN_MS = 1000
+    DEFAULT_SPAN_MS = 30000
 
+    def __init__(self, subtitleIndex, parent=None):
+        super().__init__(parent)
+        self.subtitleIndex = subtitleIndex  # Sorted subtitle times to shade
+        self.pyramid = None
+        self.position = 0
+        self.viewStart = 0
+        self.viewSpan = self.DEFAULT_SPAN_MS
+        self.setFixedHeight(80)
+
+    def setPyramid(self, pyramid):
+        self.pyramid = pyramid
+        self.viewStart = 0
+        self.viewSpan = self.DEFAULT_SPAN_MS
+        self.update()
+
+    def setPosition(self, position):
+        self.position = position
+        # Page along so the playhead stays in view
+        if not self.viewStart <= position < self.viewStart + self.viewSpan:
+            self.viewStart = max(position - self.viewSpan // 10, 0)
+        self.update()
+
+    def msToX(self, ms):
+        return (ms - self.viewStart) * self.width() / self.viewSpan
+
+    def xToMs(self, x):
+        return int(self.viewStart + x * self.viewSpan / max(self.width(), 1))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        painter.fillRect(self.rect(), QColor("#222"))
+        view_end = self.viewStart + self.viewSpan
+
+        # Subtitle spans in view, starting with the one that may run into it from the left
+        starts, ends = self.subtitleIndex.starts, self.subtitleIndex.ends
+        first = max(bisect_right(starts, self.viewStart) - 1, 0)
+        last = bisect_right(starts, view_end)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(80, 120, 200, 90))
+        for i in range(first, last):
+            left = self.msToX(starts[i])
+            painter.drawRect(QRectF(left, 0, max(self.msToX(ends[i]) - left, 1), height))
+
+        if self.pyramid:
+            mins, maxs = self.pyramid.peaks(self.viewStart, view_end, width)
+            middle = height / 2
+            scale = (height / 2 - 2) / 127
+            tops = (middle - maxs * scale).tolist()
+            bottoms = (middle - mins * scale).tolist()
+            painter.setPen(QColor("#9cf"))
+            painter.drawLines([QLineF(x, top, x, bottom) for x, (top, bottom) in enumerate(zip(tops, bottoms))])
+
+        playhead = self.msToX(self.position)
+        painter.setPen(QColor("red"))
+        painter.drawLine(QLineF(playhead, 0, playhead, height))
+        painter.end()
+
+    def wheelEvent(self, event):
+        # Zoom around the time under the cursor
+        anchor = self.xToMs(event.position().x())
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        longest = max(self.pyramid.duration_ms if self.pyramid else 0, self.DEFAULT_SPAN_MS)
+        span = int(min(max(self.viewSpan * factor, self.MIN_SPAN_MS), longest))
+        self.viewStart = max(int(anchor - (anchor - self.viewStart) * span / self.viewSpan), 0)
+        self.viewSpan = span
+        self.update()
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.seekRequested.emit(self.xToMs(event.position().x()))
 
 class VideoPlayer(QWidget):
+    peaksLoaded = pyqtSignal(str, object)  # (video path, future of its peak pyramid)
+
     def __init__(self):
         super().__init__()
 
@@ -339,8 +756,7 @@ class VideoPlayer(QWidget):
         # Subtitle Display Box
         self.subtitleBox = QLabel("")
         self.subtitleBox.setStyleSheet("background-color: dark grey; color: white; padding: 5px;")
-        subtitle_font = self.fonts.font
-        subtitle_font.setPointSize(24)
+        subtitle_font = FontRegistry.font("sans", 24)
         self.subtitleBox.setFont(subtitle_font)
         self.subtitleBox.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.subtitleBox.setWordWrap(True)
@@ -386,6 +802,22 @@ class VideoPlayer(QWidget):
         genSubsButton.setFont(self.fonts.font)
         self.styleButton(genSubsButton, double_width=True)
 
+        # Transcription settings for Generate Subs; the server keeps each model warm once used
+        self.modelCombo = QComboBox()
+        self.modelCombo.addItems(MODEL_SIZES)
+        self.modelCombo.setCurrentText("medium")
+        self.modelCombo.setToolTip("Whisper model size: larger is more accurate and slower")
+        self.quantizeCheckbox = QCheckBox("int8")
+        self.quantizeCheckbox.setToolTip("Run the model with int8 dynamic quantization (faster on CPU)")
+        self.threadsSpin = QSpinBox()
+        self.threadsSpin.setRange(0, os.cpu_count() or 1)
+        self.threadsSpin.setSpecialValueText("Auto")
+        self.threadsSpin.setToolTip("Torch threads used for transcription")
+        self.languageCombo = QComboBox()
+        self.languageCombo.setEditable(True)  # Any Whisper language code can be typed in
+        self.languageCombo.addItems(("auto", "en", "es", "fr", "de", "it", "pt", "nl", "ja", "zh"))
+        self.languageCombo.setToolTip("Spoken language; auto detects it once per file")
+
         hideListButton = QPushButton("Hide List")
         hideListButton.clicked.connect(self.toggleSubtitleList)
         hideListButton.setFont(self.fonts.font)
@@ -395,8 +827,7 @@ class VideoPlayer(QWidget):
         # Timecode Label
         self.timecodeLabel = QLabel("00:00:00.000")
         self.timecodeLabel.setStyleSheet("background-color: dark grey; color: white; padding: 0 10px;")
-        timecode_font = QFont(self.fonts.mono_font)
-        timecode_font.setPointSize(24)
+        timecode_font = FontRegistry.font("mono", 24)
         self.timecodeLabel.setFont(timecode_font)
         self.timecodeLabel.setFixedHeight(50)
         self.timecodeLabel.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
@@ -420,6 +851,10 @@ class VideoPlayer(QWidget):
         buttonLayout.addWidget(forwardButton)
         # buttonLayout.addWidget(frameForwardButton)
         buttonLayout.addWidget(genSubsButton)
+        buttonLayout.addWidget(self.modelCombo)
+        buttonLayout.addWidget(self.quantizeCheckbox)
+        buttonLayout.addWidget(self.threadsSpin)
+        buttonLayout.addWidget(self.languageCombo)
         buttonLayout.addWidget(hideListButton)
 
         # Layout for transport buttons and timecode
@@ -428,7 +863,18 @@ class VideoPlayer(QWidget):
         bottomLayout.addWidget(self.timecodeLabel)
 
         # Subtitle Playlist
-        self.subtitleList = QListWidget()
+        self.subtitleModel = SubtitleListModel(self)
+        self.subtitleList = QListView()
+        self.subtitleList.setModel(self.subtitleModel)
+        self.subtitleList.setItemDelegate(SubtitleDelegate(self.subtitleList))
+        self.subtitleList.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.subtitleList.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.subtitleList.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        # Lay rows out in batches so huge lists don't stall the GUI thread
+        self.subtitleList.setLayoutMode(QListView.LayoutMode.Batched)
+        self.subtitleList.setBatchSize(200)
+        self.subtitleList.setResizeMode(QListView.ResizeMode.Adjust)  # Re-wrap rows when the panel resizes
+        self.subtitleList.doubleClicked.connect(self.editSubtitle)
 
         # Add and Delete buttons for subtitles
         addSubtitleButton = QPushButton("Add Subtitle")
@@ -459,6 +905,13 @@ class VideoPlayer(QWidget):
         self.splitter.addWidget(subtitleWidget)
         self.splitter.setSizes([800, 300])
 
+        # Waveform timeline; its peaks are computed in the background when a video opens
+        self.subtitleIndex = SubtitleIndex()  # Playhead lookups into self.subtitles
+        self.waveform = WaveformWidget(self.subtitleIndex)
+        self.waveform.seekRequested.connect(self.seekFromWaveform)
+        self.peakExecutor = ThreadPoolExecutor(max_workers=1)
+        self.peaksLoaded.connect(self.onPeaksLoaded)
+
 
 
         # Main layout
@@ -466,6 +919,7 @@ class VideoPlayer(QWidget):
         layout.addWidget(self.splitter)
         layout.addWidget(self.subtitleBox)
         # layout.addWidget(self.selectedSubtitleBox)
+        layout.addWidget(self.waveform)
         layout.addWidget(self.slider)
         layout.addLayout(bottomLayout)
         layout.setSpacing(10)
@@ -499,7 +953,21 @@ class VideoPlayer(QWidget):
 
         self.frame_rate = 25  # Default frame rate
         self.subtitles = []  # Store subtitles from JSON
+
+        # Debounced autosave: edits restart the timer, and the write runs on a
+        # single background thread so saves never overlap
+        self.autosaveTimer = QTimer(self)
+        self.autosaveTimer.setSingleShot(True)
+        self.autosaveTimer.setInterval(AUTOSAVE_DELAY_MS)
+        self.autosaveTimer.timeout.connect(self.autosave)
+        self.autosaveExecutor = ThreadPoolExecutor(max_workers=1)
+        self.pendingSave = None  # Future of the write in progress
+        self.subtitlesDirty = False
+        self.generating = False  # Autosave waits while subtitles are being generated
+        self.journal = EditJournal()  # Undo/redo history and crash journal
         self.currentSubtitle = ""
+        self.displayedSubtitleKey = None  # (text, width, height) last shown in the subtitle box
+        self.fitCache = {}  # Fitted (point size, text) for the subtitle box
         self.selectedSubtitle = None
         # self.allow_snapping = False
 
@@ -507,6 +975,11 @@ class VideoPlayer(QWidget):
         space_shortcut = QShortcut(QKeySequence("Space"), self)
         space_shortcut.activated.connect(self.playPause)  # Bind the space bar to play/pause
 
+        undo_shortcut = QShortcut(QKeySequence("Ctrl+Z"), self)
+        undo_shortcut.activated.connect(self.undoEdit)
+        redo_shortcut = QShortcut(QKeySequence("Ctrl+Shift+Z"), self)
+        redo_shortcut.activated.connect(self.redoEdit)
+
         self.subtitleBox.mousePressEvent = self.onSubtitleClicked  # Link mouse press event to single click handler
         self.subtitleBox.mouseDoubleClickEvent = self.onSubtitleDoubleClicked
 
@@ -536,16 +1009,29 @@ class VideoPlayer(QWidget):
     def adjustFontSizeToFit(self, text):
         """
         Adjust the font size of the subtitle text to fit within the QLabel box.
-        Reset the font size to 24 before adjusting, and then shrink if necessary.
+        The text is split over two lines and the largest size from 24 down to 8
+        that fits is used; results are cached by text, box size and font family.
         """
         font = self.subtitleBox.font()
-        font.setPointSize(24)  # Reset to default size (24)
-        self.subtitleBox.setFont(font)  # Apply the reset font to the subtitle box
-        font_metrics = QFontMetrics(font)
-
         available_width = self.subtitleBox.width() - 10  # Adjust for padding
         available_height = self.subtitleBox.height()
 
+        key = (text, available_width, available_height, font.family())
+        fit = self.fitCache.get(key)
+        if fit is None:
+            fit = self.fitText(text, font, available_width, available_height)
+            if len(self.fitCache) > 1000:
+                self.fitCache.clear()
+            self.fitCache[key] = fit
+
+        point_size, two_line_text = fit
+        if font.pointSize() != point_size:
+            font.setPointSize(point_size)
+            self.subtitleBox.setFont(font)
+        self.subtitleBox.setText(two_line_text)
+
+    def fitText(self, text, font, available_width, available_height):
+        """Return (point size, two-line text) for the largest size that fits the box."""
         # Initialize line1 and line2
         line1 = text
         line2 = ""
@@ -562,26 +1048,28 @@ class VideoPlayer(QWidget):
             # If only one word, use it as is
             two_line_text = text
 
-        # Check if the two-line text fits
-        while font.pointSize() > 8:  # Minimum font size to avoid unreadable text
-            font_metrics = QFontMetrics(font)
+        font = QFont(font)
 
-            # Calculate the width and height of the two-line text
+        def fits(point_size):
+            font.setPointSize(point_size)
+            font_metrics = QFontMetrics(font)
             text_width = max(font_metrics.horizontalAdvance(line1), font_metrics.horizontalAdvance(line2))
             text_height = font_metrics.lineSpacing() * 2 if line2 else font_metrics.lineSpacing()
+            return text_width <= available_width and text_height <= available_height
+
+        # Binary search for the largest size from 24 down to 9 that fits; text that
+        # still doesn't fit uses the minimum size of 8 to stay readable
+        low, high = 9, 24
+        best = 8
+        while low <= high:
+            mid = (low + high) // 2
+            if fits(mid):
+                best = mid
+                low = mid + 1
+            else:
+                high = mid - 1
 
-            # If the two-line text fits within the box, stop reducing the font size
-            if text_width <= available_width and text_height <= available_height:
-                self.subtitleBox.setFont(font)
-                self.subtitleBox.setText(two_line_text)
-                return
-
-            # If it doesn't fit, reduce the font size
-            font.setPointSize(font.pointSize() - 1)
-
-        # If the text is still too big after reducing, just set the text with the smallest font size
-        self.subtitleBox.setFont(font)
-        self.subtitleBox.setText(two_line_text)
+        return best, two_line_text
 
     def question_box(self, title, question):
         reply = QMessageBox.question(
@@ -617,6 +1105,7 @@ class VideoPlayer(QWidget):
             self.mediaPlayer.setSource(QUrl.fromLocalFile(fileName))
             self.playButton.setEnabled(True)
 
+            import cv2
             video = cv2.VideoCapture(fileName)
             self.frame_rate = video.get(cv2.CAP_PROP_FPS)
 
@@ -627,8 +1116,11 @@ class VideoPlayer(QWidget):
             self.duration = (frame_count / self.frame_rate) * 1000 if self.frame_rate > 0 else 0
 
             video.release()
+            self.loadWaveform(fileName)
 
-            self.subtitleFilePath = os.path.splitext(fileName)[0] + ".json"
+            # Finish saving the previous video's subtitles before switching
+            self.flushAutosave()
+            self.subtitleFilePath = sidecar_path(fileName, SIDECAR_FORMAT)
 
             # Clear the subtitle playlist when loading a new video
             self.subtitles = []  # Clear the subtitle data
@@ -637,6 +1129,13 @@ class VideoPlayer(QWidget):
             if os.path.exists(self.subtitleFilePath):
                 self.loadSubtitles()
             else:
+                # Carry over a sidecar saved in the other format, if there is one
+                for sidecar in SIDECAR_EXTENSIONS:
+                    other_path = sidecar_path(fileName, sidecar)
+                    if os.path.exists(other_path):
+                        self.subtitles = load_subtitle(other_path)
+                        self.populateSubtitleList()
+                        break
                 self.saveSubtitles()
 
     def importSubtitles(self):
@@ -657,12 +1156,12 @@ class VideoPlayer(QWidget):
             self,
             "Import subtitle File",
             default_path,
-            "Subtitle Files (*.srt *.vtt *.ass *.sbv *.stl)",
+            "Subtitle Files (*.srt *.vtt *.ass *.sbv *.stl *.json *.cues)",
             options=QFileDialog.Option.DontUseNativeDialog
         )
         if fileName:
 
-            if len(self.subtitleList) > 0:
+            if self.subtitleModel.rowCount() > 0:
                 if not self.question_box(
                     "Overwrite Subtitles",
                     "Subtitles exist, overwrite?"
@@ -670,10 +1169,10 @@ class VideoPlayer(QWidget):
                     return
 
             # Clear the subtitle playlist when loading a new video
-            self.subtitles = load_subtitle(fileName)
+            self.subtitles = load_subtitle(fileName, lazy=should_load_lazily(fileName))
             self.populateSubtitleList()  # Clear the UI list
 
-            self.subtitleFilePath = os.path.splitext(self.currentFilePath)[0] + ".json"
+            self.subtitleFilePath = sidecar_path(self.currentFilePath, SIDECAR_FORMAT)
             self.saveSubtitles()
 
     def exportSubtitles(self):
@@ -685,7 +1184,7 @@ class VideoPlayer(QWidget):
             self,
             "Save Subtitle File",
             os.path.splitext(self.currentFilePath)[0],  # Set default file name
-            "SRT (*.srt);;VTT (*.vtt);;ASS (*.ass);;SBV (*.sbv);;STL (*.stl)",  # File format options
+            "SRT (*.srt);;VTT (*.vtt);;ASS (*.ass);;SBV (*.sbv);;STL (*.stl);;JSON (*.json)",  # File format options
             options=QFileDialog.Option.DontUseNativeDialog
         )
 
@@ -701,33 +1200,23 @@ class VideoPlayer(QWidget):
                 fileName += ".sbv"
             elif selectedFilter == "STL (*.stl)" and not fileName.lower().endswith(".stl"):
                 fileName += ".stl"
+            elif selectedFilter == "JSON (*.json)" and not fileName.lower().endswith(".json"):
+                fileName += ".json"
 
             export_subtitle(self.subtitles, fileName)
 
 
     def populateSubtitleList(self):
         """
-        Populate the subtitle list widget from the subtitles.
+        Point the subtitle list at self.subtitles after it has been replaced.
         Clears the list if no subtitles are available.
         """
-        self.subtitleList.clear()  # Clear the list first
-        for index, subtitle in enumerate(self.subtitles):
-            widget = SubtitleWidget(
-                subtitle["start"],
-                subtitle["end"],
-                crop_subtitle(subtitle["text"])
-            )
-            item = QListWidgetItem(self.subtitleList)
-            item.setSizeHint(widget.sizeHint())
-            item.setForeground(QColor('white'))
-            self.subtitleList.setItemWidget(item, widget)
-
-        # Ensure signals are connected properly
-        try:
-            self.subtitleList.itemDoubleClicked.disconnect(self.editSubtitle)
-        except TypeError:
-            pass
-        self.subtitleList.itemDoubleClicked.connect(self.editSubtitle)
+        # Lazily loaded lists decode text only for rows that are laid out, so
+        # size rows uniformly rather than measuring every one up front
+        self.subtitleList.setUniformItemSizes(isinstance(self.subtitles, LazyCueList))
+        self.subtitleModel.setSubtitles(self.subtitles)
+        self.rebuildSubtitleIndex()
+        self.journal.clear_history()  # Undo can't reach back into a replaced list
 
     def onSubtitleClicked(self, event):
         """
@@ -757,32 +1246,38 @@ class VideoPlayer(QWidget):
         result = dialog.exec()
 
         if result == QDialog.DialogCode.Accepted:
-            updated_values = dialog.getValues()
+            updated = dialog.getValues()
+            before = cue_values(subtitle)
             # Update the current subtitle with the new values
-            subtitle.update(updated_values)
-            self.saveSubtitles()  # Save the updated subtitles
-            self.populateSubtitleList()
-
-    def highlightCurrentSubtitle(self, position):
-        """
-        Highlight the current subtitle in the subtitle list based on the playhead position.
-        """
-        current_time = QTime(0, 0, 0).addMSecs(position)
-        for index, subtitle in enumerate(self.subtitles):
-            start_time = QTime.fromString(subtitle['start'], 'hh:mm:ss.zzz')
-            end_time = QTime.fromString(subtitle['end'], 'hh:mm:ss.zzz')
-            if start_time <= current_time <= end_time:
-                self.subtitleList.setCurrentRow(index)
-                break
+            subtitle.start, subtitle.end, subtitle.text = updated.start, updated.end, updated.text
+            row = self.subtitles.index(subtitle)
+            self.subtitleModel.subtitleChanged(row)
+            self.subtitlesEdited(row, before)  # Autosave the updated subtitles
 
     def loadSubtitles(self):
         """
-        Load subtitles from the JSON file.
+        Load subtitles from the sidecar file (JSON or binary cues). Very large
+        files are memory-mapped and their cue text decoded only when needed.
         """
         if self.subtitleFilePath:
             try:
-                with open(self.subtitleFilePath, 'r') as file:
-                    self.subtitles = json.load(file)
+                self.subtitles = load_subtitle(
+                    self.subtitleFilePath, lazy=should_load_lazily(self.subtitleFilePath)
+                )
+                self.openJournal()
+                recovered = self.journal.recovered
+                if recovered and self.question_box(
+                    "Recover Edits",
+                    f"Found {len(recovered)} unsaved edits from the last session. Recover them?"
+                ):
+                    # Replay the journal onto the last saved sidecar, then save the result
+                    for ops in recovered:
+                        for op in ops:
+                            apply_op(self.subtitles, op)
+                    self.populateSubtitleList()
+                    self.saveSubtitles()
+                else:
+                    self.journal.checkpoint(self.journal.position())
                     self.populateSubtitleList()
             except Exception as e:
                 print(f"Error loading subtitles: {e}")
@@ -812,8 +1307,8 @@ class VideoPlayer(QWidget):
         Add a new subtitle, then save the subtitles to the JSON file.
         """
         current_timecode = self.mediaPlayer.position()
-        start_time = QTime(0, 0, 0).addMSecs(current_timecode).toString('hh:mm:ss.zzz')
-        default_end_time = QTime(0, 0, 0).addMSecs(current_timecode + 2000).toString('hh:mm:ss.zzz')
+        start_time = current_timecode
+        default_end_time = current_timecode + 2000
 
         add_subtitle_dialog = AddSubtitleDialog(start_time, default_end_time, self)
         result = add_subtitle_dialog.exec()
@@ -825,86 +1320,235 @@ class VideoPlayer(QWidget):
 
             if values['auto_end']:
                 num_words = len(text.split())
-                end_time_ms = current_timecode + num_words * 1000
-                end_time = QTime(0, 0, 0).addMSecs(end_time_ms).toString('hh:mm:ss.zzz')
+                end_time = current_timecode + num_words * 1000
             else:
                 end_time = values['end']
 
-            new_subtitle = {"start": start_time, "end": end_time, "text": text}
-            self.subtitles.append(new_subtitle)
-            self.populateSubtitleList()
-            self.saveSubtitles()  # Save the updated subtitles
+            new_subtitle = Cue(start_time, end_time, text)
+            self.subtitleModel.appendSubtitles([new_subtitle])
+            self.subtitlesEdited(len(self.subtitles) - 1)  # Move it into place and autosave
 
     def deleteSubtitle(self):
         """
         Delete a subtitle, then save the subtitles to the JSON file.
         """
-        selected_row = self.subtitleList.currentRow()
+        selected_row = self.subtitleList.currentIndex().row()
         if selected_row >= 0:
-            del self.subtitles[selected_row]
-            self.populateSubtitleList()
-            self.saveSubtitles()  # Save the updated subtitles
-
-    # Helper function to get milliseconds from QTime
-    def time_to_milliseconds(self, qtime):
-        return QTime(0, 0, 0).msecsTo(qtime)
-
-    def milliseconds_to_time(self, ms):
-        return QTime(0, 0, 0).addMSecs(int(ms))
+            removed = self.subtitles[selected_row]
+            self.subtitleModel.removeSubtitle(selected_row)
+            self.subtitlesEdited(ops=[delete_op(removed)], removed=selected_row)  # Autosave the updated subtitles
 
     def saveSubtitles(self):
         """
-        Save subtitles to the JSON file, ensuring no overlaps.
+        Save subtitles to the sidecar file, ensuring no overlaps.
         """
         if self.subtitleFilePath:
             try:
-                # Sort the subtitles by their start times (in milliseconds)
-                self.subtitles.sort(
-                    key=lambda sub: self.time_to_milliseconds(
-                        QTime.fromString(sub['start'], 'hh:mm:ss.zzz')
-                    )
-                )
+                # Sort the subtitles by their start times (in milliseconds), telling the
+                # list view only if the order actually changed. Times come from
+                # cue_times so lazily loaded text isn't decoded.
+                times = list(cue_times(self.subtitles))
+                if any(a[0] > b[0] for a, b in zip(times, times[1:])):
+                    sort_cues(self.subtitles)
+                    self.subtitleModel.refresh()
+                    times = list(cue_times(self.subtitles))
 
                 # Ensure no overlaps
-                for i in range(len(self.subtitles) - 1):
-                    current_sub = self.subtitles[i]
-                    next_sub = self.subtitles[i + 1]
-
-                    # Convert start and end times to milliseconds
-                    current_end_ms = self.time_to_milliseconds(
-                        QTime.fromString(current_sub['end'], 'hh:mm:ss.zzz')
-                    )
-                    next_start_ms = self.time_to_milliseconds(
-                        QTime.fromString(next_sub['start'], 'hh:mm:ss.zzz')
-                    )
-
+                for row, ((_, current_end), (next_start, _)) in enumerate(zip(times, times[1:])):
                     # If current subtitle's end time overlaps with the next subtitle's start time, truncate it
-                    if current_end_ms >= next_start_ms:
-                        truncated_end_ms = max(next_start_ms - 1, 0)  # Ensure end is slightly before the next start
-                        current_sub['end'] = self.milliseconds_to_time(truncated_end_ms).toString('hh:mm:ss.zzz')
-
-                # Save the subtitles to file
-                with open(self.subtitleFilePath, 'w') as file:
-                    json.dump(self.subtitles, file, indent=4)
-                print(f"Subtitles saved to {self.subtitleFilePath}")
+                    if current_end >= next_start:
+                        self.subtitles[row].end = max(next_start - 1, 0)  # Ensure end is slightly before the next start
+                        self.subtitleModel.subtitleChanged(row)
+
+                # Sorting and truncation move rows, so refresh the playhead index
+                self.rebuildSubtitleIndex()
+
+                # Save the subtitles to file; this covers any pending autosave
+                # and everything in the journal
+                self.cancelAutosave()
+                self.releaseSidecar()
+                self.openJournal()
+                sequence = self.journal.position()
+                write_sidecar(self.subtitles, self.subtitleFilePath)
+                self.journal.checkpoint(sequence)
 
             except Exception as e:
                 print(f"Error saving subtitles: {e}")
 
-    def selectSubtitle(self, item):
+    def settleSubtitle(self, row):
+        """
+        Move an added or edited subtitle to its place by start time, then fix
+        overlaps with its two neighbours, applying the same rules saveSubtitles
+        uses for the whole list. Every other row is already in order, so this
+        touches O(log n) subtitles. Returns the subtitle's new row and journal
+        operations for any neighbour that was truncated.
+        """
+        subtitle = self.subtitles[row]
+        new_row = sorted_row(self.subtitles, row)
+        self.subtitleModel.moveSubtitle(row, new_row)
+
+        truncated = []
+        if new_row > 0:
+            previous = self.subtitles[new_row - 1]
+            if previous.end >= subtitle.start:
+                before = cue_values(previous)
+                previous.end = max(subtitle.start - 1, 0)
+                truncated.append(edit_op(before, previous))
+                self.subtitleModel.subtitleChanged(new_row - 1)
+        if new_row + 1 < len(self.subtitles):
+            following = self.subtitles[new_row + 1]
+            if subtitle.end >= following.start:
+                subtitle.end = max(following.start - 1, 0)
+                self.subtitleModel.subtitleChanged(new_row)
+        return new_row, truncated
+
+    def subtitlesEdited(self, row=None, before=None, ops=(), removed=None):
+        """
+        Handle an edit to the subtitle list: settle the changed row (if any),
+        journal the edit, update the playhead index for the rows it touched
+        and schedule an autosave. before holds the row's [start, end, text]
+        before an edit, or None if the row was just added; ops are operations
+        already carried out, and removed is the row of a subtitle just deleted.
+        """
+        ops = list(ops)
+        if removed is not None:
+            self.subtitleIndex.remove(removed)
+        if row is not None:
+            new_row, truncated = self.settleSubtitle(row)
+            subtitle = self.subtitles[new_row]
+            if before is None:
+                self.subtitleIndex.insert(new_row, subtitle)
+                ops.append(add_op(subtitle))
+            else:
+                self.subtitleIndex.move(row, new_row, subtitle)
+                ops.append(edit_op(before, subtitle))
+            if truncated:
+                self.subtitleIndex.move(new_row - 1, new_row - 1, self.subtitles[new_row - 1])
+            ops.extend(truncated)
+        self.waveform.update()
+        self.openJournal()
+        self.journal.record(ops)
+        self.subtitlesDirty = True
+        self.autosaveTimer.start()  # Restarting the timer coalesces bursts of edits
+
+    def autosave(self):
+        """Write the subtitles in the background once edits have settled."""
+        if not self.subtitlesDirty or not self.subtitleFilePath:
+            return
+        if self.generating:
+            # The list is still filling up; onSubtitlesGenerated saves it all at the end
+            return
+        if self.pendingSave is not None and not self.pendingSave.done():
+            # Still writing the previous version; try again after another delay
+            self.autosaveTimer.start()
+            return
+        self.subtitlesDirty = False
+        self.releaseSidecar()
+        # The writer gets its own copy of the cues, taken here on the GUI thread,
+        # so edits can carry on meanwhile without changing what is written
+        self.pendingSave = self.autosaveExecutor.submit(
+            VideoPlayer.writeInBackground, snapshot_cues(self.subtitles), self.subtitleFilePath,
+            self.journal, self.journal.position()
+        )
+
+    @staticmethod
+    def writeInBackground(subtitles, file_path, journal, sequence):
+        """Save, then drop the journal entries the save now covers."""
+        try:
+            write_sidecar(subtitles, file_path)
+            journal.checkpoint(sequence)
+        except Exception as e:
+            print(f"Error saving subtitles: {e}")
+
+    def releaseSidecar(self):
+        """
+        Before the sidecar is replaced, make a list lazily loaded from it
+        decode its cues and close the mapping: Windows can't replace a file
+        that is still mapped. Lists loaded from other files keep their mapping.
+        """
+        if isinstance(self.subtitles, LazyCueList) and self.subtitles.maps(self.subtitleFilePath):
+            self.subtitles.detach()
+
+    def cancelAutosave(self):
+        """Drop a scheduled autosave and wait for one that is already writing."""
+        self.autosaveTimer.stop()
+        self.subtitlesDirty = False
+        if self.pendingSave is not None:
+            self.pendingSave.result()
+            self.pendingSave = None
+
+    def flushAutosave(self):
+        """Write any unsaved edits now, e.g. before switching videos or closing."""
+        dirty = self.subtitlesDirty
+        self.cancelAutosave()
+        if dirty and self.subtitleFilePath and not self.generating:
+            self.releaseSidecar()
+            VideoPlayer.writeInBackground(
+                self.subtitles, self.subtitleFilePath, self.journal, self.journal.position()
+            )
+
+    def closeEvent(self, event):
+        self.flushAutosave()
+        self.autosaveExecutor.shutdown()
+        self.peakExecutor.shutdown(wait=False, cancel_futures=True)
+        self.journal.close()
+        super().closeEvent(event)
+
+    def openJournal(self):
+        """Point the edit journal at the current sidecar file."""
+        path = journal_path(self.subtitleFilePath) if self.subtitleFilePath else None
+        if self.journal.path != path:
+            self.journal.open(path)
+
+    def undoEdit(self):
+        self.applyJournalOps(self.journal.undo())
+
+    def redoEdit(self):
+        self.applyJournalOps(self.journal.redo())
+
+    def applyJournalOps(self, ops):
+        """Apply undo/redo operations, then show the last subtitle they touched."""
+        if not ops:
+            return
+        row = None
+        for op in ops:
+            old_row = find_cue(self.subtitles, op["old"]) if op["op"] == "edit" else None
+            count = len(self.subtitles)
+            applied = apply_op(self.subtitles, op)
+            if applied is None:
+                print(f"Skipping {op['op']}: subtitle not found")
+                continue
+            row = applied
+            # Keep the playhead index in step, one row at a time
+            if len(self.subtitles) > count:
+                self.subtitleIndex.insert(row, self.subtitles[row])
+            elif len(self.subtitles) < count:
+                self.subtitleIndex.remove(row)
+            elif old_row is not None:
+                self.subtitleIndex.move(old_row, row, self.subtitles[row])
+        self.subtitleModel.setSubtitles(self.subtitles)
+        if row is not None and row < len(self.subtitles):
+            index = self.subtitleModel.index(row)
+            self.subtitleList.setCurrentIndex(index)
+            self.subtitleList.scrollTo(index)
+        self.waveform.update()
+        self.subtitlesDirty = True
+        self.autosaveTimer.start()
+
+    def selectSubtitle(self, index):
         """
         Select a subtitle from the playlist and display it in the selectedSubtitleBox.
         Disable snapping temporarily, and re-enable it after a short delay or when the video is playing.
         """
-        row = self.subtitleList.row(item)
+        row = index.row()
         subtitle = self.subtitles[row]
         self.selectedSubtitle = subtitle
 
-    def editSubtitle(self, item):
+    def editSubtitle(self, index):
         """
         Edit a subtitle, then save the subtitles to the JSON file.
         """
-        row = self.subtitleList.row(item)
+        row = index.row()
         subtitle = self.subtitles[row]
 
         dialog = EditSubtitleDialog(subtitle, video_duration_ms=self.duration)
@@ -912,9 +1556,10 @@ class VideoPlayer(QWidget):
 
         if result == QDialog.DialogCode.Accepted:
             updated_values = dialog.getValues()
+            before = cue_values(subtitle)
             self.subtitles[row] = updated_values
-            self.saveSubtitles()  # Save the updated subtitles
-            self.populateSubtitleList()
+            self.subtitleModel.subtitleChanged(row)
+            self.subtitlesEdited(row, before)  # Autosave the updated subtitles
 
     def playPause(self):
         """
@@ -954,6 +1599,7 @@ class VideoPlayer(QWidget):
         """Called while the slider is being moved."""
         self.slider.setValue(position)
         self.updateTimecode(position)
+        self.waveform.setPosition(position)
         current_position = self.mediaPlayer.position()
         self.highlightCurrentSubtitle(current_position)
         self.scrubAudio(position, scrubbing=True)  # Short scrubbing while sliding
@@ -1000,6 +1646,31 @@ class VideoPlayer(QWidget):
     def updatePosition(self, position):
         self.slider.setValue(position)
         self.updateTimecode(position)
+        self.waveform.setPosition(position)
+
+    def seekFromWaveform(self, position):
+        position = max(0, min(position, self.slider.maximum()))
+        self.mediaPlayer.setPosition(position)
+        self.updatePosition(position)
+
+    def loadWaveform(self, file_path):
+        """Load (or compute and cache) the video's peak pyramid off the GUI thread."""
+        self.waveform.setPyramid(None)
+        future = self.peakExecutor.submit(peaks_for_video, file_path)
+        # Emitted from the worker thread; Qt queues the slot onto the GUI thread
+        future.add_done_callback(lambda future: self.peaksLoaded.emit(file_path, future))
+
+    def onPeaksLoaded(self, file_path, future):
+        if file_path != self.currentFilePath:
+            return  # Another video was opened meanwhile
+        try:
+            self.waveform.setPyramid(future.result())
+        except Exception as e:
+            print(f"Error computing waveform: {e}")
+
+    def rebuildSubtitleIndex(self):
+        self.subtitleIndex.rebuild(self.subtitles)
+        self.waveform.update()
 
     def updateDuration(self, duration):
         self.slider.setRange(0, duration)
@@ -1011,26 +1682,23 @@ class VideoPlayer(QWidget):
         if position is None:
             position = self.mediaPlayer.position()
 
-        time = QTime(0, 0, 0).addMSecs(position)
-        timecode = f'{time.hour():02}:{time.minute():02}:{time.second():02}.{time.msec():03}'
-        self.timecodeLabel.setText(timecode)
+        self.timecodeLabel.setText(ms_to_timecode(position))
 
         self.currentSubtitle = self.getSubtitleForTime(position)
-        # self.subtitleBox.setText(self.currentSubtitle)
-        self.adjustFontSizeToFit(crop_subtitle(self.currentSubtitle))
-        self.subtitleBox.setText(crop_subtitle(self.currentSubtitle))
+
+        # Only re-fit the subtitle box when the cue or the box size has changed
+        display_key = (self.currentSubtitle, self.subtitleBox.width(), self.subtitleBox.height())
+        if display_key != self.displayedSubtitleKey:
+            self.displayedSubtitleKey = display_key
+            self.adjustFontSizeToFit(crop_subtitle(self.currentSubtitle))
 
     def highlightCurrentSubtitle(self, position):
         """
         Highlight the current subtitle in the subtitle list based on the playhead position.
         """
-        current_time = QTime(0, 0, 0).addMSecs(position)
-        for index, subtitle in enumerate(self.subtitles):
-            start_time = QTime.fromString(subtitle['start'], 'hh:mm:ss.zzz')
-            end_time = QTime.fromString(subtitle['end'], 'hh:mm:ss.zzz')
-            if start_time <= current_time <= end_time:
-                self.subtitleList.setCurrentRow(index)
-                break
+        row = self.subtitleIndex.find(position)
+        if row is not None and row != self.subtitleList.currentIndex().row():
+            self.subtitleList.setCurrentIndex(self.subtitleModel.index(row))
 
     def getSubtitleForTime(self, position, return_full_subtitle=False):
         """
@@ -1040,12 +1708,10 @@ class VideoPlayer(QWidget):
         :param return_full_subtitle: If True, return the full subtitle object. If False, return only the subtitle text.
         :return: The subtitle text or the full subtitle object.
         """
-        current_time = QTime(0, 0, 0).addMSecs(position)
-        for subtitle in self.subtitles:
-            start_time = QTime.fromString(subtitle['start'], 'hh:mm:ss.zzz')
-            end_time = QTime.fromString(subtitle['end'], 'hh:mm:ss.zzz')
-            if start_time <= current_time <= end_time:
-                return subtitle if return_full_subtitle else subtitle['text']
+        row = self.subtitleIndex.find(position)
+        if row is not None:
+            subtitle = self.subtitles[row]
+            return subtitle if return_full_subtitle else subtitle.text
         return None if return_full_subtitle else ""  # Return empty string for text if no subtitle is found
 
     def updateButtons(self, status=None):
@@ -1062,7 +1728,7 @@ class VideoPlayer(QWidget):
             print("No video loaded")
             return
 
-        if len(self.subtitleList) > 0:
+        if self.subtitleModel.rowCount() > 0:
             if not self.question_box(
                 "Overwrite Subtitles",
                 "Subtitles exist, overwrite?"
@@ -1071,13 +1737,22 @@ class VideoPlayer(QWidget):
 
         try:
             self.spinner = SpinnerDialog(self)  # Create the spinner dialog
+            # Subtitles stream into the list while the job runs, so keep the editor usable
+            self.spinner.setModal(False)
             self.spinner.show()  # Show the dialog
 
+            # Start from an empty list that fills up as chunks are transcribed
+            self.subtitleFilePath = sidecar_path(self.currentFilePath, SIDECAR_FORMAT)
+            self.subtitles = []
+            self.populateSubtitleList()
+            self.generationSucceeded = False
+            self.generating = True
+
             # Create the worker and start the external process
-            self.worker = SubtitleWorker(self.currentFilePath)
+            self.worker = SubtitleWorker(self.currentFilePath, self.transcriptionSettings())
             self.worker.start()
 
-            # Create a QTimer to check periodically if the process has finished
+            # Create a QTimer to check periodically for new subtitles and completion
             self.poll_timer = QTimer(self)
             self.poll_timer.timeout.connect(self.checkProcessCompletion)
             self.poll_timer.start(500)  # Check every 500 milliseconds
@@ -1085,33 +1760,99 @@ class VideoPlayer(QWidget):
             # Connect the cancel button to stop the worker
             self.spinner.cancelButton.clicked.connect(self.worker.stop)
         except Exception as e:
+            self.generating = False
             print(f"Error: {e}")
 
+    def transcriptionSettings(self):
+        return {
+            "model_name": self.modelCombo.currentText(),
+            "quantize": self.quantizeCheckbox.isChecked(),
+            "threads": self.threadsSpin.value() or None,
+            "language": self.languageCombo.currentText().strip().lower() or "auto"
+        }
+
     def checkProcessCompletion(self):
-        """Periodically checks if the subtitle generation process has finished."""
-        if self.worker.is_finished():
+        """Periodically picks up streamed subtitles and checks if the process has finished."""
+        # Check before draining: once the process is gone, everything it sent is in the queue
+        finished = self.worker.is_finished()
+        self.receiveWorkerMessages()
+
+        if finished:
             self.poll_timer.stop()  # Stop the timer
             self.onSubtitlesGenerated()  # Process completion callback
 
+    def receiveWorkerMessages(self):
+        """Append streamed subtitles to the list and update the spinner's progress."""
+        for message in self.worker.poll_messages():
+            status = message.get("status")
+            if status == "segments":
+                self.subtitleModel.appendSubtitles(message["subtitles"])
+                self.rebuildSubtitleIndex()
+                self.spinner.setProgress(message.get("progress"))
+            elif status == "done":
+                self.generationSucceeded = True
+                print(f"Subtitles generated: {format_timings(message['timings'])}")
+            elif status == "error":
+                print(f"Error generating subtitles: {message.get('error')}")
 
     def onSubtitlesGenerated(self):
+        self.generating = False
         try:
             self.spinner.accept()
 
-            self.subtitleFilePath = os.path.splitext(self.currentFilePath)[0] + ".json"
-
-            # Clear the subtitle playlist when loading a new video
-            self.subtitles = []
-            self.populateSubtitleList()
-
-            if os.path.exists(self.subtitleFilePath):
+            if self.generationSucceeded:
+                # The list already holds every subtitle, including any edits made while
+                # streaming, so write it back over the server's copy
+                self.saveSubtitles()
+            elif os.path.exists(self.subtitleFilePath):
                 self.loadSubtitles()
         except Exception as e:
             print(e)
             return
 
+def profile_startup(limit=15):
+    """
+    Re-run the editor under python -X importtime, which quits once its window
+    is up, and print the slowest top-level imports and the time to window.
+    """
+    command = [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--profile-startup"]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    # Lines read "import time: self [us] | cumulative | package", indented by nesting
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        if name.startswith(" " * 2):
+            continue  # Counted in the import that pulled it in
+        imports.append((int(fields[1]), name.strip()))
+
+    print(f"Slowest imports (of {len(imports)} top-level):")
+    for cumulative, name in sorted(imports, reverse=True)[:limit]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    print(result.stdout.strip())
+    return result.returncode
+
+def report_startup(app):
+    """Print the time to window and font registration for --profile-startup, then quit."""
+    print(f"Fonts registered in {sum(FontRegistry.timings.values()):.1f} ms")
+    print(f"Time to window: {(time.perf_counter() - startup_time) * 1000:.0f} ms")
+    app.quit()
+
 if __name__ == '__main__':
+    profiling = "--profile-startup" in sys.argv
+    if profiling and "importtime" not in sys._xoptions and not getattr(sys, 'frozen', False):
+        sys.exit(profile_startup())
+
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(SubtitleWorker.stop_server)
     player = VideoPlayer()
     player.show()
+    if profiling:
+        # Runs once the event loop has shown the window
+        QTimer.singleShot(0, lambda: report_startup(app))
     sys.exit(app.exec())
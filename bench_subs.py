@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+import os
+import sys
+import json
+import time
+import difflib
+import argparse
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cues import Cue, cues_from_dicts, cues_to_dicts
+from convert_subs import (
+    load_subtitle, export_subtitle, convert_stream, write_srt, write_vtt, write_sbv, PARSER_BACKENDS
+)
+
+def make_cues(count):
+    """Synthetic cues: two seconds each with a short gap, varied text."""
+    return [
+        Cue(i * 2500, i * 2500 + 2000, f"Subtitle line number {i} with a little text")
+        for i in range(count)
+    ]
+
+def measure(function, *args):
+    """
+    Run function twice, returning (seconds, peak traced memory in MB). The time
+    comes from the first run, since tracing allocations slows everything down.
+    """
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+def convert_via_json(input_file, output_file):
+    """The old route: full list of dicts, a JSON file, then back to cues."""
+    json_file = output_file + ".json"
+    with open(json_file, 'w') as file:
+        json.dump(cues_to_dicts(load_subtitle(input_file)), file, indent=4)
+    with open(json_file, 'r') as file:
+        subtitles = cues_from_dicts(json.load(file))
+    export_subtitle(subtitles, output_file)
+    os.remove(json_file)
+
+def bench_convert(cue_count, target):
+    with tempfile.TemporaryDirectory() as workdir:
+        input_file = os.path.join(workdir, "input.srt")
+        with open(input_file, 'w', encoding='utf-8') as file:
+            write_srt(make_cues(cue_count), file)
+
+        print(f"SRT -> {target.upper()}, {cue_count} cues")
+        results = {}
+        for name, function in (("via JSON", convert_via_json), ("direct", convert_stream)):
+            output_file = os.path.join(workdir, f"{name.replace(' ', '_')}.{target}")
+            elapsed, peak = measure(function, input_file, output_file)
+            results[name] = elapsed
+            print(f"  {name:<10} {elapsed:8.3f}s  {cue_count / elapsed:10.0f} cues/s  peak {peak:8.1f} MB")
+        print(f"  speedup    {results['via JSON'] / results['direct']:.2f}x")
+
+def bench_parsers(cue_count):
+    """Time each parser backend on the same SRT, VTT and SBV files and check they agree."""
+    with tempfile.TemporaryDirectory() as workdir:
+        for extension, writer in (('.srt', write_srt), ('.vtt', write_vtt), ('.sbv', write_sbv)):
+            input_file = os.path.join(workdir, "input" + extension)
+            with open(input_file, 'w', encoding='utf-8') as file:
+                writer(make_cues(cue_count), file)
+
+            print(f"Parse {extension[1:].upper()}, {cue_count} cues")
+            results = {}
+            for name, readers in PARSER_BACKENDS.items():
+                reader = readers[extension]
+                elapsed, peak = measure(lambda: list(reader(input_file)))
+                results[name] = elapsed
+                print(f"  {name:<10} {elapsed:8.3f}s  {cue_count / elapsed:10.0f} cues/s  peak {peak:8.1f} MB")
+            identical = len({tuple(map(repr, readers[extension](input_file))) for readers in PARSER_BACKENDS.values()}) == 1
+            print(f"  speedup    {results['library'] / results['native']:.2f}x, identical cues: {identical}")
+
+# Formats that keep line breaks inside a cue
+MULTILINE_FORMATS = ('.stl', '.cues', '.json')
+
+def check_round_trips(cue_count):
+    """Write multi-line cues to each format that keeps line breaks and check they read back the same."""
+    cues = [Cue(cue.start, cue.end, cue.text.replace(" with ", "\nwith ")) for cue in make_cues(cue_count)]
+    with tempfile.TemporaryDirectory() as workdir:
+        for extension in MULTILINE_FORMATS:
+            output_file = os.path.join(workdir, "round_trip" + extension)
+            export_subtitle(cues, output_file)
+            loaded = load_subtitle(output_file)
+            identical = [cue.text for cue in loaded] == [cue.text for cue in cues]
+            # STL stores frames, so times come back rounded to the frame rate
+            error = max((abs(a.start - b.start) + abs(a.end - b.end) for a, b in zip(loaded, cues)), default=0)
+            print(f"Round trip {extension[1:].upper()}, {cue_count} multi-line cues: "
+                  f"identical text: {identical and len(loaded) == len(cues)}, max time error {error} ms")
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def transcribe_sample(audio_file, model_name, quantize, threads):
+    """
+    Runs in a fresh process per configuration, so peak RSS is that
+    configuration's alone. Returns (load seconds, transcribe seconds, peak RSS
+    in MB, segment texts).
+    """
+    import torch
+    from gen_subs import load_model, TRANSCRIBE_OPTIONS
+    import whisper_timestamped
+    torch.set_num_threads(threads)
+    audio = np.load(audio_file)
+
+    start = time.perf_counter()
+    model = load_model(model_name, quantize=quantize)
+    loaded = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = whisper_timestamped.transcribe(model, audio, **dict(TRANSCRIBE_OPTIONS, verbose=None))
+    elapsed = time.perf_counter() - start
+    return loaded, elapsed, peak_rss_mb(), [segment['text'].strip() for segment in result['segments']]
+
+def agreement(reference, texts):
+    """Word-level similarity of two transcripts, 0-1 (1 means the same words in the same order)."""
+    return difflib.SequenceMatcher(None, " ".join(reference).lower().split(), " ".join(texts).lower().split()).ratio()
+
+def bench_transcribe(sample, models, thread_counts, seconds=60.0):
+    """
+    Transcribe the first seconds of sample with every model, in FP32 and int8,
+    at every thread count. Agreement is measured against the first
+    configuration, so list the reference model first.
+    """
+    from gen_subs import read_audio, SAMPLE_RATE
+    audio = read_audio(sample)[:int(seconds * SAMPLE_RATE)]
+    duration = len(audio) / SAMPLE_RATE
+    if not duration:
+        print(f"No audio in {sample}")
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        audio_file = os.path.join(workdir, "sample.npy")
+        np.save(audio_file, audio)
+
+        print(f"Transcribe {duration:.0f}s of {os.path.basename(sample)}")
+        print(f"  {'model':<10} {'precision':<9} {'threads':>7} {'load':>8} {'RTF':>6} {'peak RSS':>10} {'segments':>8} {'agreement':>9}")
+        reference = None
+        for model_name in models:
+            for quantize in (False, True):
+                for threads in thread_counts:
+                    with ProcessPoolExecutor(max_workers=1) as pool:
+                        loaded, elapsed, peak, texts = pool.submit(
+                            transcribe_sample, audio_file, model_name, quantize, threads
+                        ).result()
+                    if reference is None:
+                        reference = texts
+                    print(
+                        f"  {model_name:<10} {'int8' if quantize else 'FP32':<9} {threads:>7} {loaded:7.2f}s "
+                        f"{elapsed / duration:6.3f} {peak:7.0f} MB {len(texts):>8} {agreement(reference, texts):9.3f}"
+                    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Subtitle conversion benchmarks")
+    parser.add_argument("--cues", type=int, default=100000, help="Number of synthetic cues")
+    parser.add_argument("--to_format", default="vtt", help="Target format (vtt, sbv, srt or json)")
+    parser.add_argument("--parsers", action="store_true",
+                        help="Compare the library and native parser backends instead")
+    parser.add_argument("--round_trip", action="store_true",
+                        help="Check that multi-line cues survive a write and read in each format instead")
+    parser.add_argument("--transcribe", metavar="SAMPLE",
+                        help="Benchmark transcription settings on this audio or video file instead")
+    parser.add_argument("--models", default="medium,small,base",
+                        help="Comma-separated models for --transcribe; agreement is measured against the first")
+    parser.add_argument("--thread_counts", default=str(os.cpu_count() or 1),
+                        help="Comma-separated torch thread counts for --transcribe")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Length of the sample used by --transcribe")
+
+    args = parser.parse_args()
+    if args.transcribe:
+        bench_transcribe(
+            args.transcribe, args.models.split(","),
+            [int(count) for count in args.thread_counts.split(",")], args.seconds
+        )
+    elif args.parsers:
+        bench_parsers(args.cues)
+    elif args.round_trip:
+        check_round_trips(args.cues)
+    else:
+        bench_convert(args.cues, args.to_format)
@@ -0,0 +1,165 @@
+import os
+import sys
+import mmap
+import struct
+from array import array
+
+from cues import Cue
+
+# Compact binary subtitle sidecar (.cues). Cues are stored as columns, so a file
+# can be mapped and used without parsing anything:
+#
+#   header   magic, cue count, text blob size (24 bytes)
+#   starts   int32 ms per cue
+#   ends     int32 ms per cue
+#   offsets  int64 byte offsets into the text blob, one more than the cue count
+#   text     UTF-8 text of every cue, back to back
+#
+# All values are little-endian, and every column starts on an 8-byte boundary.
+# Other tools can read the columns with cue_arrays() as NumPy views.
+
+CUES_EXTENSION = '.cues'
+MAGIC = b'SUBCUES\x01'
+HEADER = struct.Struct('<8sQQ')
+
+# Column views below use the machine's byte order, which must match the file's
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+def dump_cues(subtitles, file):
+    """Write cues to a binary file object in the .cues layout."""
+    starts = array('i')
+    ends = array('i')
+    offsets = array('q', [0])
+    text = bytearray()
+    try:
+        for subtitle in subtitles:
+            starts.append(subtitle.start)
+            ends.append(subtitle.end)
+            text += subtitle.text.encode('utf-8')
+            offsets.append(len(text))
+    except OverflowError:
+        raise ValueError("Cue times must fit in 32 bits of milliseconds (about 596 hours)")
+
+    if not LITTLE_ENDIAN:
+        for column in (starts, ends, offsets):
+            column.byteswap()
+    file.write(HEADER.pack(MAGIC, len(starts), len(text)))
+    file.write(starts)
+    file.write(ends)
+    file.write(offsets)
+    file.write(text)
+
+def save_cues(subtitles, file_path):
+    """Write cues to a .cues file; file_path may also be "-" or a binary file object."""
+    if file_path is None or file_path == '-':
+        dump_cues(subtitles, sys.stdout.buffer)
+    elif hasattr(file_path, 'write'):
+        dump_cues(subtitles, file_path)
+    else:
+        with open(file_path, 'wb') as file:
+            dump_cues(subtitles, file)
+
+def read_header(data):
+    if len(data) < HEADER.size:
+        raise ValueError("Not a .cues file: too short")
+    magic, count, text_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a .cues file: bad magic")
+    if len(data) < HEADER.size + count * 16 + 8 + text_size:
+        raise ValueError("Truncated .cues file")
+    return count, text_size
+
+def column_offsets(count):
+    """Byte offsets of the starts, ends, offsets and text sections."""
+    starts = HEADER.size
+    ends = starts + count * 4
+    offsets = ends + count * 4
+    text = offsets + (count + 1) * 8
+    return starts, ends, offsets, text
+
+class CueColumns:
+    """
+    A memory-mapped .cues file. starts, ends and offsets are memoryviews over
+    the mapping, so opening a file costs nothing per cue; text(i) decodes
+    one cue's text. Works as a source for lazy_subs.LazyCueList.
+    """
+    def __init__(self, file_path):
+        self.path = file_path
+        with open(file_path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+
+        count, text_size = read_header(self.data)
+        starts, ends, offsets, text = column_offsets(count)
+        view = memoryview(self.data)
+        if LITTLE_ENDIAN:
+            self.starts = view[starts:ends].cast('i')
+            self.ends = view[ends:offsets].cast('i')
+            self.offsets = view[offsets:text].cast('q')
+        else:
+            self.starts, self.ends, self.offsets = (
+                array(code, view[begin:end]) for code, begin, end in
+                (('i', starts, ends), ('i', ends, offsets), ('q', offsets, text))
+            )
+            for column in (self.starts, self.ends, self.offsets):
+                column.byteswap()
+        self.text_start = text
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """Release the views and the mapping; the object can't be read afterwards."""
+        for column in (self.starts, self.ends, self.offsets):
+            if isinstance(column, memoryview):
+                column.release()
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def text(self, i):
+        base = self.text_start
+        return self.data[base + self.offsets[i]:base + self.offsets[i + 1]].decode('utf-8')
+
+    def cue(self, i):
+        return Cue(self.starts[i], self.ends[i], self.text(i))
+
+def cue_arrays(data):
+    """
+    Zero-copy NumPy views of a .cues buffer (bytes, mmap or memoryview):
+    (starts, ends, offsets, text), where text is the uint8 blob that
+    offsets index into.
+    """
+    import numpy as np
+
+    count, text_size = read_header(data)
+    starts, ends, offsets, text = column_offsets(count)
+    return (
+        np.frombuffer(data, dtype='<i4', count=count, offset=starts),
+        np.frombuffer(data, dtype='<i4', count=count, offset=ends),
+        np.frombuffer(data, dtype='<i8', count=count + 1, offset=offsets),
+        np.frombuffer(data, dtype=np.uint8, count=text_size, offset=text)
+    )
+
+def load_cues(file_path):
+    """Load a .cues file into a list of cues."""
+    with open(file_path, 'rb') as file:
+        data = file.read()
+    count, _ = read_header(data)
+    if not count:
+        return []
+    starts, ends, offsets, text = cue_arrays(data)
+    raw = text.tobytes()
+    offsets = offsets.tolist()
+    if raw.isascii():
+        # Decode the whole blob once; byte offsets are character offsets too
+        blob = raw.decode('ascii')
+        texts = [blob[offsets[i]:offsets[i + 1]] for i in range(count)]
+    else:
+        texts = [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+    return [Cue(start, end, text) for start, end, text in zip(starts.tolist(), ends.tolist(), texts)]
+
+def iter_cues(file_path):
+    """Stream cues from a mapped .cues file one at a time."""
+    source = CueColumns(file_path)
+    for i in range(len(source)):
+        yield source.cue(i)
@@ -2,39 +2,34 @@ import json
 import os
 import re
 import sys
-import webvtt
+import glob
+import time
+import hashlib
 import argparse
-from datetime import timedelta
-from pysrt import SubRipFile, SubRipItem, SubRipTime
-from pysubs2 import SSAFile, SSAEvent
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from cues import Cue, timecode_to_ms, ms_to_timecode, load_json
+import native_subs
+import ebu_stl
+import binary_subs
+import lazy_subs
 
 if getattr(sys, 'frozen', False):
     runpath = os.path.dirname(sys.executable)
 else:
     runpath = os.path.abspath(os.path.dirname(__file__))
 
-# Function to convert timecodes from string to timedelta
-def parse_timecode(timecode):
-    timecode = timecode.replace(",", ".")  # Support both comma and dot formats for milliseconds
-    parts = timecode.split(':')
-    seconds = float(parts[-1])
-    minutes = int(parts[-2])
-    hours = int(parts[-3])
-    return timedelta(hours=hours, minutes=minutes, seconds=seconds)
-
-# Function to convert timecodes to string (from timedelta) ensuring the right format
-def format_timecode(subrip_time):
-    hours = subrip_time.hours
-    minutes = subrip_time.minutes
-    seconds = subrip_time.seconds
-    milliseconds = subrip_time.milliseconds
-    return f"{hours:02}:{minutes:02}:{seconds:02}.{milliseconds:03}"  # Use . for milliseconds
-
-# Load subtitle based on extension
-def load_subtitle(file_path):
+# Load subtitle based on extension. With lazy=True, SRT, VTT, SBV, JSON and .cues
+# files are memory-mapped and only indexed; cue text is decoded on first access.
+def load_subtitle(file_path, lazy=False):
     extension = os.path.splitext(file_path)[1].lower()
 
-    if extension == '.srt':
+    if lazy and lazy_subs.supports_lazy(file_path):
+        return lazy_subs.load_lazy(file_path)
+    elif extension == '.json':
+        return load_json(file_path)
+    elif extension == '.srt':
         return load_srt(file_path)
     elif extension == '.vtt':
         return load_vtt(file_path)
@@ -43,127 +38,125 @@ def load_subtitle(file_path):
     elif extension == '.sbv':
         return load_sbv(file_path)
     elif extension == '.stl':
-        return load_stl(file_path)  # STL support added
+        return ebu_stl.load_stl(file_path)
+    elif extension == '.cues':
+        return binary_subs.load_cues(file_path)
     else:
         raise ValueError(f"Unsupported file extension: {extension}")
 
-# Function to load STL files using pycaption and convert them to JSON structure
-def load_stl(file_path):
-    with open(file_path, 'rb') as stl_file:
-        stl_content = stl_file.read()
-    converter = CaptionConverter()
-    caption_set = converter.read(stl_content, EBUSTLReader())
-
-    # Convert the STL captions to a JSON structure
-    subtitles = []
-    for lang in caption_set.get_languages():
-        for caption in caption_set.get_captions(lang):
-            subtitles.append({
-                "start": format_caption_time(caption.start),
-                "end": format_caption_time(caption.end),
-                "text": caption.nodes[0].get_text() if caption.nodes else ""
-            })
-    return subtitles
-
-# Helper function to format caption time from timedelta object to "HH:MM:SS.MMM"
-def format_caption_time(timedelta_obj):
-    total_seconds = timedelta_obj.total_seconds()
-    hours, remainder = divmod(total_seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    milliseconds = int((seconds - int(seconds)) * 1000)
-    return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}.{milliseconds:03}"  # Use . for milliseconds
-
-# Function to load SRT files
+# Function to load SRT files (with the selected parser backend)
 def load_srt(file_path):
-    srt_data = SubRipFile.open(file_path)
-    subtitles = []
-    for item in srt_data:
-        subtitles.append({
-            "start": format_timecode(item.start),
-            "end": format_timecode(item.end),
-            "text": item.text.replace('\n', ' ')
-        })
-    return subtitles
-
-# Function to load VTT files
+    return list(READERS['.srt'](file_path))
+
+# Stream cues from an SRT file one item at a time
+def iter_srt(file_path):
+    from pysrt import SubRipFile
+    with open(file_path, 'r', encoding='utf-8-sig') as file:
+        for item in SubRipFile.stream(file, error_handling=SubRipFile.ERROR_PASS):
+            # SubRipTime.ordinal is already in milliseconds
+            yield Cue(item.start.ordinal, item.end.ordinal, item.text.replace('\n', ' '))
+
+# Function to load VTT files (with the selected parser backend)
 def load_vtt(file_path):
-    vtt = webvtt.read(file_path)
-    subtitles = []
-    for caption in vtt:
-        subtitles.append({
-            "start": format_caption_time(parse_timecode(caption.start.replace(",", "."))),  # Ensure proper format
-            "end": format_caption_time(parse_timecode(caption.end.replace(",", "."))),  # Ensure proper format
-            "text": caption.text.replace('\n', ' ')
-        })
-    return subtitles
-
-def format_ass_caption_time(td):
-    # Assuming you want to format time as h:mm:ss,sss
-    hours, remainder = divmod(td.total_seconds(), 3600)
-    minutes, seconds = divmod(remainder, 60)
-    milliseconds = int((seconds - int(seconds)) * 1000)
-    formatted_time = "{:02}:{:02}:{:02}.{:03}".format(
-        int(hours), int(minutes), int(seconds), milliseconds)
-    return formatted_time
+    return list(READERS['.vtt'](file_path))
+
+# Cues from a VTT file (webvtt-py parses the whole file up front)
+def iter_vtt(file_path):
+    import webvtt
+    for caption in webvtt.read(file_path):
+        yield Cue(
+            timecode_to_ms(caption.start),
+            timecode_to_ms(caption.end),
+            caption.text.replace('\n', ' ')
+        )
 
 # Function to load ASS/SSA files
 def load_ass(file_path):
-    ass = SSAFile.load(file_path)
-    subtitles = []
-    for line in ass.events:
-        # Convert milliseconds to seconds for timedelta
-        start_seconds = line.start / 1000.0
-        end_seconds = line.end / 1000.0
-
-        subtitles.append({
-            "start": format_ass_caption_time(timedelta(seconds=start_seconds)),
-            "end": format_ass_caption_time(timedelta(seconds=end_seconds)),
-            "text": line.text.strip().replace('\n', ' ')
-        })
-    return subtitles
-
-# Function to load SBV files
-def load_sbv(file_path):
-    with open(file_path, 'r') as file:
-        content = file.readlines()
-
-    subtitles = []
-    start_time = None
-    text_lines = []
+    return list(iter_ass(file_path))
 
-    for line in content:
-        line = line.strip()
-        # Match timecode lines in SBV format (e.g., 0:00:12.345,0:00:14.678)
-        if re.match(r"\d+:\d+:\d+\.\d+,\d+:\d+:\d+\.\d+", line):
-            # If we already have a start_time and text, save the previous subtitle
-            if start_time and text_lines:
-                subtitles.append({
-                    "start": start_time,
-                    "end": end_time,
-                    "text": ' '.join(text_lines).strip()
-                })
-            times = line.split(',')
-            start_time = format_caption_time(parse_timecode(times[0].strip()))
-            end_time = format_caption_time(parse_timecode(times[1].strip()))
-            text_lines = []  # Clear text for the next subtitle
-        else:
-            text_lines.append(line)
+# Cues from an ASS/SSA file (pysubs2 parses the whole file up front)
+def iter_ass(file_path):
+    from pysubs2 import SSAFile
+    for line in SSAFile.load(file_path).events:
+        # pysubs2 event times are already in milliseconds
+        yield Cue(line.start, line.end, line.text.strip().replace('\n', ' '))
 
-    # Add the final subtitle
-    if start_time and text_lines:
-        subtitles.append({
-            "start": start_time,
-            "end": end_time,
-            "text": ' '.join(text_lines).strip()
-        })
+# Timecode lines in SBV format (e.g., 0:00:12.345,0:00:14.678)
+SBV_TIMING = re.compile(r"\d+:\d+:\d+\.\d+,\d+:\d+:\d+\.\d+")
 
-    return subtitles
+# Function to load SBV files (with the selected parser backend)
+def load_sbv(file_path):
+    return list(READERS['.sbv'](file_path))
 
-# Export subtitle into any supported format
-def export_subtitle(subtitles, file_path):
-    extension = os.path.splitext(file_path)[1].lower()
+# Stream cues from an SBV file line by line
+def iter_sbv(file_path):
+    start_time = None
+    end_time = None
+    text_lines = []
 
-    if extension == '.srt':
+    with open(file_path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if SBV_TIMING.match(line):
+                # If we already have a start_time and text, emit the previous subtitle
+                if start_time is not None and text_lines:
+                    yield Cue(start_time, end_time, ' '.join(text_lines).strip())
+                times = line.split(',')
+                start_time = timecode_to_ms(times[0])
+                end_time = timecode_to_ms(times[1])
+                text_lines = []  # Clear text for the next subtitle
+            else:
+                text_lines.append(line)
+
+    # Emit the final subtitle
+    if start_time is not None and text_lines:
+        yield Cue(start_time, end_time, ' '.join(text_lines).strip())
+
+# Cues from the editor's JSON format
+def iter_json(file_path):
+    yield from load_json(file_path)
+
+# Yield a temporary path next to file_path and move it over file_path once the
+# block finishes, so a failed conversion never leaves a truncated output behind
+# (which --batch would then skip as up to date). "-", None and file objects are
+# passed through unchanged.
+@contextmanager
+def replacing(file_path):
+    if file_path is None or file_path == '-' or hasattr(file_path, 'write'):
+        yield file_path
+        return
+    directory, name = os.path.split(os.path.abspath(file_path))
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        yield temp_path
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# Open file_path for writing; "-" (or None) means stdout and an object with a
+# write method is used as-is. Only files opened here are closed afterwards,
+# and they only replace file_path once everything has been written.
+@contextmanager
+def open_output(file_path, encoding=None):
+    if file_path is None or file_path == '-':
+        yield sys.stdout
+    elif hasattr(file_path, 'write'):
+        yield file_path
+    else:
+        with replacing(file_path) as temp_path:
+            with open(temp_path, 'w', encoding=encoding) as file:
+                yield file
+
+# Export subtitle into any supported format. file_path may also be "-" or a
+# file-like object, in which case extension (e.g. ".srt") picks the format.
+def export_subtitle(subtitles, file_path, extension=None):
+    extension = extension or os.path.splitext(file_path)[1].lower()
+
+    if extension == '.json':
+        export_json_cues(subtitles, file_path)
+    elif extension == '.srt':
         export_srt(subtitles, file_path)
     elif extension == '.vtt':
         export_vtt(subtitles, file_path)
@@ -172,106 +165,368 @@ def export_subtitle(subtitles, file_path):
     elif extension == '.sbv':
         export_sbv(subtitles, file_path)
     elif extension == '.stl':
-        export_stl(subtitles, file_path)  # STL support added
+        with replacing(file_path) as temp_path:
+            ebu_stl.save_stl(subtitles, temp_path)
+    elif extension == '.cues':
+        with replacing(file_path) as temp_path:
+            binary_subs.save_cues(subtitles, temp_path)
     else:
         raise ValueError(f"Unsupported file extension: {extension}")
 
-# Export STL (using pycaption from JSON structure back to STL)
-def export_stl(subtitles, file_path):
-    converter = CaptionConverter()
-
-    # Create a CaptionSet from the subtitles
-    caption_set = CaptionSet()
-    captions = []
-    for subtitle in subtitles:
-        start = parse_timecode(subtitle['start'])
-        end = parse_timecode(subtitle['end'])
-        captions.append({
-            "start": start,
-            "end": end,
-            "text": subtitle["text"]
-        })
-
-    # Convert the subtitle data into a CaptionSet
-    converter.captions = captions
-    stl_content = converter.write(EBUSTLWriter())
-
-    with open(file_path, 'wb') as stl_file_out:
-        stl_file_out.write(stl_content)
-
-# Function to properly format the timecode for SRT (converting milliseconds with a comma)
-def format_timecode_srt(timecode_str):
-    # Convert timecode to use comma for milliseconds (SRT format)
-    return timecode_str.replace(".", ",")
-
-# Function to convert a time string (HH:MM:SS,MS) to SubRipTime object
-def timecode_to_subrip_time(timecode_str):
-    timecode_str = format_timecode_srt(timecode_str)  # Ensure correct format with comma for milliseconds
-    hours, minutes, rest = timecode_str.split(":")
-    seconds, milliseconds = rest.split(",")
-    return SubRipTime(int(hours), int(minutes), int(seconds), int(milliseconds))
+# Writers format each cue as one string and hand them to write_batched, which
+# joins WRITE_BATCH of them per file.write call. Subtitles can be any iterable
+# of cues, so a streamed export holds one batch in memory at a time.
+WRITE_BATCH = 1000
+
+# Write an iterable of per-cue strings in batches, returning the number of cues
+def write_batched(chunks, file):
+    count = 0
+    batch = []
+    for count, chunk in enumerate(chunks, 1):
+        batch.append(chunk)
+        if len(batch) == WRITE_BATCH:
+            file.write(''.join(batch))
+            batch.clear()
+    if batch:
+        file.write(''.join(batch))
+    return count
 
 # Export SRT
 def export_srt(subtitles, file_path):
-    srt_data = SubRipFile()
-    for i, subtitle in enumerate(subtitles):
-        # Convert the start and end timecodes to SubRipTime objects
-        start = timecode_to_subrip_time(subtitle['start'])
-        end = timecode_to_subrip_time(subtitle['end'])
-
-        # Create a SubRipItem for each subtitle and add to the SubRipFile
-        srt_item = SubRipItem(index=i + 1, start=start, end=end, text=subtitle['text'])
-        srt_data.append(srt_item)
-
-    srt_data.save(file_path)
+    with open_output(file_path, 'utf-8') as file:
+        write_srt(subtitles, file)
+
+# Write cues as SRT to an open text file, returning the number written
+def write_srt(subtitles, file):
+    return write_batched((
+        f"{count}\n"
+        f"{ms_to_timecode(subtitle.start, ',')} --> {ms_to_timecode(subtitle.end, ',')}\n"
+        f"{subtitle.text}\n\n"
+        for count, subtitle in enumerate(subtitles, 1)
+    ), file)
 
 # Export VTT
 def export_vtt(subtitles, file_path):
-    with open(file_path, 'w') as file:
-        file.write("WEBVTT\n\n")
-        for subtitle in subtitles:
-            file.write(f"{subtitle['start']} --> {subtitle['end']}\n")
-            file.write(f"{subtitle['text']}\n\n")
-
-def parse_ass_timecode(time_string):
-    # Assuming time_string is in the format "0:00:00.00"
-    h, m, s = map(float, time_string.split(':'))
-    total_ms = int(h * 3600000 + m * 60000 + s * 1000)
-    return total_ms
-
-# Export ASS (with SSAEvent conversion)
+    with open_output(file_path) as file:
+        write_vtt(subtitles, file)
+
+# Write cues as VTT to an open text file, returning the number written
+def write_vtt(subtitles, file):
+    file.write("WEBVTT\n\n")
+    return write_batched((
+        f"{ms_to_timecode(subtitle.start)} --> {ms_to_timecode(subtitle.end)}\n{subtitle.text}\n\n"
+        for subtitle in subtitles
+    ), file)
+
+# Export ASS
 def export_ass(subtitles, file_path):
-    ass = SSAFile()
-    for subtitle in subtitles:
-        start_ms = parse_ass_timecode(subtitle['start'])
-        end_ms = parse_ass_timecode(subtitle['end'])
-
-        # Create SSAEvent for each subtitle
-        event = SSAEvent(start=start_ms, end=end_ms, text=subtitle['text'])
-        ass.events.append(event)
-
-    ass.save(file_path)
+    with open_output(file_path, 'utf-8') as file:
+        write_ass(subtitles, file)
+
+# Script header and default style, as written by pysubs2 for a new SSAFile
+ASS_HEADER = (
+    "[Script Info]\n"
+    "; Script generated by pysubs2\n"
+    "; https://pypi.python.org/pypi/pysubs2\n"
+    "WrapStyle: 0\n"
+    "ScaledBorderAndShadow: yes\n"
+    "Collisions: Normal\n"
+    "ScriptType: v4.00+\n"
+    "\n"
+    "[V4+ Styles]\n"
+    "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+    "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+    "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+    "Style: Default,Arial,20,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1\n"
+    "\n"
+    "[Events]\n"
+    "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+)
+
+# Latest time an ASS timestamp (H:MM:SS.cc) can hold
+ASS_MAX_MS = 10 * 3600000 - 10
+
+# Format milliseconds as an ASS timestamp, rounded to centiseconds like pysubs2
+def ms_to_ass_timestamp(ms):
+    ms = min(max(ms, 0), ASS_MAX_MS)
+    ms = (ms + 5) - (ms + 5) % 10
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:01d}:{minutes:02d}:{seconds:02d}.{ms // 10:02d}"
+
+# Write cues as ASS to an open text file, returning the number written
+def write_ass(subtitles, file):
+    file.write(ASS_HEADER)
+    return write_batched((
+        f"Dialogue: 0,{ms_to_ass_timestamp(subtitle.start)},{ms_to_ass_timestamp(subtitle.end)},"
+        f"Default,,0,0,0,,{subtitle.text}\n"
+        for subtitle in subtitles
+    ), file)
 
 # Export SBV
 def export_sbv(subtitles, file_path):
-    with open(file_path, 'w') as file:
-        for subtitle in subtitles:
-            file.write(f"{subtitle['start']},{subtitle['end']}\n")
-            file.write(f"{subtitle['text']}\n\n")
-
+    with open_output(file_path) as file:
+        write_sbv(subtitles, file)
+
+# Write cues as SBV to an open text file, returning the number written
+def write_sbv(subtitles, file):
+    return write_batched((
+        f"{ms_to_timecode(subtitle.start)},{ms_to_timecode(subtitle.end)}\n{subtitle.text}\n\n"
+        for subtitle in subtitles
+    ), file)
+
+# Write cues in the editor's JSON layout (same as json.dump(indent=4))
+def write_json(subtitles, file):
+    count = write_batched((
+        ('[\n' if count == 1 else ',\n')
+        + '    {\n'
+        + f'        "start": "{ms_to_timecode(subtitle.start)}",\n'
+        + f'        "end": "{ms_to_timecode(subtitle.end)}",\n'
+        + f'        "text": {json.dumps(subtitle.text)}\n'
+        + '    }'
+        for count, subtitle in enumerate(subtitles, 1)
+    ), file)
+    file.write('\n]' if count else '[]')
+    return count
+
+# Export cues to the editor's JSON format
+def export_json_cues(subtitles, file_path):
+    with open_output(file_path) as file:
+        write_json(subtitles, file)
+
+# Convert any supported subtitle file to the editor's JSON format
 def export_json(input_file, output_file):
+    reader = READERS.get(os.path.splitext(input_file)[1].lower(), load_subtitle)
+    export_json_cues(reader(input_file), output_file)
+
+# Direct converters: readers yield cues one at a time and writers consume any
+# iterable of cues, so a conversion never builds the full list or re-parses
+# timecode strings. Formats without an entry go through load/export_subtitle.
+READERS = {
+    '.srt': iter_srt,
+    '.vtt': iter_vtt,
+    '.ass': iter_ass,
+    '.ssa': iter_ass,
+    '.sbv': iter_sbv,
+    '.stl': ebu_stl.iter_stl,
+    '.cues': binary_subs.iter_cues,
+    '.json': iter_json
+}
+WRITERS = {
+    '.srt': write_srt,
+    '.vtt': write_vtt,
+    '.ass': write_ass,
+    '.sbv': write_sbv,
+    '.json': write_json
+}
+
+# Parser backends for the plain-text formats: "library" reads through pysrt and
+# webvtt-py, "native" through the single-pass parsers in native_subs. Both give
+# the same cues; the native ones are faster and allocate far less on big files.
+PARSER_BACKENDS = {
+    'library': {'.srt': iter_srt, '.vtt': iter_vtt, '.sbv': iter_sbv},
+    'native': {'.srt': native_subs.iter_srt, '.vtt': native_subs.iter_vtt, '.sbv': native_subs.iter_sbv}
+}
+parser_backend = None
+
+def set_parser_backend(name):
+    """Select the parser backend used by load_subtitle and the direct converters."""
+    global parser_backend
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name}")
+    READERS.update(PARSER_BACKENDS[name])
+    parser_backend = name
+
+set_parser_backend(os.environ.get("SUBTITLER_PARSER", "library"))
+
+# Output encodings for formats that are not written in the platform default
+OUTPUT_ENCODINGS = {'.srt': 'utf-8', '.ass': 'utf-8'}
+
+def convert_stream(input_file, output_file, extension=None):
+    """
+    Convert directly from one format to another, cue by cue. Returns the number
+    of cues. output_file may be "-" or a file-like object when extension is given.
+    """
+    reader = READERS[os.path.splitext(input_file)[1].lower()]
+    extension = extension or os.path.splitext(output_file)[1].lower()
+    with open_output(output_file, OUTPUT_ENCODINGS.get(extension)) as file:
+        return WRITERS[extension](reader(input_file), file)
+
+# Extensions picked up when a directory is given to the batch converter
+SUBTITLE_EXTENSIONS = ('.srt', '.vtt', '.ass', '.ssa', '.sbv', '.stl', '.cues', '.json')
+
+# Manifest of input hashes kept in the output directory by --hash
+MANIFEST_NAME = ".convert_manifest.json"
+
+def collect_inputs(paths):
+    """
+    Expand directories (recursively), glob patterns and plain files into a list
+    of (input_path, relative_path) pairs. relative_path keeps the directory
+    structure when mirroring into an output directory.
+    """
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in SUBTITLE_EXTENSIONS:
+                        full_path = os.path.join(root, name)
+                        inputs.append((full_path, os.path.relpath(full_path, path)))
+        elif os.path.isfile(path):
+            inputs.append((path, os.path.basename(path)))
+        else:
+            for match in sorted(glob.glob(path, recursive=True)):
+                if os.path.isfile(match):
+                    inputs.append((match, os.path.basename(match)))
+    return inputs
+
+def file_hash(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def convert_file(input_file, output_file):
+    """Convert one subtitle file to another format. Returns the number of cues."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    if (os.path.splitext(input_file)[1].lower() in READERS
+            and os.path.splitext(output_file)[1].lower() in WRITERS):
+        return convert_stream(input_file, output_file)
+
     subtitles = load_subtitle(input_file)
-    with open(output_file, 'w') as json_file:
-        json.dump(subtitles, json_file, indent=4)
+    export_subtitle(subtitles, output_file)
+    return len(subtitles)
+
+def convert_job(job):
+    """Process pool entry point: returns (input_file, cue_count, error)."""
+    input_file, output_file = job
+    try:
+        return input_file, convert_file(input_file, output_file), None
+    except Exception as e:
+        return input_file, 0, str(e)
+
+def batch_convert(paths, to_format, output_dir=None, workers=None, use_hash=False, force=False):
+    """
+    Convert every subtitle file found in paths to to_format (e.g. "vtt") in a
+    process pool. Outputs that are already up to date are skipped: by default
+    when the output is newer than its input, or with use_hash when the input's
+    SHA-1 matches the one recorded in the output directory's manifest.
+
+    Returns a summary dict with converted, skipped and failed counts, total
+    cues, elapsed seconds and the list of failures.
+    """
+    start = time.perf_counter()
+    extension = '.' + to_format.lower().lstrip('.')
+
+    manifest_path = os.path.join(output_dir or '.', MANIFEST_NAME)
+    manifest = {}
+    if use_hash and os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+
+    jobs = []
+    hashes = {}
+    skipped = 0
+    for input_file, relative_path in collect_inputs(paths):
+        if output_dir:
+            output_file = os.path.join(output_dir, os.path.splitext(relative_path)[0] + extension)
+        else:
+            output_file = os.path.splitext(input_file)[0] + extension
+        if os.path.abspath(output_file) == os.path.abspath(input_file):
+            continue
+
+        if not force and os.path.exists(output_file):
+            if use_hash:
+                hashes[input_file] = file_hash(input_file)
+                if manifest.get(os.path.abspath(input_file)) == hashes[input_file]:
+                    skipped += 1
+                    continue
+            elif os.path.getmtime(output_file) >= os.path.getmtime(input_file):
+                skipped += 1
+                continue
+
+        jobs.append((input_file, output_file))
+
+    converted = 0
+    cues = 0
+    failures = []
+    # Workers may be spawned rather than forked, so pass the backend along
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_parser_backend,
+                             initargs=(parser_backend,)) as pool:
+        for input_file, cue_count, error in pool.map(convert_job, jobs, chunksize=16):
+            if error:
+                failures.append((input_file, error))
+                continue
+            converted += 1
+            cues += cue_count
+            if use_hash:
+                manifest[os.path.abspath(input_file)] = hashes.get(input_file) or file_hash(input_file)
+
+    if use_hash:
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        with open(manifest_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+
+    return {
+        "converted": converted,
+        "skipped": skipped,
+        "failed": len(failures),
+        "cues": cues,
+        "elapsed": time.perf_counter() - start,
+        "failures": failures
+    }
+
+def print_batch_summary(summary):
+    elapsed = max(summary["elapsed"], 1e-9)
+    for input_file, error in summary["failures"]:
+        print(f"Failed: {input_file}: {error}")
+    print(
+        f"Converted {summary['converted']} files ({summary['cues']} cues), "
+        f"skipped {summary['skipped']}, failed {summary['failed']} in {summary['elapsed']:.2f}s: "
+        f"{summary['converted'] / elapsed:.1f} files/s, {summary['cues'] / elapsed:.0f} cues/s"
+    )
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Subtitle Converter")
-    parser.add_argument("input_file", help="Path to the input subtitle file")
-    parser.add_argument("--output_file", help="Path to the output subtitle file")
+    parser.add_argument("input_file", nargs="+",
+                        help="Path to the input subtitle file (or files, directories and globs with --batch)")
+    parser.add_argument("--output_file", help="Path to the output subtitle file (\"-\" for stdout)")
     parser.add_argument("--to_json", action="store_true", help="Convert subtitle to JSON format")
     parser.add_argument("--from_json", action="store_true", help="Convert from JSON to subtitle format")
+    parser.add_argument("--batch", action="store_true",
+                        help="Convert every input file, directory or glob to --to_format")
+    parser.add_argument("--to_format",
+                        help="Target format (srt, vtt, ass, sbv, stl, cues or json); converts a single file "
+                             "to --output_file or stdout, or every file with --batch")
+    parser.add_argument("--output_dir", help="Directory for --batch outputs (default: next to each input)")
+    parser.add_argument("--workers", type=int, help="Worker processes for --batch (default: CPU count)")
+    parser.add_argument("--hash", action="store_true",
+                        help="Skip unchanged inputs by content hash instead of modification time")
+    parser.add_argument("--force", action="store_true", help="Convert even if the output is up to date")
+    parser.add_argument("--parser", choices=sorted(PARSER_BACKENDS),
+                        help="Parser for SRT, VTT and SBV input (default: $SUBTITLER_PARSER or library)")
 
     args = parser.parse_args()
+    if args.parser:
+        set_parser_backend(args.parser)
+
+    if args.batch:
+        if not args.to_format:
+            print("Error: You must specify --to_format with --batch.")
+            sys.exit(1)
+        summary = batch_convert(
+            args.input_file, args.to_format, args.output_dir,
+            workers=args.workers, use_hash=args.hash, force=args.force
+        )
+        print_batch_summary(summary)
+        sys.exit(1 if summary["failed"] else 0)
+
+    if len(args.input_file) > 1:
+        print("Error: Multiple input files need --batch.")
+        sys.exit(1)
+    args.input_file = args.input_file[0]
 
     if args.to_json:
         default_output_path = os.path.join(runpath, "output.json")
@@ -281,9 +536,17 @@ if __name__ == "__main__":
         if not args.output_file:
             print("Error: You must specify an --output_file when converting from JSON.")
         else:
-            with open(args.input_file, 'r') as json_file:
-                subtitles = json.load(json_file)
-            export_subtitle(subtitles, args.output_file)
-            print(f"Subtitles successfully converted from JSON and saved at: {args.output_file}")
+            extension = '.' + args.to_format.lower().lstrip('.') if args.to_format else None
+            export_subtitle(load_json(args.input_file), args.output_file, extension)
+            if args.output_file != '-':
+                print(f"Subtitles successfully converted from JSON and saved at: {args.output_file}")
+
+    elif args.to_format:
+        extension = '.' + args.to_format.lower().lstrip('.')
+        output_file = args.output_file or '-'
+        if os.path.splitext(args.input_file)[1].lower() in READERS and extension in WRITERS:
+            convert_stream(args.input_file, output_file, extension)
+        else:
+            export_subtitle(load_subtitle(args.input_file), output_file, extension)
     else:
-        print("Please specify --to_json or --from_json")
+        print("Please specify --to_json, --from_json or --to_format")
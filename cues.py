@@ -0,0 +1,96 @@
+import os
+import json
+
+# Shared subtitle cue type. Times are integer milliseconds everywhere inside the
+# app; "HH:MM:SS.mmm" strings only appear when reading or writing files.
+
+class Cue:
+    """A single subtitle with start and end times in integer milliseconds."""
+    __slots__ = ("start", "end", "text")
+
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def __repr__(self):
+        return f"Cue({ms_to_timecode(self.start)} --> {ms_to_timecode(self.end)}, {self.text!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Cue):
+            return NotImplemented
+        return (self.start, self.end, self.text) == (other.start, other.end, other.text)
+
+    def copy(self):
+        return Cue(self.start, self.end, self.text)
+
+    def to_dict(self):
+        return {
+            "start": ms_to_timecode(self.start),
+            "end": ms_to_timecode(self.end),
+            "text": self.text
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(timecode_to_ms(data["start"]), timecode_to_ms(data["end"]), data["text"])
+
+def timecode_to_ms(timecode):
+    """
+    Convert a timecode string to integer milliseconds.
+
+    Accepts HH:MM:SS.mmm, H:MM:SS.mmm and MM:SS.mmm, with either "." or ","
+    before the fraction.
+    """
+    # Fast path for the canonical HH:MM:SS.mmm / HH:MM:SS,mmm form
+    if len(timecode) == 12 and timecode[2] == ':' and timecode[5] == ':':
+        return (
+            int(timecode[0:2]) * 3600000
+            + int(timecode[3:5]) * 60000
+            + int(timecode[6:8]) * 1000
+            + int(timecode[9:12])
+        )
+
+    parts = timecode.strip().replace(',', '.').split(':')
+    seconds, _, fraction = parts[-1].partition('.')
+    ms = int(seconds) * 1000 + (int(fraction[:3].ljust(3, '0')) if fraction else 0)
+    if len(parts) > 1:
+        ms += int(parts[-2]) * 60000
+    if len(parts) > 2:
+        ms += int(parts[-3]) * 3600000
+    return ms
+
+def ms_to_timecode(ms, separator='.'):
+    """Format integer milliseconds as HH:MM:SS.mmm (or HH:MM:SS,mmm for SRT)."""
+    ms = max(int(ms), 0)
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+def seconds_to_ms(seconds):
+    return int(seconds * 1000)
+
+def cues_from_dicts(subtitles):
+    return [Cue.from_dict(subtitle) for subtitle in subtitles]
+
+def cues_to_dicts(cues):
+    return [cue.to_dict() for cue in cues]
+
+# Sidecar formats the editor can keep next to a video: the pretty-printed JSON,
+# or the compact binary columns of binary_subs
+SIDECAR_EXTENSIONS = {"json": ".json", "cues": ".cues"}
+
+def sidecar_path(media_path, sidecar="json"):
+    """Path of the subtitle sidecar for a video file."""
+    return os.path.splitext(media_path)[0] + SIDECAR_EXTENSIONS[sidecar]
+
+def load_json(file_path):
+    """Load the editor's JSON subtitle file into a list of cues."""
+    with open(file_path, 'r') as file:
+        return cues_from_dicts(json.load(file))
+
+def save_json(cues, file_path):
+    """Write cues to the editor's JSON subtitle file."""
+    with open(file_path, 'w') as file:
+        json.dump(cues_to_dicts(cues), file, indent=4)
@@ -0,0 +1,322 @@
+import re
+import sys
+import struct
+import datetime
+import textwrap
+import unicodedata
+
+from cues import Cue
+
+# EBU Tech 3264 subtitle files: a 1024-byte GSI (general subtitle information)
+# header followed by 128-byte TTI (text and timing information) blocks. Blocks
+# are unpacked straight out of a memoryview over the file, so reading never
+# copies more than one text field at a time.
+
+GSI_SIZE = 1024
+TTI_SIZE = 128
+TEXT_FIELD_SIZE = 112
+
+# Disk format codes and their frame rates
+FRAME_RATES = {"STL25.01": 25, "STL30.01": 30}
+
+# TTI header: SGN, SN, EBN, CS, TCI (h, m, s, f), TCO (h, m, s, f), VP, JC, CF
+TTI_HEADER = struct.Struct('<BHBB4B4BBBB')
+
+# Largest file the format can describe: subtitle numbers are 16-bit, and the
+# GSI block and subtitle counts have five digits
+MAX_SUBTITLES = 0x10000
+MAX_BLOCKS = 99999
+
+# Extension block numbers with special meanings
+LAST_BLOCK = 0xFF
+USER_DATA_BLOCK = 0xFE
+
+# Text field codes
+LINE_BREAK = 0x8A
+UNUSED_SPACE = 0x8F
+
+# Justification code for centred text, and the teletext rows available
+JUSTIFY_CENTRE = 2
+TELETEXT_ROWS = 23
+MAX_ROW_CHARS = 40
+
+# Character code tables other than the default ISO 6937 Latin alphabet ("00")
+CODE_TABLES = {"01": "iso8859_5", "02": "iso8859_6", "03": "iso8859_7", "04": "iso8859_8"}
+
+# ISO 6937 characters outside ASCII, by byte
+ISO6937_CHARACTERS = {
+    0xA1: '¡', 0xA2: '¢', 0xA3: '£', 0xA4: '$', 0xA5: '¥', 0xA6: '#', 0xA7: '§', 0xA8: '¤',
+    0xA9: '‘', 0xAA: '“', 0xAB: '«', 0xAC: '←', 0xAD: '↑', 0xAE: '→', 0xAF: '↓',
+    0xB0: '°', 0xB1: '±', 0xB2: '²', 0xB3: '³', 0xB4: '×', 0xB5: 'µ', 0xB6: '¶', 0xB7: '·',
+    0xB8: '÷', 0xB9: '’', 0xBA: '”', 0xBB: '»', 0xBC: '¼', 0xBD: '½', 0xBE: '¾', 0xBF: '¿',
+    0xD0: '―', 0xD1: '¹', 0xD2: '®', 0xD3: '©', 0xD4: '™', 0xD5: '♪', 0xD6: '¬', 0xD7: '¦',
+    0xDC: '⅛', 0xDD: '⅜', 0xDE: '⅝', 0xDF: '⅞',
+    0xE0: 'Ω', 0xE1: 'Æ', 0xE2: 'Đ', 0xE3: 'ª', 0xE4: 'Ħ', 0xE6: 'Ĳ', 0xE7: 'Ŀ', 0xE8: 'Ł',
+    0xE9: 'Ø', 0xEA: 'Œ', 0xEB: 'º', 0xEC: 'Þ', 0xED: 'Ŧ', 0xEE: 'Ŋ', 0xEF: 'ŉ',
+    0xF0: 'ĸ', 0xF1: 'æ', 0xF2: 'đ', 0xF3: 'ð', 0xF4: 'ħ', 0xF5: 'ı', 0xF6: 'ĳ', 0xF7: 'ŀ',
+    0xF8: 'ł', 0xF9: 'ø', 0xFA: 'œ', 0xFB: 'ß', 0xFC: 'þ', 0xFD: 'ŧ', 0xFE: 'ŋ', 0xFF: '\u00ad'
+}
+
+# Non-spacing diacritic bytes, which come before the letter they modify
+ISO6937_DIACRITICS = {
+    0xC1: '\u0300', 0xC2: '\u0301', 0xC3: '\u0302', 0xC4: '\u0303', 0xC5: '\u0304',
+    0xC6: '\u0306', 0xC7: '\u0307', 0xC8: '\u0308', 0xCA: '\u030a', 0xCB: '\u0327',
+    0xCD: '\u030b', 0xCE: '\u0328', 0xCF: '\u030c'
+}
+
+# Text field bytes decoded via latin-1, mapped to text. Teletext control codes
+# display as spaces, line breaks become spaces too (cues are single-line) and
+# the remaining control codes, like italics on/off, are dropped.
+DECODE_TABLE = {code: ' ' for code in range(0x20)}
+DECODE_TABLE.update({code: None for code in range(0x80, 0xA0)})
+DECODE_TABLE.update({code: None for code in range(0xC0, 0xD0)})
+DECODE_TABLE.update({code: None for code in (0xD8, 0xD9, 0xDA, 0xDB, 0xE5)})
+DECODE_TABLE[0x24] = '$'
+DECODE_TABLE[LINE_BREAK] = '\n'
+DECODE_TABLE.update(ISO6937_CHARACTERS)
+DECODE_TABLE.update(ISO6937_DIACRITICS)
+
+# Diacritic bytes in a text field, and a diacritic followed by its letter after decoding
+DIACRITIC_BYTES = re.compile(rb'[\xc1-\xcf]')
+COMBINING_SEQUENCE = re.compile('([\u0300-\u036f])(.)', re.DOTALL)
+
+class ISO6937Encoder(dict):
+    """str.translate table from characters to ISO 6937 bytes (as latin-1 text), filled on demand."""
+
+    def __init__(self):
+        super().__init__({ord(char): chr(code) for code, char in ISO6937_CHARACTERS.items()})
+        # 0xA4 and 0xA6 duplicate these; write the ASCII bytes
+        self[ord('$')] = '$'
+        self[ord('#')] = '#'
+        # Nearest characters for common punctuation the alphabet lacks
+        self[ord('—')] = chr(0xD0)
+        self[ord('–')] = '-'
+        self[ord('…')] = '...'
+
+    def __missing__(self, code):
+        char = chr(code)
+        if 0x20 <= code < 0x7F:
+            value = char
+        else:
+            # Letters with a diacritic are written as the diacritic byte then the letter
+            value = '?'
+            decomposed = unicodedata.normalize('NFD', char)
+            if len(decomposed) == 2 and decomposed[0] < '\x7f':
+                for byte, mark in ISO6937_DIACRITICS.items():
+                    if mark == decomposed[1]:
+                        value = chr(byte) + decomposed[0]
+                        break
+        self[code] = value
+        return value
+
+ISO6937_ENCODER = ISO6937Encoder()
+
+def encode_text(text):
+    return text.translate(ISO6937_ENCODER).encode('latin-1')
+
+def decode_text(data, code_table="00"):
+    """
+    Decode the bytes of one or more text fields into cue text, one line per
+    teletext row; blank rows (e.g. double-height spacing) are dropped.
+    """
+    if code_table in CODE_TABLES:
+        text = bytes(byte if byte >= 0x20 else 0x20 for byte in data)
+        text = text.decode(CODE_TABLES[code_table], errors='replace').replace(chr(LINE_BREAK), '\n')
+    elif data.isascii():
+        text = str(data, 'ascii')
+        if not text.isprintable():
+            text = text.translate(DECODE_TABLE)
+    else:
+        text = str(data, 'latin-1').translate(DECODE_TABLE)
+        if DIACRITIC_BYTES.search(data):
+            text = COMBINING_SEQUENCE.sub(lambda m: unicodedata.normalize('NFC', m.group(2) + m.group(1)), text)
+    return '\n'.join(' '.join(row.split()) for row in text.split('\n') if row.strip())
+
+def read_gsi(data):
+    """Parse the GSI header fields needed to read the TTI blocks."""
+    if len(data) < GSI_SIZE or bytes(data[3:6]) != b'STL':
+        raise ValueError("Not an EBU STL file")
+    gsi = bytes(data[:GSI_SIZE])
+
+    def field(start, end):
+        return gsi[start:end].decode('latin-1').strip()
+
+    disk_format = field(3, 11)
+    return {
+        "disk_format": disk_format,
+        "frame_rate": FRAME_RATES.get(disk_format, 25),
+        "display_standard": field(11, 12),
+        "code_table": field(12, 14) or "00",
+        "language": field(14, 16),
+        "title": field(16, 48),
+        "blocks": int(field(238, 243)) if field(238, 243).isdigit() else 0,
+        "subtitles": int(field(243, 248)) if field(243, 248).isdigit() else 0,
+        "programme_start": field(256, 264)
+    }
+
+def timecode_to_ms(hours, minutes, seconds, frames, frame_rate):
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + round(frames * 1000 / frame_rate)
+
+def read_stl(data):
+    """
+    Read cues from the bytes of an EBU STL file.
+
+    Times are made relative to the programme start in the header when the
+    subtitles begin at or after it (as broadcast files starting at 10:00:00:00
+    do). Comment and user data blocks are skipped, and extension blocks are
+    joined onto their subtitle.
+    """
+    view = memoryview(data)
+    gsi = read_gsi(view)
+    frame_rate = gsi["frame_rate"]
+    code_table = gsi["code_table"]
+
+    programme_start = 0
+    start_code = gsi["programme_start"]
+    if len(start_code) == 8 and start_code.isdigit():
+        programme_start = timecode_to_ms(
+            int(start_code[0:2]), int(start_code[2:4]), int(start_code[4:6]), int(start_code[6:8]), frame_rate
+        )
+
+    cues = []
+    text = b''
+    for offset in range(GSI_SIZE, len(view) - TTI_SIZE + 1, TTI_SIZE):
+        (group, number, extension, status, in_h, in_m, in_s, in_f,
+         out_h, out_m, out_s, out_f, row, justify, comment) = TTI_HEADER.unpack_from(view, offset)
+        if comment or extension == USER_DATA_BLOCK:
+            continue
+
+        # The text field ends at the first unused space byte
+        field_start = offset + TTI_SIZE - TEXT_FIELD_SIZE
+        field_end = data.find(UNUSED_SPACE, field_start, offset + TTI_SIZE)
+        text += view[field_start:field_end if field_end != -1 else offset + TTI_SIZE]
+        if extension != LAST_BLOCK:
+            continue
+
+        cues.append(Cue(
+            timecode_to_ms(in_h, in_m, in_s, in_f, frame_rate),
+            timecode_to_ms(out_h, out_m, out_s, out_f, frame_rate),
+            decode_text(text, code_table)
+        ))
+        text = b''
+
+    if cues and programme_start and min(cue.start for cue in cues) >= programme_start:
+        for cue in cues:
+            cue.start -= programme_start
+            cue.end -= programme_start
+    return cues
+
+def load_stl(file_path):
+    with open(file_path, 'rb') as file:
+        return read_stl(file.read())
+
+def iter_stl(file_path):
+    yield from load_stl(file_path)
+
+def ms_to_frames(ms, frame_rate):
+    """Split milliseconds into (hours, minutes, seconds, frames), capped below 24 hours."""
+    frames = round(max(ms, 0) * frame_rate / 1000)
+    frames = min(frames, 24 * 3600 * frame_rate - 1)
+    seconds, frames = divmod(frames, frame_rate)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return hours, minutes, seconds, frames
+
+def text_blocks(text):
+    """
+    Encode cue text as teletext rows, one per line (wrapped to MAX_ROW_CHARS),
+    split into text fields of at most 112 bytes.
+    """
+    rows = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if line:
+            rows.extend([line] if len(line) <= MAX_ROW_CHARS else textwrap.wrap(line, MAX_ROW_CHARS))
+    rows = [encode_text(row) for row in rows] or [b'']
+    encoded = bytes([LINE_BREAK]).join(rows)
+    blocks = []
+    while len(encoded) > TEXT_FIELD_SIZE:
+        split = TEXT_FIELD_SIZE
+        # Keep a diacritic byte together with its letter
+        if encoded[split - 1] in ISO6937_DIACRITICS:
+            split -= 1
+        blocks.append(encoded[:split])
+        encoded = encoded[split:]
+    blocks.append(encoded)
+    return blocks, len(rows)
+
+def gsi_field(value, size):
+    return value.encode('latin-1', errors='replace')[:size].ljust(size, b' ')
+
+def dump_stl(subtitles, frame_rate=25, title="", language="09"):
+    """
+    Encode cues as the bytes of an EBU STL (teletext, Latin alphabet) file.
+    Raises ValueError if there are more subtitles or text blocks than one
+    file can number (MAX_SUBTITLES, MAX_BLOCKS).
+    """
+    disk_format = next(code for code, rate in FRAME_RATES.items() if rate == frame_rate)
+    encoded = [(subtitle, *text_blocks(subtitle.text)) for subtitle in subtitles]
+    block_count = sum(len(blocks) for _, blocks, _ in encoded)
+    if len(encoded) > MAX_SUBTITLES:
+        raise ValueError(f"Too many subtitles for one EBU STL file: {len(encoded)} (at most {MAX_SUBTITLES})")
+    if block_count > MAX_BLOCKS:
+        raise ValueError(f"Too many text blocks for one EBU STL file: {block_count} (at most {MAX_BLOCKS})")
+
+    first_in = "00000000"
+    if encoded:
+        first_in = "{:02d}{:02d}{:02d}{:02d}".format(*ms_to_frames(encoded[0][0].start, frame_rate))
+    today = datetime.date.today().strftime("%y%m%d")
+
+    output = bytearray(GSI_SIZE + block_count * TTI_SIZE)
+    output[:GSI_SIZE] = b''.join([
+        gsi_field("850", 3),
+        gsi_field(disk_format, 8),
+        gsi_field("1", 1),                    # Teletext level 1
+        gsi_field("00", 2),                   # Latin alphabet
+        gsi_field(language, 2),
+        gsi_field(title, 32),                 # Original programme title
+        gsi_field("", 32 * 5 + 16),           # Episode, translations, translator, list reference
+        gsi_field(today, 6),
+        gsi_field(today, 6),
+        gsi_field("00", 2),                   # Revision number
+        gsi_field(f"{block_count:05d}", 5),
+        gsi_field(f"{len(encoded):05d}", 5),
+        gsi_field("001", 3),                  # Subtitle groups
+        gsi_field(f"{MAX_ROW_CHARS:02d}", 2),
+        gsi_field(f"{TELETEXT_ROWS:02d}", 2),
+        gsi_field("1", 1),                    # Timecodes are intended for use
+        gsi_field("00000000", 8),             # Programme start
+        gsi_field(first_in, 8),
+        gsi_field("11", 2),                   # Disk 1 of 1
+        gsi_field("", 3 + 32 * 3 + 75 + 576)  # Country, publisher, editor, spare, user data
+    ])
+
+    offset = GSI_SIZE
+    for number, (subtitle, blocks, row_count) in enumerate(encoded):
+        time_in = ms_to_frames(subtitle.start, frame_rate)
+        time_out = ms_to_frames(subtitle.end, frame_rate)
+        # Bottom-aligned, leaving a blank row between lines
+        row = max(1, TELETEXT_ROWS - 1 - 2 * (row_count - 1))
+        for extension, text in enumerate(blocks):
+            if extension == len(blocks) - 1:
+                extension = LAST_BLOCK
+            TTI_HEADER.pack_into(
+                output, offset, 0, number, extension, 0,
+                *time_in, *time_out, row, JUSTIFY_CENTRE, 0
+            )
+            field_start = offset + TTI_SIZE - TEXT_FIELD_SIZE
+            output[field_start:field_start + len(text)] = text
+            output[field_start + len(text):offset + TTI_SIZE] = bytes([UNUSED_SPACE]) * (TEXT_FIELD_SIZE - len(text))
+            offset += TTI_SIZE
+    return bytes(output)
+
+def save_stl(subtitles, file_path, frame_rate=25):
+    """Write cues to an EBU STL file; file_path may also be "-" or a binary file object."""
+    data = dump_stl(subtitles, frame_rate)
+    if file_path is None or file_path == '-':
+        sys.stdout.buffer.write(data)
+    elif hasattr(file_path, 'write'):
+        file_path.write(data)
+    else:
+        with open(file_path, 'wb') as file:
+            file.write(data)
@@ -0,0 +1,226 @@
+import os
+import json
+import threading
+from bisect import bisect_left, bisect_right
+
+from cues import Cue
+
+# Append-only journal of subtitle edits, kept next to the sidecar file. Each
+# line is one transaction: a list of operations that came from a single edit
+# (e.g. an edited cue plus the neighbour it truncated). Operations name cues
+# by content rather than by row, so they can be replayed onto the last saved
+# sidecar after a crash:
+#
+#   {"op": "add", "cue": [start, end, text]}
+#   {"op": "delete", "cue": [start, end, text]}
+#   {"op": "edit", "old": [start, end, text], "new": [start, end, text]}
+#
+# "retime" is an edit that leaves the text alone. The sidecar is the
+# checkpoint: once a save has written it, the transactions it includes are
+# dropped from the journal, which keeps the file (and recovery) short.
+
+JOURNAL_SUFFIX = ".journal"
+
+def journal_path(sidecar_path):
+    return sidecar_path + JOURNAL_SUFFIX
+
+def cue_values(cue):
+    return [cue.start, cue.end, cue.text]
+
+def add_op(cue):
+    return {"op": "add", "cue": cue_values(cue)}
+
+def delete_op(cue):
+    return {"op": "delete", "cue": cue_values(cue)}
+
+def edit_op(old, new):
+    """Edit from old values ([start, end, text]) to cue; None if nothing changed."""
+    new = cue_values(new)
+    if new == old:
+        return None
+    return {"op": "retime" if new[2] == old[2] else "edit", "old": old, "new": new}
+
+def inverse_op(op):
+    if op["op"] == "add":
+        return {"op": "delete", "cue": op["cue"]}
+    if op["op"] == "delete":
+        return {"op": "add", "cue": op["cue"]}
+    return {"op": op["op"], "old": op["new"], "new": op["old"]}
+
+def inverse_transaction(ops):
+    return [inverse_op(op) for op in reversed(ops)]
+
+def start_of(cue):
+    return cue.start
+
+def find_cue(subtitles, values):
+    """Row of the cue with these [start, end, text] values in a start-sorted list, or None."""
+    start, end, text = values
+    row = bisect_left(subtitles, start, key=start_of)
+    while row < len(subtitles):
+        cue = subtitles[row]
+        if cue.start != start:
+            break
+        if cue.end == end and cue.text == text:
+            return row
+        row += 1
+    return None
+
+def sorted_row(subtitles, row):
+    """
+    Row the cue at row belongs in by start time, given that every other row is
+    in order. Equal start times keep their order, like a stable sort.
+    """
+    start = subtitles[row].start
+    new_row = bisect_right(subtitles, start, 0, row, key=start_of)
+    if new_row == row:
+        new_row = bisect_left(subtitles, start, row + 1, len(subtitles), key=start_of) - 1
+    return new_row
+
+def insertion_row(subtitles, start):
+    """Row a new cue starting at start goes in, after any with the same start."""
+    return bisect_right(subtitles, start, key=start_of)
+
+def read_journal(file_path):
+    """Transactions in a journal file. A torn last line from a crash is ignored."""
+    transactions = []
+    if not os.path.exists(file_path):
+        return transactions
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                transactions.append(json.loads(line)["ops"])
+            except (ValueError, KeyError):
+                break
+    return transactions
+
+class EditJournal:
+    """
+    Undo/redo history plus the on-disk journal for one sidecar file.
+
+    record() appends a transaction; undo() and redo() return the operations
+    to apply and journal them as well, so the file always reads forwards.
+    The history itself holds only operations, never copies of the list.
+    Appends happen on the GUI thread and checkpoints on the autosave thread,
+    so file access is guarded by a lock.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.file = None
+        self.sequence = 0  # Number of the last transaction written
+        self.unsaved = []  # (sequence, line) written since the last checkpoint
+        self.recovered = []  # Transactions found in the file when it was opened
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def open(self, path):
+        """Switch to the journal at path, picking up anything left by a crash."""
+        with self.lock:
+            self.close_file()
+            self.path = path
+            self.unsaved = []
+            self.recovered = read_journal(path) if path else []
+
+    def close(self):
+        with self.lock:
+            self.close_file()
+
+    def close_file(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def clear_history(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def position(self):
+        """Sequence number to pass to checkpoint() once a save of the current list is done."""
+        return self.sequence
+
+    def write(self, ops):
+        line = json.dumps({"ops": ops}, ensure_ascii=False)
+        with self.lock:
+            self.sequence += 1
+            self.unsaved.append((self.sequence, line))
+            if not self.path:
+                return
+            if self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def record(self, ops):
+        """Journal a new edit; this starts a new branch, so redo is cleared."""
+        ops = [op for op in ops if op]
+        if not ops:
+            return
+        self.write(ops)
+        self.undo_stack.append(ops)
+        self.redo_stack.clear()
+
+    def undo(self):
+        """Operations that undo the last edit, or None if there is nothing to undo."""
+        if not self.undo_stack:
+            return None
+        ops = self.undo_stack.pop()
+        self.redo_stack.append(ops)
+        inverse = inverse_transaction(ops)
+        self.write(inverse)
+        return inverse
+
+    def redo(self):
+        """Operations that redo the last undone edit, or None."""
+        if not self.redo_stack:
+            return None
+        ops = self.redo_stack.pop()
+        self.undo_stack.append(ops)
+        self.write(ops)
+        return ops
+
+    def checkpoint(self, sequence):
+        """
+        Drop transactions up to sequence, which a save has just written into
+        the sidecar. Later ones are rewritten to a fresh journal file.
+        """
+        with self.lock:
+            self.recovered = []
+            self.unsaved = [entry for entry in self.unsaved if entry[0] > sequence]
+            if not self.path:
+                return
+            self.close_file()
+            if not self.unsaved:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                file.writelines(line + "\n" for _, line in self.unsaved)
+            os.replace(temp_path, self.path)
+
+def apply_op(subtitles, op):
+    """
+    Apply one operation to a start-sorted list of cues. Returns the row it
+    affected, or None if the cue it names isn't there. Adding a cue that is
+    already present does nothing, so replaying a transaction that made it
+    into the sidecar just before a crash is harmless.
+    """
+    if op["op"] == "add":
+        row = find_cue(subtitles, op["cue"])
+        if row is None:
+            cue = Cue(*op["cue"])
+            row = insertion_row(subtitles, cue.start)
+            subtitles.insert(row, cue)
+        return row
+    row = find_cue(subtitles, op["cue"] if op["op"] == "delete" else op["old"])
+    if row is None:
+        return None
+    if op["op"] == "delete":
+        del subtitles[row]
+        return row
+    cue = subtitles[row]
+    cue.start, cue.end, cue.text = op["new"]
+    new_row = sorted_row(subtitles, row)
+    subtitles.insert(new_row, subtitles.pop(row))
+    return new_row
@@ -1,23 +1,49 @@
 #!/usr/bin/python3
 import os
 import sys
-import json
+import argparse
 import logging
 import warnings
-import whisper_timestamped
 import subprocess
+import time
+import itertools
+from bisect import bisect_left
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+
+from cues import Cue, seconds_to_ms, save_json, sidecar_path, SIDECAR_EXTENSIONS
+from binary_subs import save_cues
+from transcript_cache import TranscriptCache, SegmentCache, audio_fingerprint, cache_key
+
+# numpy, whisper_timestamped (which loads torch) and auditok are imported by the
+# functions that use them, so importing this module stays cheap for the editor
 
 # Set up basic logging
 logger = logging.getLogger()
 logging.basicConfig(level=logging.INFO)
 
-# Suppress specific warnings
+# Suppress specific warnings (CPU models run in FP32, or int8 with quantize)
 warnings.filterwarnings(
     "ignore",
     message="FP16 is not supported on CPU; using FP32 instead",
     category=UserWarning
 )
 
+SAMPLE_RATE = 16000
+
+# Transcription options with word-level timestamps and VAD. make_subtitles
+# fills in the language: the job's own, or one detected once per file
+TRANSCRIBE_OPTIONS = {
+    "language": None,
+    "trust_whisper_timestamps": True,
+    "use_backend_timestamps": True,
+    "verbose": True,
+    "refine_whisper_precision": 0.5,
+    "naive_approach": True,
+    "vad": "auditok"  # Enable VAD to remove non-speech segments
+}
+
 def extract_audio(input_filename):
     """Extract audio from the video file and save it as a .wav file."""
     audio_filename = os.path.splitext(input_filename)[0] + "_audio.wav"
@@ -31,79 +57,732 @@ def extract_audio(input_filename):
         logger.error(f"FFmpeg error: {e.stderr.decode()}")
         return None
 
-def convert_timecode(timecode):
-    """Convert timecode from seconds to HH:MM:SS,FFF format."""
-    total_milliseconds = int(timecode * 1000)  # Convert seconds to milliseconds
-    hours = total_milliseconds // 3600000
-    minutes = (total_milliseconds % 3600000) // 60000
-    seconds = (total_milliseconds % 60000) // 1000
-    milliseconds = total_milliseconds % 1000
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+def probe_duration(input_filename):
+    """Return the media duration in seconds according to ffprobe, or None."""
+    command = [
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", input_filename
+    ]
+    try:
+        result = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return float(result.stdout.decode().strip())
+    except (subprocess.CalledProcessError, ValueError) as e:
+        logger.error(f"FFprobe error: {e}")
+        return None
+
+# Whisper model sizes offered by the editor; any name whisper knows works on the command line
+MODEL_SIZES = ("tiny", "base", "small", "medium", "large")
+
+def quantize_model(model):
+    """
+    Convert a CPU model's Linear layers to int8 with dynamic quantization.
+    Whisper uses its own Linear subclass, which quantize_dynamic skips, so
+    those layers are swapped for plain nn.Linear with the same weights first.
+    """
+    import torch
+    for module in list(model.modules()):
+        for name, child in module.named_children():
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.load_state_dict(child.state_dict())
+                setattr(module, name, linear)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+# Models already loaded in this process, keyed by (name, device, quantize),
+# least recently used first. Besides the warm model, at most MAX_OTHER_MODELS
+# stay loaded, so a server asked for many sizes doesn't keep them all.
+_loaded_models = {}
+_warm_model = None
+MAX_OTHER_MODELS = 1
+
+def load_model(model_name="medium", device="cpu", quantize=False, warm=False):
+    """
+    Load a Whisper model once per process and reuse it for later jobs. With
+    quantize, its Linear layers run in int8 (CPU only). A warm model stays
+    loaded for good; loading another one unloads the least recently used
+    models that aren't warm.
+    """
+    global _warm_model
+    if quantize and device != "cpu":
+        logger.info(f"int8 quantization is CPU only; loading '{model_name}' unquantized on {device}")
+        quantize = False
+    key = (model_name, device, quantize)
+    if warm:
+        _warm_model = key
+    if key in _loaded_models:
+        _loaded_models[key] = _loaded_models.pop(key)  # Most recently used
+    else:
+        # Make room first, so two large models are never loaded side by side needlessly
+        others = [loaded for loaded in _loaded_models if loaded != _warm_model]
+        if key != _warm_model:
+            for loaded in others[:max(len(others) - MAX_OTHER_MODELS + 1, 0)]:
+                del _loaded_models[loaded]
+                logger.info(f"Unloaded Whisper model '{loaded[0]}'")
+        import whisper_timestamped
+        start = time.perf_counter()
+        model = whisper_timestamped.load_model(model_name, device=device)
+        if quantize:
+            model = quantize_model(model)
+        _loaded_models[key] = model
+        precision = "int8" if quantize else "FP32" if device == "cpu" else "FP16"
+        logger.info(f"Loaded Whisper model '{model_name}' ({precision}) in {time.perf_counter() - start:.2f}s")
+    return _loaded_models[key]
+
+@contextmanager
+def torch_threads(threads):
+    """Run the block with threads torch threads, if given, then restore the previous count."""
+    if not threads:
+        yield
+        return
+    import torch
+    previous = torch.get_num_threads()
+    torch.set_num_threads(threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+def find_speech_regions(audio):
+    """Return (start, end) seconds of each speech region found by auditok."""
+    import numpy as np
+    import auditok
+
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+    regions = auditok.split(
+        pcm,
+        sampling_rate=SAMPLE_RATE,
+        sample_width=2,
+        channels=1,
+        min_dur=0.3,
+        max_dur=30,
+        max_silence=0.3,
+        energy_threshold=50
+    )
+    speech = []
+    for region in regions:
+        # auditok >= 0.3 exposes start/end directly, older versions keep them in meta
+        meta = getattr(region, "meta", None)
+        start = meta.start if meta is not None and hasattr(meta, "start") else region.start
+        end = meta.end if meta is not None and hasattr(meta, "end") else region.end
+        speech.append((start, end))
+    return speech
+
+# Pauses at least this long anchor chunk boundaries (see plan_chunks)
+ANCHOR_PAUSE_SECONDS = 0.8
+
+def plan_chunks(regions, duration, chunk_seconds=30.0):
+    """
+    Group speech regions into chunks of up to chunk_seconds, cutting in the
+    middle of the silence between regions so no word is split across chunks.
+    Returns a list of (start, end) seconds covering the whole audio.
+
+    Once a chunk has half of chunk_seconds of speech it ends at the next
+    pause of ANCHOR_PAUSE_SECONDS or more. Where those pauses fall depends
+    only on the audio around them, so after an edit the chunks soon line up
+    with the old ones again, and the segment cache finds them.
+    """
+    if not regions:
+        return [(0.0, duration)] if duration > 0 else []
+
+    chunks = []
+    chunk_start = 0.0
+    chunk_speech_start = regions[0][0]
+    for (_, prev_end), (next_start, next_end) in zip(regions, regions[1:]):
+        anchored = (prev_end - chunk_speech_start >= chunk_seconds / 2
+                    and next_start - prev_end >= ANCHOR_PAUSE_SECONDS)
+        if anchored or next_end - chunk_speech_start > chunk_seconds:
+            cut = (prev_end + next_start) / 2
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+            chunk_speech_start = next_start
+    chunks.append((chunk_start, duration))
+    return chunks
+
+def speech_span(regions, start, end):
+    """
+    (start, end) seconds of the speech inside the chunk start..end, relative
+    to the chunk, or None if it has none. Chunks are cut between regions, so
+    every region belongs to exactly one chunk.
+    """
+    first = bisect_left(regions, start, key=lambda region: region[0])
+    last = bisect_left(regions, end, key=lambda region: region[0])
+    if first == last:
+        return None
+    return regions[first][0] - start, min(regions[last - 1][1], end) - start
+
+# Audio scanned for speech to detect the language from, and how much of it to use
+DETECT_SCAN_SECONDS = 300
+DETECT_SAMPLE_SECONDS = 30  # One Whisper window
+
+def speech_sample(audio, sample_seconds=DETECT_SAMPLE_SECONDS):
+    """
+    Up to sample_seconds of speech from the start of audio, with the
+    silences between auditok regions left out, for language detection.
+    """
+    import numpy as np
+
+    audio = audio[:DETECT_SCAN_SECONDS * SAMPLE_RATE]
+    parts = []
+    remaining = int(sample_seconds * SAMPLE_RATE)
+    for start, end in find_speech_regions(audio):
+        part = audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)][:remaining]
+        parts.append(part)
+        remaining -= len(part)
+        if remaining <= 0:
+            break
+    if not parts:
+        return audio[:int(sample_seconds * SAMPLE_RATE)]
+    return np.concatenate(parts)
+
+def peek_audio(blocks, seconds=DETECT_SCAN_SECONDS):
+    """
+    Read the first seconds of a stream of audio blocks. Returns that audio and
+    an iterator that yields every block again, so decoding never restarts.
+    """
+    import numpy as np
+
+    blocks = iter(blocks)
+    head = []
+    samples = 0
+    for block in blocks:
+        head.append(block)
+        samples += len(block)
+        if samples >= seconds * SAMPLE_RATE:
+            break
+    audio = np.concatenate(head) if head else np.zeros(0, np.float32)
+    return audio, itertools.chain(head, blocks)
+
+# Per-process model used by the transcription pool workers
+_worker_model = None
+
+def _init_worker(model_name, device, threads, quantize=False):
+    """Pool initializer: limit torch threads and load the model once per worker."""
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model = load_model(model_name, device=device, quantize=quantize)
+
+def _transcribe_chunk(chunk_audio, offset, options, model=None):
+    """
+    Transcribe one chunk and shift its timestamps by offset. Pool workers
+    leave model unset and use the model loaded by _init_worker.
+    """
+    import whisper_timestamped
+    results = whisper_timestamped.transcribe(model or _worker_model, chunk_audio, **options)
+    segments = results['segments']
+    for segment in segments:
+        segment['start'] += offset
+        segment['end'] += offset
+        for word in segment.get('words', []):
+            word['start'] += offset
+            word['end'] += offset
+    return segments
+
+def _detect_language(sample, model=None):
+    """
+    Most likely language code for a speech sample, from one pass of Whisper's
+    language detection. Pool workers leave model unset and use their own.
+    """
+    import whisper
+    model = model or _worker_model
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(sample), model.dims.n_mels).to(model.device)
+    _, probabilities = model.detect_language(mel)
+    return max(probabilities, key=probabilities.get)
+
+# Pools kept alive between jobs, keyed by (model, device, workers, threads, quantize)
+_pools = {}
+
+def get_pool(model_name, device, workers, threads, quantize=False):
+    key = (model_name, device, workers, threads, quantize)
+    if key not in _pools:
+        _pools[key] = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(model_name, device, threads, quantize)
+        )
+    return _pools[key]
+
+def shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+def stream_audio(input_filename, block_seconds=10):
+    """
+    Decode the audio with ffmpeg straight into memory, without a temporary
+    file, yielding 16 kHz mono float32 blocks as they arrive.
+    """
+    import numpy as np
+
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", input_filename,
+        "-ac", "1", "-ar", str(SAMPLE_RATE), "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-"
+    ]
+    block_bytes = int(block_seconds * SAMPLE_RATE) * 2
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        if process.wait() != 0:
+            logger.error(f"FFmpeg error: {stderr.decode()}")
+
+def read_audio(input_filename):
+    """Decode the whole audio track into a float32 array without touching disk."""
+    import numpy as np
+
+    blocks = list(stream_audio(input_filename))
+    return np.concatenate(blocks) if blocks else np.zeros(0, np.float32)
+
+def split_audio(audio, chunk_seconds=30.0):
+    """
+    Yield (offset, chunk_audio, speech) for an in-memory audio array, where
+    speech is the chunk's speech_span().
+    """
+    duration = len(audio) / SAMPLE_RATE
+    regions = find_speech_regions(audio)
+    for start, end in plan_chunks(regions, duration, chunk_seconds):
+        yield start, audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], speech_span(regions, start, end)
+
+def split_audio_stream(blocks, chunk_seconds=30.0):
+    """
+    Yield (offset, chunk_audio, speech) while audio blocks are still arriving.
+
+    Chunks are planned over what has been decoded so far; the last planned
+    chunk is held back because its speech may continue into the next block.
+    """
+    import numpy as np
 
-def make_subtitles(input_filename):
+    pending = np.zeros(0, np.float32)
+    offset = 0.0
+    for block in blocks:
+        pending = np.concatenate([pending, block])
+        if len(pending) < 2 * chunk_seconds * SAMPLE_RATE:
+            continue
+
+        pending_seconds = len(pending) / SAMPLE_RATE
+        regions = find_speech_regions(pending)
+        chunks = plan_chunks(regions, pending_seconds, chunk_seconds)
+        if len(chunks) == 1:
+            # Silence or a single short burst of speech: nothing to hold back
+            yield offset, pending, speech_span(regions, 0.0, pending_seconds)
+            offset += pending_seconds
+            pending = np.zeros(0, np.float32)
+            continue
+
+        for start, end in chunks[:-1]:
+            yield offset + start, pending[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], speech_span(regions, start, end)
+        keep_from = int(chunks[-1][0] * SAMPLE_RATE)
+        offset += keep_from / SAMPLE_RATE
+        pending = pending[keep_from:]
+
+    regions = find_speech_regions(pending)
+    for start, end in plan_chunks(regions, len(pending) / SAMPLE_RATE, chunk_seconds):
+        yield offset + start, pending[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], speech_span(regions, start, end)
+
+def segments_to_subtitles(segments):
+    """Convert Whisper segments into cues, skipping empty captions."""
+    subtitles = []
+    for segment in segments:
+        text = segment['text'].strip()
+        if text:
+            subtitles.append(Cue(seconds_to_ms(segment['start']), seconds_to_ms(segment['end']), text))
+    return subtitles
+
+def report_chunk(on_segments, segments, chunk_end, duration):
+    """Pass a finished chunk's subtitles and the overall progress to on_segments."""
+    if on_segments is None:
+        return
+    progress = min(chunk_end / duration, 1.0) if duration else None
+    on_segments(segments_to_subtitles(segments), progress)
+
+def cached_chunk(segment_cache, chunk_audio, offset, speech):
+    """
+    Look a chunk's speech up in segment_cache. Returns (key, segments), where
+    segments are shifted to the chunk's place in the audio, or None on a miss.
+    """
+    if segment_cache is None:
+        return None, None
+    speech_start, speech_end = speech or (0.0, len(chunk_audio) / SAMPLE_RATE)
+    speech_audio = chunk_audio[int(speech_start * SAMPLE_RATE):int(speech_end * SAMPLE_RATE)]
+    key = segment_cache.speech_key(speech_audio)
+    segments = segment_cache.get(key)
+    if segments is not None:
+        base = offset + speech_start
+        segments = [dict(segment, start=segment['start'] + base, end=segment['end'] + base) for segment in segments]
+    return key, segments
+
+def cache_chunk(segment_cache, key, segments, offset, speech):
+    """Store a transcribed chunk's segments relative to the start of its speech."""
+    if segment_cache is None:
+        return
+    base = offset + (speech[0] if speech else 0.0)
+    segment_cache.put(key, [
+        {"start": segment['start'] - base, "end": segment['end'] - base, "text": segment['text']}
+        for segment in segments
+    ])
+
+def transcribe_chunks(model, chunks, options, on_segments=None, duration=None, segment_cache=None):
+    """
+    Transcribe (offset, chunk_audio, speech) chunks one after another with a
+    single model. Chunks found in segment_cache are not transcribed again.
+    """
+    segments = []
+    reused = total = 0
+    for offset, chunk_audio, speech in chunks:
+        key, chunk_segments = cached_chunk(segment_cache, chunk_audio, offset, speech)
+        if chunk_segments is None:
+            chunk_segments = _transcribe_chunk(chunk_audio, offset, options, model=model)
+            cache_chunk(segment_cache, key, chunk_segments, offset, speech)
+        else:
+            reused += 1
+        total += 1
+        report_chunk(on_segments, chunk_segments, offset + len(chunk_audio) / SAMPLE_RATE, duration)
+        segments.extend(chunk_segments)
+    if segment_cache is not None:
+        logger.info(f"Reused {reused} of {total} chunks from the segment cache")
+    return segments
+
+def worker_threads(workers, threads=None):
+    """Torch threads per worker: threads, or an even share of the CPU cores."""
+    return threads or max(1, (os.cpu_count() or 1) // workers)
+
+def transcribe_parallel(chunks, options, model_name="medium", device="cpu",
+                        workers=2, threads=None, on_segments=None, duration=None,
+                        segment_cache=None, quantize=False):
+    """
+    Transcribe (offset, chunk_audio, speech) chunks in a process pool.
+
+    Chunks are submitted as soon as they are produced, so a streaming source
+    keeps decoding while earlier chunks are transcribed. Each worker loads its
+    own model and uses `threads` torch threads, which defaults to an even share
+    of the CPU cores. Results are reported to on_segments in playback order;
+    if on_segments raises, chunks still waiting in the pool are cancelled.
+    Chunks found in segment_cache are not sent to the pool.
+    """
+    threads = worker_threads(workers, threads)
+    pool = get_pool(model_name, device, workers, threads, quantize)
+    segments = []
+    pending = deque()
+    submitted = reused = 0
+
+    def collect(wait):
+        # Hand back finished chunks in playback order, optionally waiting for the rest
+        while pending and (wait or pending[0][1].done()):
+            chunk_end, future, cache_entry = pending.popleft()
+            chunk_segments = future.result()
+            if cache_entry:
+                key, offset, speech = cache_entry
+                cache_chunk(segment_cache, key, chunk_segments, offset, speech)
+            report_chunk(on_segments, chunk_segments, chunk_end, duration)
+            segments.extend(chunk_segments)
+
+    try:
+        for offset, chunk_audio, speech in chunks:
+            key, chunk_segments = cached_chunk(segment_cache, chunk_audio, offset, speech)
+            if chunk_segments is None:
+                future = pool.submit(_transcribe_chunk, chunk_audio, offset, options)
+                cache_entry = (key, offset, speech) if segment_cache is not None else None
+                submitted += 1
+            else:
+                # Already done: queue it like a finished job so the order is kept
+                future = Future()
+                future.set_result(chunk_segments)
+                cache_entry = None
+                reused += 1
+            pending.append((offset + len(chunk_audio) / SAMPLE_RATE, future, cache_entry))
+            collect(wait=False)
+
+        logger.info(f"Transcribing {submitted} chunks with {workers} workers x {threads} threads")
+        if segment_cache is not None:
+            logger.info(f"Reused {reused} of {submitted + reused} chunks from the segment cache")
+        collect(wait=True)
+    except BaseException:
+        # on_segments failed (e.g. the client went away) or the job was
+        # interrupted: drop the chunks not started yet, the pool stays warm
+        for _, future, _ in pending:
+            future.cancel()
+        raise
+    return segments
+
+def save_sidecar(subtitles, file_path, sidecar="json"):
+    if sidecar == "cues":
+        save_cues(subtitles, file_path)
+    else:
+        save_json(subtitles, file_path)
+
+def make_subtitles(input_filename, model=None, workers=1, threads=None, chunk_seconds=30.0,
+                   stream=False, on_segments=None, sidecar="json", model_name="medium",
+                   use_cache=True, cache_dir=None, quantize=False, language=None, cache_segments=False,
+                   before_write=None):
+    """
+    Transcribe a video into a subtitle file next to it: pretty-printed JSON,
+    or with sidecar="cues" the compact binary format of binary_subs.
+
+    model_name is the Whisper model to load, and names the one passed in as
+    `model`; quantize loads it with int8 Linear layers, and threads sets the
+    torch thread count (per worker when workers > 1). language is the code
+    of the spoken language (e.g. "en"); when None or "auto" it is detected
+    once, from a sample of the speech near the start, and then used for
+    every chunk. With use_cache, finished transcripts are kept in a
+    TranscriptCache (in cache_dir, if given) keyed by the decoded audio and
+    the settings, and a repeat job just writes the cached cues. With
+    cache_segments as well, the audio is transcribed chunk by chunk and each
+    chunk's segments are kept in a SegmentCache for this file, so after the
+    video is trimmed or re-conformed only chunks whose speech changed are
+    transcribed again.
+
+    With workers > 1 the audio is split into chunks at silences and
+    transcribed in parallel, and the `model` argument is not used.
+    With stream=True the audio is piped from ffmpeg into memory instead of
+    being written to a *_audio.wav file; in parallel mode chunks are handed
+    to the workers while ffmpeg is still decoding.
+    If on_segments is given, it is called with (subtitles, progress) as each
+    chunk finishes, where progress is a 0-1 fraction or None if unknown.
+    Without on_segments or cache_segments, the serial path transcribes the
+    whole file in one call. before_write, if given, is called just before the
+    sidecar is written and may raise to stop the job without writing it.
+
+    Returns a dict of per-stage timings in seconds, or None on failure.
+    """
+    import whisper_timestamped
+    timings = {}
+    job_start = time.perf_counter()
 
     if os.path.isfile(input_filename):
-        # Extract audio from the video file
-        audio_path = extract_audio(input_filename)
-        if not audio_path:
-            logger.error("Audio extraction failed.")
-            return
-
-        srt_filename = os.path.splitext(os.path.basename(input_filename))[0] + ".json"
-        export_srtfilename = os.path.join(os.path.dirname(input_filename), srt_filename)
-
-        # Load the Whisper model with whisper_timestamped
-        model = whisper_timestamped.load_model("medium", device="cpu")
-
-        # Transcribe audio with word-level timestamps and apply VAD
-        options = {
-            "language": "en",
-            "trust_whisper_timestamps": True,
-            "use_backend_timestamps": True,
-            "verbose": True,
-            "refine_whisper_precision": 0.5,
-            "naive_approach": True,
-            "vad": "auditok"  # Enable VAD to remove non-speech segments
-        }
-        results = whisper_timestamped.transcribe(model, audio_path, **options)
-        segments_list = results['segments']  # Extract segments with detailed word timestamps
+        export_srtfilename = sidecar_path(input_filename, sidecar)
+        # The cache keys below use the requested language, so "auto" jobs hit too
+        options = dict(TRANSCRIBE_OPTIONS, language=None if language == "auto" else language)
 
+        cache = key = segment_cache = audio = None
+        # Chunking changes what Whisper sees, so it is part of the cache key
+        chunked = workers > 1 or on_segments is not None or (use_cache and cache_segments)
+        if use_cache:
+            stage_start = time.perf_counter()
+            if stream:
+                # Hash the audio as ffmpeg decodes it, so memory stays bounded;
+                # a miss decodes it again below
+                fingerprint = audio_fingerprint(stream_audio(input_filename))
+            else:
+                # Decode once into memory: the same samples are hashed here and
+                # transcribed below, so a miss costs no second decode
+                audio = read_audio(input_filename)
+                timings["extract"] = time.perf_counter() - stage_start
+                stage_start = time.perf_counter()
+                fingerprint = audio_fingerprint([audio])
+            if not fingerprint:
+                logger.error("Audio extraction failed.")
+                return None
+
+            cache = TranscriptCache(cache_dir)
+            key = cache_key(fingerprint, model=model_name, quantize=quantize, options=options,
+                            chunk_seconds=chunk_seconds if chunked else None)
+            subtitles = cache.get(key)
+            timings["fingerprint"] = time.perf_counter() - stage_start
+            logger.info(f"Transcription cache {'miss' if subtitles is None else 'hit'}: {cache.describe()}")
+            if subtitles is not None:
+                if before_write:
+                    before_write()
+                if subtitles:
+                    save_sidecar(subtitles, export_srtfilename, sidecar)
+                if on_segments:
+                    on_segments(subtitles, 1.0)
+                timings["total"] = time.perf_counter() - job_start
+                return timings
+
+        if audio is not None:
+            audio_source = audio
+        elif stream:
+            audio_source = None
+        else:
+            # Extract audio from the video file
+            stage_start = time.perf_counter()
+            audio_source = extract_audio(input_filename)
+            timings["extract"] = time.perf_counter() - stage_start
+            if not audio_source:
+                logger.error("Audio extraction failed.")
+                return None
+
+        duration = probe_duration(input_filename) if on_segments else None
+        detect = options["language"] is None
+
+        if workers > 1:
+            # Decoding overlaps with transcription here, so both count as "transcribe"
+            stage_start = time.perf_counter()
+            streaming = stream and audio is None
+            if streaming:
+                blocks = stream_audio(input_filename)
+                if detect:
+                    head, blocks = peek_audio(blocks)
+            else:
+                if audio is None:
+                    audio = whisper_timestamped.load_audio(audio_source)
+                head = audio
+            if detect:
+                # Detected once, by a pool worker that already has the model loaded
+                detect_start = time.perf_counter()
+                pool = get_pool(model_name, "cpu", workers, worker_threads(workers, threads), quantize)
+                options["language"] = pool.submit(_detect_language, speech_sample(head)).result()
+                timings["detect_language"] = time.perf_counter() - detect_start
+                logger.info(f"Detected language: {options['language']}")
+            if cache is not None and cache_segments:
+                # Segments are only reusable under the language they were transcribed in
+                segment_cache = SegmentCache(cache_dir, source=os.path.abspath(input_filename), model=model_name,
+                                             quantize=quantize, options=options)
+
+            chunks = split_audio_stream(blocks, chunk_seconds) if streaming else split_audio(audio, chunk_seconds)
+            segments_list = transcribe_parallel(
+                chunks, options, model_name=model_name, workers=workers, threads=threads,
+                on_segments=on_segments, duration=duration, segment_cache=segment_cache,
+                quantize=quantize
+            )
+            timings["transcribe"] = time.perf_counter() - stage_start
+        else:
+            if audio_source is None:
+                stage_start = time.perf_counter()
+                audio_source = read_audio(input_filename)
+                timings["extract"] = time.perf_counter() - stage_start
+
+            # Load the Whisper model with whisper_timestamped, unless a warm one was passed in
+            stage_start = time.perf_counter()
+            if model is None:
+                model = load_model(model_name, device="cpu", quantize=quantize)
+            timings["load_model"] = time.perf_counter() - stage_start
+            # The thread count is restored afterwards: a server process runs
+            # many jobs, and the next one may leave threads to torch
+            with torch_threads(threads):
+                if isinstance(audio_source, str):
+                    audio_source = whisper_timestamped.load_audio(audio_source)
+                if detect:
+                    stage_start = time.perf_counter()
+                    options["language"] = _detect_language(speech_sample(audio_source), model)
+                    timings["detect_language"] = time.perf_counter() - stage_start
+                    logger.info(f"Detected language: {options['language']}")
+                if cache is not None and cache_segments:
+                    segment_cache = SegmentCache(cache_dir, source=os.path.abspath(input_filename), model=model_name,
+                                                 quantize=quantize, options=options)
+
+                stage_start = time.perf_counter()
+                if on_segments or segment_cache is not None:
+                    segments_list = transcribe_chunks(
+                        model, split_audio(audio_source, chunk_seconds), options,
+                        on_segments=on_segments, duration=duration, segment_cache=segment_cache
+                    )
+                else:
+                    results = whisper_timestamped.transcribe(model, audio_source, **options)
+                    segments_list = results['segments']  # Extract segments with detailed word timestamps
+                timings["transcribe"] = time.perf_counter() - stage_start
+
+        if before_write:
+            before_write()
+        stage_start = time.perf_counter()
         try:
             if segments_list:
                 # Build the list of subtitle data
-                subtitles = []
-                for segment in segments_list:
-                    start_timecode = convert_timecode(segment['start'])
-                    end_timecode = convert_timecode(segment['end'])
-                    text = segment['text'].strip()
-
-                    # Skip empty captions
-                    if text:
-                        # Append the dictionary to the list
-                        subtitles.append({
-                            "start": start_timecode,
-                            "end": end_timecode,
-                            "text": text
-                        })
-
-                # Write the entire list to a JSON file
-                with open(export_srtfilename, "w") as f:
-                    json.dump(subtitles, f, indent=4)
+                subtitles = segments_to_subtitles(segments_list)
 
+                # Write the entire list to the sidecar file
+                save_sidecar(subtitles, export_srtfilename, sidecar)
             else:
+                subtitles = []
                 logger.info("No transcriptions generated.")
 
+            if cache is not None:
+                cache.put(key, subtitles)
+
         except Exception as e:
             logger.error(f"Error generating subtitles: {e}")
+            return None
+        timings["write"] = time.perf_counter() - stage_start
+
+    else:
+        logger.error(f"File {input_filename} does not exist.")
+        return None
+
+    timings["total"] = time.perf_counter() - job_start
+    return timings
+
+def format_timings(timings):
+    """Format a timings dict as a single log line."""
+    return ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        logger.info("Usage: python gen_subs.py <video_file_path>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Subtitle Generator")
+    parser.add_argument("input_file", help="Path to the video file")
+    parser.add_argument("--server", action="store_true",
+                        help="Send the job to a running subs_server.py instead of loading the model here")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Transcribe chunks split at silences in this many parallel processes")
+    parser.add_argument("--model", default="medium",
+                        help=f"Whisper model size ({', '.join(MODEL_SIZES)}, or any other Whisper model name)")
+    parser.add_argument("--quantize", action="store_true",
+                        help="Run the model's Linear layers in int8 (CPU dynamic quantization)")
+    parser.add_argument("--language",
+                        help="Spoken language code, e.g. en or de (default: detect once per file)")
+    parser.add_argument("--threads", type=int,
+                        help="Torch threads per worker (default: CPU cores / workers, or torch's default with one worker)")
+    parser.add_argument("--chunk-seconds", type=float, default=30.0,
+                        help="Maximum length of each parallel chunk")
+    parser.add_argument("--stream", action="store_true",
+                        help="Pipe audio from ffmpeg into memory instead of writing *_audio.wav")
+    parser.add_argument("--sidecar", choices=sorted(SIDECAR_EXTENSIONS), default="json",
+                        help="Subtitle file written next to the video: pretty-printed JSON or compact binary cues")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always transcribe, without reading or filling the transcript and segment caches")
+    parser.add_argument("--cache-segments", action="store_true",
+                        help="Transcribe in chunks and cache each one, so an edited video only re-transcribes what changed")
+    parser.add_argument("--cache-dir",
+                        help="Transcription cache directory (default: $SUBTITLER_CACHE_DIR or ~/.cache/subtitler/transcripts)")
+
+    args = parser.parse_args()
 
-    input_filename = sys.argv[1]
+    input_filename = args.input_file
     if not os.path.exists(input_filename):
         logger.info(f"File {input_filename} does not exist.")
         sys.exit(1)
 
-    make_subtitles(input_filename)
+    if args.server:
+        from subs_server import submit_job
+        def log_progress(reply):
+            if reply.get("progress") is not None:
+                logger.info(f"{input_filename}: {int(reply['progress'] * 100)}% transcribed")
+
+        result = submit_job(input_filename, on_message=log_progress, settings={
+            "workers": args.workers,
+            "model_name": args.model,
+            "quantize": args.quantize,
+            "language": args.language,
+            "threads": args.threads,
+            "chunk_seconds": args.chunk_seconds,
+            "stream": args.stream,
+            "sidecar": args.sidecar,
+            "use_cache": not args.no_cache,
+            "cache_segments": args.cache_segments,
+            "cache_dir": args.cache_dir
+        })
+        timings = result.get("timings")
+    else:
+        timings = make_subtitles(
+            input_filename,
+            workers=args.workers,
+            model_name=args.model,
+            quantize=args.quantize,
+            language=args.language,
+            threads=args.threads,
+            chunk_seconds=args.chunk_seconds,
+            stream=args.stream,
+            sidecar=args.sidecar,
+            use_cache=not args.no_cache,
+            cache_segments=args.cache_segments,
+            cache_dir=args.cache_dir
+        )
+
+    if not timings:
+        sys.exit(1)
+    logger.info(f"Finished {input_filename}: {format_timings(timings)}")
@@ -0,0 +1,428 @@
+import os
+import re
+import json
+import mmap
+from array import array
+from collections.abc import MutableSequence
+
+from cues import Cue
+import binary_subs
+
+# Lazy loading for very large subtitle and transcript files. The file is
+# memory-mapped and scanned once with a bytes regex, keeping only the cue times
+# and the byte offsets of each cue's text. Text is decoded when a cue is first
+# accessed, so only rows that are shown (or reached by the playhead) cost
+# anything beyond the scan. Files in the layout our own writers produce
+# (one timing line or JSON key per line) are indexed with vectorised NumPy
+# searches instead; anything else falls back to the regex scan.
+
+# Files at least this large are opened lazily by the editor
+LAZY_LOAD_BYTES = 16 * 1024 * 1024
+
+# Timing line followed by the cue's text lines, up to the first blank line
+TEXT_LINES = rb'((?:[^\S\n]*\S[^\n]*\n?)*)'
+SRT_CUE = re.compile(
+    rb'^[^\S\n]*(\d+):(\d+):(\d+)[,.](\d+)[^\S\n]*-->[^\S\n]*(\d+):(\d+):(\d+)[,.](\d+)[^\n]*\n' + TEXT_LINES,
+    re.MULTILINE
+)
+VTT_CUE = re.compile(
+    rb'^[^\S\n]*(?:(\d+):)?(\d+):(\d+)\.(\d+)[^\S\n]*-->[^\S\n]*(?:(\d+):)?(\d+):(\d+)\.(\d+)[^\n]*\n' + TEXT_LINES,
+    re.MULTILINE
+)
+SBV_CUE = re.compile(
+    rb'^[^\S\n]*(\d+):(\d+):(\d+)\.(\d+),(\d+):(\d+):(\d+)\.(\d+)[^\n]*\n' + TEXT_LINES,
+    re.MULTILINE
+)
+# The editor's JSON layout: start, end and text keys in that order
+JSON_CUE = re.compile(
+    rb'"start":\s*"(?:(\d+):)?(\d+):(\d+)[.,](\d+)",\s*"end":\s*"(?:(\d+):)?(\d+):(\d+)[.,](\d+)",'
+    rb'\s*"text":\s*("[^"\\]*(?:\\.[^"\\]*)*")'
+)
+
+VTT_TAGS = re.compile('<.*?>')
+
+def fraction_ms(fraction):
+    return int(fraction[:3].ljust(3, b'0'))
+
+def timing_ms(match):
+    hours, minutes, seconds, fraction, end_hours, end_minutes, end_seconds, end_fraction = match.groups()[:8]
+    start = int(hours or 0) * 3600000 + int(minutes) * 60000 + int(seconds) * 1000 + fraction_ms(fraction)
+    end = int(end_hours or 0) * 3600000 + int(end_minutes) * 60000 + int(end_seconds) * 1000 + fraction_ms(end_fraction)
+    return start, end
+
+def text_lines(data):
+    return data.decode('utf-8', errors='replace').split('\n')
+
+def decode_srt(data):
+    # Like pysrt, keep each line's leading whitespace and drop only its end
+    return ' '.join(line.rstrip() for line in text_lines(data.rstrip(b'\r\n')))
+
+def decode_vtt(data):
+    text = '\n'.join(line.rstrip('\r') for line in text_lines(data)).strip('\n')
+    return VTT_TAGS.sub('', text).replace('\n', ' ')
+
+def decode_sbv(data):
+    return ' '.join(line.strip() for line in text_lines(data)).strip()
+
+def decode_json(data):
+    return json.loads(data)
+
+# A timecode is H:MM:SS.mmm with any number of hour digits (up to
+# MAX_HOUR_DIGITS); the MM:SS.mmm tail is fixed width.
+MAX_HOUR_DIGITS = 6
+TAIL_WIDTH = len('MM:SS.mmm')
+TAIL_DIGITS = [0, 1, 3, 4, 6, 7, 8]
+TAIL_WEIGHTS = [600000, 60000, 10000, 1000, 100, 10, 1]
+TIMECODE_CHARS = b'0123456789:.,'
+
+def find_bytes(buffer, pattern):
+    """Start offsets of every occurrence of pattern in a uint8 array."""
+    import numpy as np
+
+    candidates = np.flatnonzero(buffer[:len(buffer) - len(pattern) + 1] == pattern[0])
+    for offset, byte in enumerate(pattern[1:], 1):
+        candidates = candidates[buffer[candidates + offset] == byte]
+    return candidates
+
+def timecode_lengths(buffer, begins):
+    """Length of the run of timecode characters starting at each offset."""
+    import numpy as np
+
+    width = MAX_HOUR_DIGITS + 1 + TAIL_WIDTH + 1
+    timecode_bytes = np.zeros(256, dtype=bool)
+    timecode_bytes[list(TIMECODE_CHARS)] = True
+    chars = buffer[np.minimum(begins[:, None] + np.arange(width), len(buffer) - 1)]
+    # Running off the end of the buffer ends the timecode too
+    inside = timecode_bytes[chars] & (begins[:, None] + np.arange(width) < len(buffer))
+    return np.argmin(inside, axis=1)
+
+def parse_timecodes(buffer, begins, lengths):
+    """Milliseconds for the timecodes at begins, or None if any is malformed."""
+    import numpy as np
+
+    hour_digits = lengths - TAIL_WIDTH - 1
+    if ((hour_digits < 1) | (hour_digits > MAX_HOUR_DIGITS)).any():
+        return None
+    tails = begins + lengths - TAIL_WIDTH
+    chars = buffer[tails[:, None] + np.arange(TAIL_WIDTH)]
+    digits = chars[:, TAIL_DIGITS].astype(np.int64) - ord('0')
+    if (
+        ((digits < 0) | (digits > 9)).any()
+        or (buffer[tails - 1] != ord(':')).any() or (chars[:, 2] != ord(':')).any()
+        or not np.isin(chars[:, 5], (ord(','), ord('.'))).all()
+    ):
+        return None
+
+    hours = np.zeros(len(begins), dtype=np.int64)
+    scale = 1
+    for place in range(1, MAX_HOUR_DIGITS + 1):
+        present = hour_digits >= place
+        digit = buffer[np.maximum(tails - 1 - place, 0)].astype(np.int64) - ord('0')
+        if ((present & ((digit < 0) | (digit > 9)))).any():
+            return None
+        hours += np.where(present, digit, 0) * scale
+        scale *= 10
+    return hours * 3600000 + digits @ np.array(TAIL_WEIGHTS, dtype=np.int64)
+
+def line_ends(newlines, positions, size):
+    """Offset of the newline ending the line that holds each position (size if none)."""
+    import numpy as np
+
+    return np.append(newlines, size)[np.searchsorted(newlines, positions)]
+
+def index_timing_lines(buffer):
+    """
+    Index SRT/VTT cues whose timing lines read "H:MM:SS.mmm --> H:MM:SS.mmm",
+    with cue text running up to the next blank line.
+    """
+    import numpy as np
+
+    arrows = find_bytes(buffer, b' --> ')
+    # Every arrow in the file has to be on a timing line we can read
+    if not len(arrows) or len(find_bytes(buffer, b'-->')) != len(arrows):
+        return None
+
+    # The start timecode fills its line up to the arrow (after a BOM on the first line)
+    newlines = np.flatnonzero(buffer == ord('\n'))
+    timing_starts = np.insert(newlines + 1, 0, 0)[np.searchsorted(newlines, arrows)]
+    if len(timing_starts) and timing_starts[0] == 0 and bytes(buffer[:3]) == b'\xef\xbb\xbf':
+        timing_starts[0] = 3
+    start_lengths = arrows - timing_starts
+    if (timecode_lengths(buffer, timing_starts) != start_lengths).any():
+        return None
+    end_begins = arrows + len(b' --> ')
+    starts = parse_timecodes(buffer, timing_starts, start_lengths)
+    ends = parse_timecodes(buffer, end_begins, timecode_lengths(buffer, end_begins))
+    if starts is None or ends is None:
+        return None
+
+    # Newlines followed by an empty (or lone \r) line end a cue's text
+    gaps = np.diff(newlines)
+    blank = newlines[:-1][(gaps == 1) | ((gaps == 2) & (buffer[newlines[:-1] + 1] == ord('\r')))]
+    text_starts = np.minimum(line_ends(newlines, arrows, len(buffer)) + 1, len(buffer))
+    text_ends = line_ends(blank, text_starts, len(buffer))
+    # Each cue's text has to end before the next timing line
+    if (text_ends[:-1] > timing_starts[1:]).any():
+        return None
+    return starts, ends, text_starts, text_ends
+
+def index_json_lines(buffer):
+    """Index JSON cues written one key per line, as save_json and write_json do."""
+    import numpy as np
+
+    start_keys = find_bytes(buffer, b'"start": "')
+    end_keys = find_bytes(buffer, b'"end": "')
+    text_keys = find_bytes(buffer, b'"text": ')
+    if not len(start_keys) or not len(start_keys) == len(end_keys) == len(text_keys):
+        return None
+    if not ((start_keys < end_keys) & (end_keys < text_keys)).all() or (text_keys[:-1] > start_keys[1:]).any():
+        return None
+
+    times = []
+    for begins in (start_keys + len(b'"start": "'), end_keys + len(b'"end": "')):
+        lengths = timecode_lengths(buffer, begins)
+        if (buffer[np.minimum(begins + lengths, len(buffer) - 1)] != ord('"')).any():
+            return None
+        times.append(parse_timecodes(buffer, begins, lengths))
+    starts, ends = times
+    if starts is None or ends is None:
+        return None
+
+    text_starts = text_keys + len(b'"text": ')
+    text_ends = line_ends(np.flatnonzero(buffer == ord('\n')), text_starts, len(buffer))
+    # The text value has to be the last thing on its line
+    if (text_ends[:-1] > start_keys[1:]).any():
+        return None
+    return starts, ends, text_starts, text_ends
+
+def decode_json_line(data):
+    # The line may still hold the separating comma
+    return json.loads(data.rstrip().rstrip(b','))
+
+# Per extension: cue pattern, timing parser, the group holding the text, text decoder
+FORMATS = {
+    '.srt': (SRT_CUE, timing_ms, 9, decode_srt),
+    '.vtt': (VTT_CUE, timing_ms, 9, decode_vtt),
+    '.sbv': (SBV_CUE, timing_ms, 9, decode_sbv),
+    '.json': (JSON_CUE, timing_ms, 9, decode_json)
+}
+
+# Per extension: vectorised indexer for the common layout, and its text decoder
+FAST_INDEXERS = {
+    '.srt': (index_timing_lines, decode_srt),
+    '.vtt': (index_timing_lines, decode_vtt),
+    '.json': (index_json_lines, decode_json_line)
+}
+
+class MappedCueFile:
+    """
+    Offset index over a memory-mapped subtitle file: cue times plus the byte
+    range of each cue's text, decoded on request with text(i).
+    """
+    def __init__(self, file_path):
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension not in FORMATS:
+            raise ValueError(f"Unsupported file extension for lazy loading: {extension}")
+        pattern, timing, text_group, self.decode = FORMATS[extension]
+
+        self.path = file_path
+        with open(file_path, 'rb') as file:
+            # mmap keeps its own handle, so the file can be closed straight away
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+
+        self.starts = array('q')
+        self.ends = array('q')
+        self.text_starts = array('q')
+        self.text_ends = array('q')
+        if extension in FAST_INDEXERS and self.data:
+            import numpy as np
+
+            indexer, decode = FAST_INDEXERS[extension]
+            index = indexer(np.frombuffer(self.data, dtype=np.uint8))
+            if index is not None:
+                self.decode = decode
+                for column, values in zip((self.starts, self.ends, self.text_starts, self.text_ends), index):
+                    column.frombytes(values.astype(np.int64).tobytes())
+                return
+
+        add_start, add_end = self.starts.append, self.ends.append
+        add_text_start, add_text_end = self.text_starts.append, self.text_ends.append
+        for match in pattern.finditer(self.data):
+            start, end = timing(match)
+            add_start(start)
+            add_end(end)
+            text_start, text_end = match.span(text_group)
+            add_text_start(text_start)
+            add_text_end(text_end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def close(self):
+        """Release the mapping; the object can't be read afterwards."""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def text(self, i):
+        return self.decode(self.data[self.text_starts[i]:self.text_ends[i]])
+
+    def cue(self, i):
+        return Cue(self.starts[i], self.ends[i], self.text(i))
+
+class LazyCueList(MutableSequence):
+    """
+    A list of cues backed by a MappedCueFile or a binary_subs.CueColumns.
+
+    Cues are built the first time they are accessed and kept, so edits made
+    to them stick. Inserting or removing cues switches to an explicit row
+    list holding source positions or Cue objects; cues that were never
+    accessed still stay undecoded. detach() decodes the rest and lets go of
+    the source, after which source is None.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.cues = {}  # Decoded cues by source position
+        self.rows = None  # None while rows map one-to-one onto the source
+
+    def __len__(self):
+        return len(self.source) if self.rows is None else len(self.rows)
+
+    def entry(self, row):
+        if self.rows is not None:
+            return self.rows[row]
+        if row < 0:
+            row += len(self.source)
+        if not 0 <= row < len(self.source):
+            raise IndexError("cue index out of range")
+        return row
+
+    def resolve(self, entry, cache=True):
+        if isinstance(entry, Cue):
+            return entry
+        cue = self.cues.get(entry)
+        if cue is None:
+            cue = self.source.cue(entry)
+            if cache:
+                self.cues[entry] = cue
+        return cue
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        return self.resolve(self.entry(row))
+
+    def __iter__(self):
+        # Iterating (e.g. to save) does not keep the cues it had to decode
+        for row in range(len(self)):
+            yield self.resolve(self.entry(row), cache=False)
+
+    def explicit_rows(self):
+        if self.rows is None:
+            self.rows = list(range(len(self.source)))
+        return self.rows
+
+    def __setitem__(self, row, cue):
+        self.explicit_rows()[row] = cue
+
+    def __delitem__(self, row):
+        del self.explicit_rows()[row]
+
+    def insert(self, row, cue):
+        self.explicit_rows().insert(row, cue)
+
+    def copy(self):
+        """A shallow copy sharing the source and decoded cues, like list.copy()."""
+        other = LazyCueList(self.source)
+        other.cues = self.cues
+        other.rows = None if self.rows is None else list(self.rows)
+        return other
+
+    def maps(self, file_path):
+        """True if cues are still read from a mapping of file_path."""
+        return self.source is not None and os.path.abspath(self.source.path) == os.path.abspath(file_path)
+
+    def detach(self):
+        """
+        Decode every cue and close the source's mapping, so the file can be
+        replaced: Windows refuses to replace a file that is still mapped.
+        Cues decoded earlier stay the same objects.
+        """
+        if self.source is None:
+            return
+        self.rows = [self.resolve(self.entry(row), cache=False) for row in range(len(self))]
+        self.cues = {}
+        self.source.close()
+        self.source = None
+
+    def snapshot(self):
+        """
+        A copy whose decoded cues are copies too, so it can be written out while
+        the original is edited. Undecoded cues still come from the source.
+        """
+        other = LazyCueList(self.source)
+        other.cues = {entry: cue.copy() for entry, cue in self.cues.items()}
+        if self.rows is not None:
+            other.rows = [entry.copy() if isinstance(entry, Cue) else entry for entry in self.rows]
+        return other
+
+    def times(self):
+        """Yield (start, end) for every row without decoding any text."""
+        if self.source is None:
+            yield from ((cue.start, cue.end) for cue in self.rows)
+            return
+        starts, ends, cues = self.source.starts, self.source.ends, self.cues
+        for row in range(len(self)):
+            entry = self.entry(row)
+            cue = entry if isinstance(entry, Cue) else cues.get(entry)
+            if cue is None:
+                yield starts[entry], ends[entry]
+            else:
+                yield cue.start, cue.end
+
+    def sort_by_start(self):
+        starts = [start for start, _ in self.times()]
+        rows = self.explicit_rows()
+        rows[:] = [rows[i] for i in sorted(range(len(rows)), key=starts.__getitem__)]
+
+    def index(self, cue, start=0, stop=None):
+        """Find a cue by identity, falling back to equality among decoded cues only."""
+        stop = len(self) if stop is None else stop
+        candidates = []
+        for row in range(start, stop):
+            entry = self.entry(row)
+            decoded = entry if isinstance(entry, Cue) else self.cues.get(entry)
+            if decoded is cue:
+                return row
+            if decoded is not None:
+                candidates.append((row, decoded))
+        for row, decoded in candidates:
+            if decoded == cue:
+                return row
+        raise ValueError("cue is not in list")
+
+def load_lazy(file_path):
+    """Open a subtitle file as a LazyCueList."""
+    if os.path.splitext(file_path)[1].lower() == binary_subs.CUES_EXTENSION:
+        # Binary sidecars already are an offset index
+        return LazyCueList(binary_subs.CueColumns(file_path))
+    return LazyCueList(MappedCueFile(file_path))
+
+def supports_lazy(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    return extension in FORMATS or extension == binary_subs.CUES_EXTENSION
+
+def should_load_lazily(file_path):
+    return supports_lazy(file_path) and os.path.getsize(file_path) >= LAZY_LOAD_BYTES
+
+def cue_times(subtitles):
+    """(start, end) of every cue, without decoding lazily loaded text."""
+    if isinstance(subtitles, LazyCueList):
+        return subtitles.times()
+    return ((subtitle.start, subtitle.end) for subtitle in subtitles)
+
+def sort_cues(subtitles):
+    """Sort cues in place by start time."""
+    if isinstance(subtitles, LazyCueList):
+        subtitles.sort_by_start()
+    else:
+        subtitles.sort(key=lambda subtitle: subtitle.start)
@@ -0,0 +1,173 @@
+import re
+
+from cues import Cue
+
+# Single-pass parsers for the plain-text subtitle formats. Files are read in
+# large chunks and split into cue blocks with precompiled regexes, instead of
+# building pysrt/webvtt-py objects line by line. The cues match the library parsers
+# (see iter_srt, iter_vtt and iter_sbv in convert_subs) for any file they accept.
+
+# One or more whitespace-only lines between two blocks, and any before the first
+BLOCK_SEPARATOR = re.compile(r'\n\s*\n')
+LEADING_BLANK_LINES = re.compile(r'(?:[^\S\n]*\n)*')
+
+# SRT timestamps: HH:MM:SS,mmm with ":", "." or "," between any of the fields
+SRT_TIME = re.compile(r'(\d+)[:.,](\d+)[:.,](\d+)[:.,](\d+)')
+SRT_TIME_SEPARATOR = re.compile(r'[:.,]')
+SRT_INTEGER = re.compile(r'\d+')
+
+# Same timing pattern as webvtt-py, and the tags it strips from cue text
+VTT_TIMING = re.compile(r'\s*((?:\d+:)?\d{2}:\d{2}.\d{3})\s*-->\s*((?:\d+:)?\d{2}:\d{2}.\d{3})')
+VTT_TAGS = re.compile('<.*?>')
+VTT_TIME = re.compile(r'(?:(\d{1,2}):)?(\d{1,2}):(\d{1,2})\.(\d{3})')
+
+# SBV timing line (e.g., 0:00:12.345,0:00:14.678). Only the first three digits
+# of each fraction count, as in timecode_to_ms.
+SBV_TIMING = re.compile(r'(\d+):(\d+):(\d+)\.(\d{1,3})\d*,(\d+):(\d+):(\d+)\.(\d{1,3})')
+
+# Characters read per chunk when splitting a file into blocks
+READ_SIZE = 1 << 16
+
+# Split a file into blocks of non-blank lines, the way the line-by-line parsers
+# group them, holding only one chunk of the file in memory at a time. text is
+# anything already read from the file.
+def iter_blocks(file, text=''):
+    at_start = True
+    for data in iter(lambda: file.read(READ_SIZE), ''):
+        text += data
+        # A separator is only complete once something other than whitespace follows it
+        limit = len(text.rstrip())
+        if not limit:
+            continue
+        start = 0
+        if at_start:
+            start = LEADING_BLANK_LINES.match(text).end()
+            at_start = False
+        for separator in BLOCK_SEPARATOR.finditer(text, start, limit):
+            yield text[start:separator.start()]
+            start = separator.end()
+        text = text[start:]
+
+    # Drop whitespace-only lines around the last block
+    if at_start:
+        text = text[LEADING_BLANK_LINES.match(text).end():]
+    end = text.find('\n', len(text.rstrip()))
+    if end != -1:
+        text = text[:end]
+    if text.strip():
+        yield text
+
+# Parse an SRT timestamp like pysrt: four integer fields, lenient about junk
+def srt_time_to_ms(timestamp):
+    if not timestamp:
+        return 0
+    match = SRT_TIME.fullmatch(timestamp)
+    if match:
+        hours, minutes, seconds, ms = match.groups()
+        return int(hours) * 3600000 + int(minutes) * 60000 + int(seconds) * 1000 + int(ms)
+
+    fields = SRT_TIME_SEPARATOR.split(timestamp)
+    if len(fields) != 4:
+        raise ValueError(f"Invalid SRT timestamp: {timestamp}")
+    values = []
+    for field in fields:
+        try:
+            values.append(int(field))
+        except ValueError:
+            integer = SRT_INTEGER.match(field)
+            values.append(int(integer.group()) if integer else 0)
+    hours, minutes, seconds, ms = values
+    return hours * 3600000 + minutes * 60000 + seconds * 1000 + ms
+
+# Cues from an SRT file; malformed blocks are skipped like pysrt's ERROR_PASS
+def iter_srt(file_path):
+    with open(file_path, 'r', encoding='utf-8-sig') as file:
+        yield from parse_srt_blocks(iter_blocks(file))
+
+def parse_srt_blocks(blocks):
+    for block in blocks:
+        lines = block.split('\n')
+        if len(lines) < 2:
+            continue
+        if '-->' not in lines[0]:
+            del lines[0]
+        timestamps = lines[0].split('-->')
+        if len(timestamps) != 2:
+            continue
+        try:
+            start = srt_time_to_ms(timestamps[0].strip())
+            end = srt_time_to_ms(timestamps[1].lstrip().split(' ', 1)[0].strip())
+        except ValueError:
+            continue
+        yield Cue(start, end, ' '.join(line.rstrip() for line in lines[1:]))
+
+# Parse a VTT timestamp; like webvtt-py, a bad one fails the whole file
+def vtt_time_to_ms(timestamp):
+    match = VTT_TIME.match(timestamp)
+    if not match:
+        raise ValueError(f"Invalid timestamp {timestamp!r}")
+    hours, minutes, seconds, ms = match.groups()
+    minutes = int(minutes)
+    seconds = int(seconds)
+    if minutes > 59 or seconds > 59:
+        raise ValueError(f"Invalid timestamp {timestamp!r}")
+    return int(hours or 0) * 3600000 + minutes * 60000 + seconds * 1000 + int(ms)
+
+# Cues from a VTT file, with webvtt-py's rules for what counts as a cue block
+def iter_vtt(file_path):
+    with open(file_path, 'r', encoding='utf-8-sig') as file:
+        header = file.read(len('WEBVTT'))
+        if header != 'WEBVTT':
+            raise ValueError("Invalid format")
+        yield from parse_vtt_blocks(iter_blocks(file, header))
+
+def parse_vtt_blocks(blocks):
+    for block in blocks:
+        lines = block.split('\n')
+        if not (
+            (len(lines) >= 2 and VTT_TIMING.match(lines[0]) and '-->' not in lines[1])
+            or (len(lines) >= 3 and '-->' not in lines[0]
+                and VTT_TIMING.match(lines[1]) and '-->' not in lines[2])
+        ):
+            continue
+
+        timing = None
+        payload = []
+        for line in lines:
+            match = VTT_TIMING.match(line)
+            if match:
+                timing = match
+            elif timing:
+                payload.append(line)
+        text = '\n'.join(payload)
+        if '<' in text:
+            text = VTT_TAGS.sub('', text)
+        yield Cue(vtt_time_to_ms(timing.group(1)), vtt_time_to_ms(timing.group(2)), text.replace('\n', ' '))
+
+def sbv_time_to_ms(hours, minutes, seconds, fraction):
+    if len(fraction) < 3:
+        fraction = fraction.ljust(3, '0')
+    return int(hours) * 3600000 + int(minutes) * 60000 + int(seconds) * 1000 + int(fraction)
+
+# Cues from an SBV file: every line between two timing lines is cue text. The
+# timing groups are converted directly instead of re-splitting the line.
+def iter_sbv(file_path):
+    timing = None
+    text_lines = []
+    with open(file_path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            match = SBV_TIMING.match(line)
+            if match:
+                if timing and text_lines:
+                    yield sbv_cue(timing, text_lines)
+                timing = match.groups()
+                text_lines = []
+            else:
+                text_lines.append(line)
+
+    if timing and text_lines:
+        yield sbv_cue(timing, text_lines)
+
+def sbv_cue(timing, text_lines):
+    return Cue(sbv_time_to_ms(*timing[:4]), sbv_time_to_ms(*timing[4:]), ' '.join(text_lines).strip())
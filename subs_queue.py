@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from cues import SIDECAR_EXTENSIONS
+from gen_subs import make_subtitles, probe_duration, format_timings, MODEL_SIZES
+
+logger = logging.getLogger()
+logging.basicConfig(level=logging.INFO)
+
+# Headless batch runner: transcribes many videos, or everything that lands in
+# a watch folder, in a bounded pool of worker processes. Each worker is one
+# serial make_subtitles job with its own torch thread count, so jobs x threads
+# never exceeds the cores, and keeps its model loaded between files. Queue
+# state is written to a JSON file after every change, so a run that is
+# interrupted picks up where it stopped.
+
+# Extensions picked up from directories and the watch folder
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.avi', '.mkv', '.mov', '.mxf')
+
+STATE_NAME = "subs_queue.json"
+
+def collect_media(paths):
+    """Expand directories (recursively), glob patterns and plain files into video paths."""
+    media = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS:
+                        media.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            media.append(path)
+        else:
+            media.extend(match for match in sorted(glob.glob(path, recursive=True)) if os.path.isfile(match))
+    return [os.path.abspath(path) for path in media]
+
+class JobQueue:
+    """
+    Files to transcribe and what happened to each, persisted to a JSON file:
+
+        {"files": {"/abs/path.mp4": {"status": "pending" | "running" | "done" | "failed",
+                                     "wall": seconds, "duration": seconds, "rtf": ...,
+                                     "timings": {...}, "error": "..."}}}
+
+    Jobs still marked running when the file is loaded were cut off by an
+    interruption and go back to pending.
+    """
+    def __init__(self, path, retry_failed=False):
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self.files = json.load(file).get("files", {})
+        for job in self.files.values():
+            if job["status"] == "running" or (retry_failed and job["status"] == "failed"):
+                job["status"] = "pending"
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({"files": self.files}, file, indent=4, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def add(self, paths):
+        """Queue paths not seen before; returns how many were added."""
+        added = 0
+        for path in paths:
+            if path not in self.files:
+                self.files[path] = {"status": "pending"}
+                added += 1
+        if added:
+            self.save()
+        return added
+
+    def pending(self):
+        return [path for path, job in self.files.items() if job["status"] == "pending"]
+
+    def update(self, path, **fields):
+        self.files[path].update(fields)
+        self.save()
+
+    def count(self, status):
+        return sum(job["status"] == status for job in self.files.values())
+
+def init_worker(threads):
+    """Pool initializer: give each worker its share of the cores."""
+    import torch
+    torch.set_num_threads(threads)
+
+def run_file(input_filename, settings):
+    """
+    Pool entry point: transcribe one file. Returns (input_filename, result),
+    where result holds wall time, media duration, real-time factor (wall time
+    over duration) and stage timings, or an error.
+    """
+    start = time.perf_counter()
+    try:
+        timings = make_subtitles(input_filename, **settings)
+    except Exception as e:
+        return input_filename, {"status": "failed", "error": str(e)}
+    wall = time.perf_counter() - start
+    if not timings:
+        return input_filename, {"status": "failed", "error": "Subtitle generation failed", "wall": wall}
+
+    duration = probe_duration(input_filename)
+    return input_filename, {
+        "status": "done",
+        "wall": wall,
+        "duration": duration,
+        "rtf": wall / duration if duration else None,
+        "timings": timings
+    }
+
+def job_result(future):
+    """run_file's result from a finished future, or a failure if the worker itself failed."""
+    try:
+        return future.result()[1]
+    except BrokenProcessPool:
+        return {"status": "failed", "error": "Worker process died"}
+    except Exception as e:
+        return {"status": "failed", "error": str(e) or type(e).__name__}
+
+def scan_watch_folder(folder, sizes):
+    """
+    Videos in folder whose size hasn't changed since the last scan, so files
+    still being copied in are left for later. sizes carries state between scans.
+    """
+    ready = []
+    for path in collect_media([folder]):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        if size and sizes.get(path) == size:
+            ready.append(path)
+        sizes[path] = size
+    return ready
+
+def run_queue(queue, jobs=1, threads=None, settings=None, watch=None, interval=5.0):
+    """
+    Run every pending file in queue on jobs worker processes with threads
+    torch threads each (default: an even share of the cores). With watch, keep
+    scanning that folder for new videos every interval seconds until interrupted.
+
+    A worker that dies (e.g. killed for running out of memory) fails the
+    files running in the pool at the time; the pool is replaced and the
+    rest of the queue carries on.
+    """
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 1) // jobs)
+    settings = dict(settings or {}, workers=1)
+    logger.info(f"Running {jobs} jobs x {threads} threads")
+
+    running = {}
+    sizes = {}
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(threads,))
+
+    pool = new_pool()
+    try:
+        while True:
+            if watch:
+                added = queue.add(scan_watch_folder(watch, sizes))
+                if added:
+                    logger.info(f"Queued {added} new files from {watch}")
+
+            for path in queue.pending()[:jobs - len(running)]:
+                running[pool.submit(run_file, path, settings)] = path
+                queue.update(path, status="running")
+
+            if not running and not watch:
+                break
+
+            done, _ = wait(running, timeout=interval, return_when=FIRST_COMPLETED)
+            broken = any(isinstance(future.exception(), BrokenProcessPool) for future in done)
+            if broken:
+                # Every job in the pool fails with it; collect them all before replacing it
+                done, _ = wait(running)
+            for future in done:
+                path = running.pop(future)
+                result = job_result(future)
+                queue.update(path, **result)
+                if result["status"] == "done":
+                    rtf = f"{result['rtf']:.2f}" if result["rtf"] is not None else "unknown"
+                    logger.info(f"Finished {path} in {result['wall']:.1f}s, RTF {rtf}: {format_timings(result['timings'])}")
+                else:
+                    logger.error(f"Failed {path}: {result['error']}")
+            if broken:
+                logger.error("A worker process died; starting a new pool")
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = new_pool()
+    except KeyboardInterrupt:
+        logger.info(f"Interrupted; {len(running)} running files will be retried on the next run")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+def print_queue_summary(queue):
+    finished = [job for job in queue.files.values() if job["status"] == "done"]
+    wall = sum(job["wall"] for job in finished)
+    audio = sum(job.get("duration") or 0 for job in finished)
+    print(
+        f"Done {len(finished)}, failed {queue.count('failed')}, pending {queue.count('pending')}: "
+        f"{audio / 60:.1f} min of media in {wall / 60:.1f} worker-min"
+        + (f", mean RTF {wall / audio:.2f}" if audio else "")
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch Subtitle Generator")
+    parser.add_argument("input_file", nargs="*", help="Video files, directories or globs to queue")
+    parser.add_argument("--watch", help="Keep queueing new videos that appear in this folder")
+    parser.add_argument("--interval", type=float, default=5.0,
+                        help="Seconds between watch folder scans")
+    parser.add_argument("--state",
+                        help=f"Queue state file (default: {STATE_NAME} in the watch folder or current directory)")
+    parser.add_argument("--retry-failed", action="store_true", help="Queue files that failed last time again")
+    parser.add_argument("--jobs", type=int, default=1, help="Files transcribed at the same time")
+    parser.add_argument("--threads", type=int, help="Torch threads per job (default: CPU cores / jobs)")
+    parser.add_argument("--model", default="medium", help=f"Whisper model size ({', '.join(MODEL_SIZES)}, ...)")
+    parser.add_argument("--quantize", action="store_true",
+                        help="Run the model's Linear layers in int8 (CPU dynamic quantization)")
+    parser.add_argument("--language",
+                        help="Spoken language code for every file, e.g. en (default: detect once per file)")
+    parser.add_argument("--chunk-seconds", type=float, default=30.0, help="Maximum length of each chunk")
+    parser.add_argument("--stream", action="store_true",
+                        help="Pipe audio from ffmpeg into memory instead of writing *_audio.wav")
+    parser.add_argument("--sidecar", choices=sorted(SIDECAR_EXTENSIONS), default="json",
+                        help="Subtitle file written next to each video")
+    parser.add_argument("--no-cache", action="store_true", help="Always transcribe, without the transcription caches")
+    parser.add_argument("--cache-segments", action="store_true",
+                        help="Transcribe in chunks and cache each one, so an edited video only re-transcribes what changed")
+
+    args = parser.parse_args()
+    if not args.input_file and not args.watch:
+        parser.error("give some files to transcribe or a --watch folder")
+
+    queue = JobQueue(args.state or os.path.join(args.watch or ".", STATE_NAME), retry_failed=args.retry_failed)
+    queue.add(collect_media(args.input_file))
+
+    settings = {
+        "model_name": args.model,
+        "quantize": args.quantize,
+        "language": args.language,
+        "chunk_seconds": args.chunk_seconds,
+        "stream": args.stream,
+        "sidecar": args.sidecar,
+        "use_cache": not args.no_cache,
+        "cache_segments": args.cache_segments
+    }
+    try:
+        run_queue(queue, jobs=args.jobs, threads=args.threads, settings=settings,
+                  watch=args.watch, interval=args.interval)
+    except KeyboardInterrupt:
+        pass
+    print_queue_summary(queue)
+    sys.exit(1 if queue.count("failed") else 0)
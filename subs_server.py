@@ -0,0 +1,274 @@
+#!/usr/bin/python3
+import os
+import sys
+import json
+import stat
+import time
+import getpass
+import logging
+import secrets
+import argparse
+import tempfile
+from multiprocessing.connection import Listener, Client
+
+from gen_subs import load_model, make_subtitles, format_timings, shutdown_pools
+
+logger = logging.getLogger()
+logging.basicConfig(level=logging.INFO)
+
+# The server listens on a Unix socket (a named pipe on Windows) in a private
+# per-user directory, with a random authkey made for each session. Both are
+# written to a 0600 file there, which is how clients find and authenticate
+# to the server; no other user can connect, let alone send it pickles.
+SERVER_FILE = "server.json"
+SOCKET_NAME = "server.sock"
+
+# make_subtitles keyword arguments a client may set for a job
+JOB_SETTINGS = {
+    "workers", "threads", "chunk_seconds", "stream", "sidecar", "use_cache", "cache_dir",
+    "model_name", "quantize", "language", "cache_segments"
+}
+
+# Errors from sending to a client that has closed its connection (e.g. Cancel in the editor)
+DISCONNECTED = (BrokenPipeError, ConnectionResetError, EOFError)
+
+class ClientGone(Exception):
+    """Raised out of a running job when its client has disconnected, to stop it."""
+
+def server_dir():
+    """This user's private directory for the server socket and connection file."""
+    directory = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(),
+                             f"subtitler-{getpass.getuser()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        info = os.lstat(directory)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise RuntimeError(f"{directory} is not a private directory owned by this user")
+    return directory
+
+def new_address():
+    if sys.platform == "win32":
+        return r"\\.\pipe\subtitler-" + secrets.token_hex(16)
+    return os.path.join(server_dir(), SOCKET_NAME)
+
+def write_server_file(address, authkey):
+    path = os.path.join(server_dir(), SERVER_FILE)
+    temp_path = path + f".{os.getpid()}.tmp"
+    handle = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(handle, 'w') as file:
+        json.dump({"address": address, "authkey": authkey.hex(), "pid": os.getpid()}, file)
+    os.replace(temp_path, path)
+
+def read_server_file():
+    """(address, authkey) of the running server; raises ConnectionRefusedError if there is none."""
+    try:
+        with open(os.path.join(server_dir(), SERVER_FILE), 'r') as file:
+            info = json.load(file)
+        return info["address"], bytes.fromhex(info["authkey"])
+    except (OSError, ValueError, KeyError):
+        raise ConnectionRefusedError("No transcription server is running")
+
+def remove_server_file():
+    # The Listener removes its own socket when it closes
+    try:
+        os.remove(os.path.join(server_dir(), SERVER_FILE))
+    except FileNotFoundError:
+        pass
+
+def serve(model_name="medium", device="cpu", quantize=False):
+    """
+    Run a long-lived transcription server.
+
+    The Whisper model is loaded once and kept warm, and jobs are handled one at
+    a time in the order clients connect. Jobs that ask for another model size
+    or precision load it on first use; the most recent of those stays loaded
+    too (see load_model). If another server is already running, this returns
+    straight away.
+    """
+    if server_running():
+        logger.info("A transcription server is already running")
+        return
+    address = new_address()
+    if sys.platform != "win32" and os.path.exists(address):
+        os.remove(address)  # Left behind by a server that crashed
+    authkey = secrets.token_bytes(32)
+
+    with Listener(address, family="AF_PIPE" if sys.platform == "win32" else "AF_UNIX", authkey=authkey) as listener:
+        write_server_file(address, authkey)
+        try:
+            # Start listening before loading so early clients queue up instead of failing
+            logger.info(f"Transcription server listening on {address}")
+            model = load_model(model_name, device=device, quantize=quantize, warm=True)
+            serve_requests(listener, model, model_name, quantize)
+        finally:
+            remove_server_file()
+
+def serve_requests(listener, model, model_name, quantize):
+    """Handle requests until a shutdown command arrives."""
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            logger.error(f"Failed to accept connection: {e}")
+            continue
+
+        with conn:
+            try:
+                request = conn.recv()
+            except EOFError:
+                continue
+
+            command = request.get("command")
+            if command == "shutdown":
+                reply_to(conn, {"status": "ok"})
+                logger.info("Transcription server shutting down.")
+                shutdown_pools()
+                return
+            elif command == "ping":
+                reply = {"status": "ok"}
+            elif command == "transcribe":
+                reply = run_job(request["input"], model, request.get("settings"), conn, model_name, quantize)
+            else:
+                reply = {"status": "error", "error": f"Unknown command: {command}"}
+            if reply is not None:
+                reply_to(conn, reply)
+
+def reply_to(conn, reply):
+    """Send a final reply; a client that has already gone away is not an error."""
+    try:
+        conn.send(reply)
+    except DISCONNECTED:
+        logger.info("Client disconnected before the reply was sent")
+
+def client_gone(conn):
+    """True if the client has closed conn; it sends nothing else while its job runs."""
+    try:
+        if conn.poll():
+            conn.recv()
+    except DISCONNECTED + (OSError,):
+        return True
+    return False
+
+def run_job(input_filename, model, settings=None, conn=None, model_name="medium", quantize=False):
+    """
+    Run one transcription job on the warm model and report its timings.
+
+    settings holds optional make_subtitles keyword arguments such as workers;
+    parallel worker pools are kept alive between jobs as well. model_name and
+    quantize describe the warm model; settings may ask for others. If conn is
+    given, subtitles are streamed to the client as each chunk finishes, and
+    the job stops (returning None) as soon as the client has gone away, at
+    the latest before the sidecar is written.
+    """
+    def send_segments(subtitles, progress):
+        try:
+            conn.send({"status": "segments", "subtitles": subtitles, "progress": progress})
+        except DISCONNECTED as e:
+            raise ClientGone() from e
+
+    def check_client():
+        # The last chunk may have gone out before the client left, so look
+        # again before the sidecar is written over a file it may have saved
+        if client_gone(conn):
+            raise ClientGone()
+    on_segments = send_segments if conn is not None else None
+    before_write = check_client if conn is not None else None
+
+    settings = dict(settings or {})
+    unknown = set(settings) - JOB_SETTINGS
+    if unknown:
+        return {"status": "error", "error": f"Unknown job settings: {', '.join(sorted(unknown))}"}
+    settings.setdefault("quantize", quantize)
+    job_model_name = settings.pop("model_name", None) or model_name
+
+    logger.info(f"Starting job: {input_filename}")
+    try:
+        if (job_model_name, settings["quantize"]) != (model_name, quantize):
+            model = load_model(job_model_name, quantize=settings["quantize"])
+        timings = make_subtitles(input_filename, model=model, model_name=job_model_name,
+                                 on_segments=on_segments, before_write=before_write, **settings)
+    except ClientGone:
+        logger.info(f"Client disconnected; stopped job: {input_filename}")
+        return None
+    except Exception as e:
+        logger.error(f"Job failed for {input_filename}: {e}")
+        return {"status": "error", "error": str(e)}
+
+    if not timings:
+        return {"status": "error", "error": "Subtitle generation failed"}
+
+    logger.info(f"Finished {input_filename}: {format_timings(timings)}")
+    return {"status": "done", "timings": timings}
+
+def send_request(request, connect_timeout=0, on_message=None):
+    """
+    Send a request to the server and return its final reply.
+
+    Connection attempts are retried for up to connect_timeout seconds, which
+    covers a server that has just been started. Intermediate "segments"
+    replies are passed to on_message as they arrive.
+    """
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            address, authkey = read_server_file()
+            conn = Client(address, authkey=authkey)
+            break
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.2)
+
+    with conn:
+        conn.send(request)
+        while True:
+            reply = conn.recv()
+            if reply.get("status") != "segments":
+                return reply
+            if on_message:
+                on_message(reply)
+
+def server_running():
+    try:
+        return send_request({"command": "ping"}).get("status") == "ok"
+    except (ConnectionRefusedError, EOFError, OSError):
+        return False
+
+def submit_job(input_filename, settings=None, connect_timeout=30, on_message=None):
+    """
+    Submit a transcription job and block until the server reports back.
+
+    on_message receives each streamed {"status": "segments", ...} reply.
+    """
+    result = send_request(
+        {"command": "transcribe", "input": os.path.abspath(input_filename), "settings": settings},
+        connect_timeout=connect_timeout,
+        on_message=on_message
+    )
+    if result.get("status") != "done":
+        logger.error(f"Transcription failed: {result.get('error')}")
+    return result
+
+def shutdown_server():
+    try:
+        send_request({"command": "shutdown"})
+    except (ConnectionRefusedError, EOFError, OSError):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Subtitle Transcription Server")
+    parser.add_argument("--model", default="medium", help="Whisper model to keep loaded")
+    parser.add_argument("--quantize", action="store_true", help="Load it with int8 Linear layers")
+    parser.add_argument("--stop", action="store_true", help="Stop a running server")
+
+    args = parser.parse_args()
+
+    if args.stop:
+        shutdown_server()
+        sys.exit(0)
+
+    if server_running():
+        logger.info("A transcription server is already running")
+        sys.exit(1)
+
+    serve(model_name=args.model, quantize=args.quantize)
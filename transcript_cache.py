@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: stats updates are unlocked and may lose counts
+    fcntl = None
+
+from binary_subs import save_cues, load_cues
+
+logger = logging.getLogger()
+
+# Content-addressed cache of finished transcriptions. The key is a hash of
+# the decoded 16 kHz PCM plus everything that changes the output (model name,
+# transcription options, chunking), so a repeat job, or another file with the
+# same audio track, skips Whisper entirely. Entries are .cues files named by
+# key; a hit refreshes the file's mtime, and the least recently used entries
+# are evicted once the directory is over its size limit. Hit and miss counts
+# are kept in stats.json so they add up across processes.
+#
+# Several processes (subs_queue jobs, pool workers) share one directory, so
+# every write goes to its own temporary file before os.replace, and an entry
+# may vanish at any moment under another process's eviction.
+#
+# SegmentCache does the same one level down, for the Whisper segments of each
+# chunk of speech in one source file. Hashing the speech as the detector cut
+# it would miss after almost any edit, since its boundaries move by a few
+# milliseconds whenever the audio before them shifts. So the hash covers the
+# speech's loud core instead, from the first to the last sample at least half
+# as loud as its peak, which starts at the same sample however the boundaries
+# moved. A hit must also match the loudness envelope of the whole speech, so
+# edits to its quiet ends are caught too. After a video is trimmed or
+# re-conformed without re-encoding its audio, only the chunks whose speech
+# actually changed are transcribed again.
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "subtitler", "transcripts")
+DEFAULT_MAX_MB = 512
+STATS_NAME = "stats.json"
+LOCK_NAME = "stats.lock"
+
+SAMPLE_RATE = 16000
+
+# Speech shorter than this is always transcribed, never looked up
+MIN_SPEECH_SECONDS = 1.0
+
+# Speech envelopes: loudness in dB per 50 ms frame, with silence at a floor.
+# Two envelopes match when they are within ENVELOPE_SHIFT_FRAMES of the same
+# length and, at the best offset up to that, differ by at most
+# ENVELOPE_TOLERANCE_DB on average.
+ENVELOPE_FRAME = 800
+ENVELOPE_FLOOR_DB = -50
+ENVELOPE_SHIFT_FRAMES = 2
+ENVELOPE_TOLERANCE_DB = 1.5
+
+def audio_fingerprint(blocks):
+    """SHA-256 of a stream of decoded audio blocks (NumPy arrays), or None if there was no audio."""
+    digest = hashlib.sha256()
+    samples = 0
+    for block in blocks:
+        digest.update(block.tobytes())
+        samples += len(block)
+    return digest.hexdigest() if samples else None
+
+def speech_envelope(audio):
+    """Loudness of audio in whole dB per ENVELOPE_FRAME samples, as an int8 array."""
+    import numpy as np
+    frames = len(audio) // ENVELOPE_FRAME
+    power = np.square(audio[:frames * ENVELOPE_FRAME], dtype=np.float64).reshape(frames, ENVELOPE_FRAME).mean(axis=1)
+    decibels = 10 * np.log10(np.maximum(power, 1e-12))
+    return np.round(np.clip(decibels, ENVELOPE_FLOOR_DB, 0)).astype(np.int8)
+
+def envelopes_match(envelope, other):
+    """True if the two envelopes line up within ENVELOPE_SHIFT_FRAMES and ENVELOPE_TOLERANCE_DB."""
+    import numpy as np
+    if not len(envelope) or abs(len(envelope) - len(other)) > ENVELOPE_SHIFT_FRAMES:
+        return False
+    envelope = np.asarray(envelope, np.float32)
+    other = np.asarray(other, np.float32)
+    for shift in range(-ENVELOPE_SHIFT_FRAMES, ENVELOPE_SHIFT_FRAMES + 1):
+        overlap = min(len(envelope), len(other) - shift) - max(0, -shift)
+        if overlap < len(envelope) - 2 * ENVELOPE_SHIFT_FRAMES or overlap <= 0:
+            continue
+        start = max(0, -shift)
+        if np.abs(envelope[start:start + overlap] - other[start + shift:start + shift + overlap]).mean() <= ENVELOPE_TOLERANCE_DB:
+            return True
+    return False
+
+def speech_core(audio):
+    """(start, end) sample of audio's loud core (see SegmentCache), or None if it is silent."""
+    import numpy as np
+    magnitude = np.abs(audio)
+    peak = magnitude.max() if len(magnitude) else 0
+    if not peak:
+        return None
+    loud = np.flatnonzero(magnitude >= peak / 2)
+    return int(loud[0]), int(loud[-1]) + 1
+
+def cache_key(fingerprint, **settings):
+    """Combine the audio fingerprint with the settings that affect the transcript."""
+    text = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256((fingerprint + text).encode('utf-8')).hexdigest()
+
+class TranscriptCache:
+    EXTENSION = ".cues"
+
+    def __init__(self, directory=None, max_mb=None):
+        self.directory = directory or os.environ.get("SUBTITLER_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_mb is None:
+            max_mb = float(os.environ.get("SUBTITLER_CACHE_MB", DEFAULT_MAX_MB))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + self.EXTENSION)
+
+    def read_entry(self, path):
+        return load_cues(path)
+
+    def write_entry(self, value, path):
+        save_cues(value, path)
+
+    def get(self, key):
+        """Cached value for key, or None. Counts a hit or a miss."""
+        path = self.entry_path(key)
+        try:
+            value = self.read_entry(path)
+        except (OSError, ValueError):
+            self.count("misses")
+            return None
+        try:
+            os.utime(path)  # Most recently used
+        except FileNotFoundError:
+            pass  # Evicted by another process since it was read
+        self.count("hits")
+        return value
+
+    def temp_path(self):
+        """A fresh temporary file in the cache directory, so concurrent writers never share one."""
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(handle)
+        return temp_path
+
+    def put(self, key, value):
+        temp_path = self.temp_path()
+        try:
+            self.write_entry(value, temp_path)
+            os.replace(temp_path, self.entry_path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.EXTENSION):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            logger.info(f"Evicted {os.path.basename(path)} from the transcription cache")
+
+    def stats(self):
+        try:
+            with open(os.path.join(self.directory, STATS_NAME), 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0}
+
+    @contextmanager
+    def stats_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, LOCK_NAME), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def count(self, field):
+        """Add one to a stats counter. Best effort: a failure here never fails a lookup."""
+        try:
+            with self.stats_lock():
+                stats = self.stats()
+                stats[field] = stats.get(field, 0) + 1
+                stats["updated"] = time.time()
+                temp_path = self.temp_path()
+                with open(temp_path, 'w') as file:
+                    json.dump(stats, file)
+                os.replace(temp_path, os.path.join(self.directory, STATS_NAME))
+        except OSError as e:
+            logger.info(f"Could not update cache stats: {e}")
+
+    def describe(self):
+        stats = self.stats()
+        hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+        rate = hits / (hits + misses) * 100 if hits + misses else 0
+        return f"{hits} hits, {misses} misses ({rate:.0f}% hit rate)"
+
+class SegmentCache(TranscriptCache):
+    """
+    Segments per chunk of speech, in a "segments" directory inside the
+    transcript cache. Keys come from speech_key(). Entries are named by the
+    hash of the speech's loud core and the settings (source file, model,
+    options and so on), and hold the speech's envelope and its segments as
+    {"start", "end", "text"} in seconds from the start of the loud core, so
+    they can be reused wherever that speech moved to.
+    """
+    EXTENSION = ".json"
+
+    def __init__(self, directory=None, max_mb=None, **settings):
+        directory = directory or os.environ.get("SUBTITLER_CACHE_DIR", DEFAULT_CACHE_DIR)
+        super().__init__(os.path.join(directory, "segments"), max_mb)
+        self.settings = settings
+
+    def speech_key(self, speech_audio):
+        """
+        (name, core start in seconds, envelope) for a chunk's speech, or None
+        if it is too short or silent to cache.
+        """
+        core = speech_core(speech_audio) if len(speech_audio) >= MIN_SPEECH_SECONDS * SAMPLE_RATE else None
+        if core is None:
+            return None
+        start, end = core
+        name = cache_key(audio_fingerprint([speech_audio[start:end]]), **self.settings)
+        return name, start / SAMPLE_RATE, speech_envelope(speech_audio)
+
+    def get(self, key):
+        """
+        Segments cached for the speech key describes, in seconds from the
+        start of that speech, or None. Counts a hit or a miss.
+        """
+        if key is None:
+            return None
+        name, core_start, envelope = key
+        path = self.entry_path(name)
+        try:
+            entry = self.read_entry(path)
+        except (OSError, ValueError):
+            entry = None
+        if entry is None or not envelopes_match(envelope, entry["envelope"]):
+            self.count("misses")
+            return None
+        try:
+            os.utime(path)  # Most recently used
+        except FileNotFoundError:
+            pass
+        self.count("hits")
+        return [dict(segment, start=segment["start"] + core_start, end=segment["end"] + core_start)
+                for segment in entry["segments"]]
+
+    def put(self, key, value):
+        """Store segments given in seconds from the start of the speech key describes."""
+        if key is None:
+            return
+        name, core_start, envelope = key
+        super().put(name, {
+            "envelope": envelope.tolist(),
+            "segments": [dict(segment, start=segment["start"] - core_start, end=segment["end"] - core_start)
+                         for segment in value]
+        })
+
+    def read_entry(self, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def write_entry(self, value, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(value, file, ensure_ascii=False)
@@ -0,0 +1,165 @@
+import os
+import mmap
+import struct
+
+# Waveform peaks for the timeline, stored as a pyramid like image mipmaps.
+# Level 0 holds the min and max sample of every BUCKET_SAMPLES-sample bucket
+# of the 16 kHz mono audio; each level above halves the resolution. Drawing
+# picks the level closest to one bucket per pixel, so the work per frame
+# depends on the widget's width, never on the length of the file.
+#
+# The pyramid is computed once while streaming the decoded audio and cached
+# next to the video as <name>_peaks.bin:
+#
+#   header   magic, sample rate, bucket samples, level count, source size and mtime
+#   counts   int64 bucket count per level
+#   levels   int8 (min, max) pairs per bucket, level 0 first
+#
+# The cache is memory-mapped on load and ignored once the video changes.
+
+SAMPLE_RATE = 16000
+BUCKET_SAMPLES = 64  # 4 ms per level-0 bucket at 16 kHz
+MAGIC = b'SUBPEAK\x01'
+HEADER = struct.Struct('<8sIIIQd')
+
+def peaks_path(video_path):
+    return os.path.splitext(video_path)[0] + "_peaks.bin"
+
+def to_int8(samples):
+    import numpy as np
+
+    return np.clip(np.round(samples * 127), -127, 127).astype(np.int8)
+
+def bucket_peaks(blocks, bucket_samples=BUCKET_SAMPLES):
+    """
+    Level-0 peaks from float32 audio blocks in -1..1: an (n, 2) int8 array of
+    (min, max) per bucket. Blocks may have any length; only one is held at a time.
+    """
+    import numpy as np
+
+    parts = []
+    carry = np.zeros(0, np.float32)
+    for block in blocks:
+        if len(carry):
+            block = np.concatenate((carry, block))
+        whole = len(block) - len(block) % bucket_samples
+        buckets = block[:whole].reshape(-1, bucket_samples)
+        if len(buckets):
+            parts.append(np.stack((to_int8(buckets.min(axis=1)), to_int8(buckets.max(axis=1))), axis=1))
+        carry = block[whole:]
+    if len(carry):
+        parts.append(np.array([[to_int8(carry.min()), to_int8(carry.max())]], np.int8))
+    return np.concatenate(parts) if parts else np.zeros((0, 2), np.int8)
+
+def build_pyramid(level0):
+    """Halve level0 repeatedly down to a single bucket, keeping each level's min and max."""
+    import numpy as np
+
+    levels = [level0]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        if len(level) % 2:
+            level = np.concatenate((level, level[-1:]))
+        pairs = level.reshape(-1, 2, 2)
+        levels.append(np.stack((pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)), axis=1))
+    return levels
+
+def source_stamp(video_path):
+    stat = os.stat(video_path)
+    return stat.st_size, stat.st_mtime
+
+class PeakPyramid:
+    """Min/max peak levels, with lookups by time range for drawing."""
+    def __init__(self, levels, sample_rate=SAMPLE_RATE, bucket_samples=BUCKET_SAMPLES):
+        self.levels = levels
+        self.sample_rate = sample_rate
+        self.bucket_samples = bucket_samples
+
+    def bucket_ms(self, level):
+        return self.bucket_samples * (1 << level) * 1000 / self.sample_rate
+
+    @property
+    def duration_ms(self):
+        return len(self.levels[0]) * self.bucket_ms(0) if self.levels else 0
+
+    def peaks(self, start_ms, end_ms, width):
+        """
+        (mins, maxs) for width pixel columns covering start_ms..end_ms, as int8
+        arrays scaled to -127..127. Columns outside the audio are zero.
+        """
+        import numpy as np
+
+        mins = np.zeros(width, np.int8)
+        maxs = np.zeros(width, np.int8)
+        if not self.levels or width <= 0 or end_ms <= start_ms:
+            return mins, maxs
+
+        # The coarsest level that still has at least one bucket per pixel
+        ms_per_pixel = (end_ms - start_ms) / width
+        level = 0
+        while level + 1 < len(self.levels) and self.bucket_ms(level + 1) <= ms_per_pixel:
+            level += 1
+        buckets = self.levels[level]
+        bucket_ms = self.bucket_ms(level)
+
+        # Bucket range for every column; reduceat takes the min/max within each
+        edges = (start_ms + np.arange(width + 1) * ms_per_pixel) / bucket_ms
+        edges = np.floor(edges).astype(np.int64)
+        columns = (edges[:-1] >= 0) & (edges[:-1] < len(buckets))
+        if not columns.any():
+            return mins, maxs
+        first = edges[:-1][columns]
+        # Bound the last column too, unless it runs to the end of the audio
+        last = edges[1:][columns][-1]
+        if last < len(buckets):
+            first = np.append(first, last)
+        # Every column covers at least one bucket, even when zoomed past level 0
+        count = columns.sum()
+        mins[columns] = np.minimum.reduceat(buckets[:, 0], first)[:count]
+        maxs[columns] = np.maximum.reduceat(buckets[:, 1], first)[:count]
+        return mins, maxs
+
+def save_peaks(file_path, pyramid, stamp):
+    import numpy as np
+
+    size, mtime = stamp
+    with open(file_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, pyramid.sample_rate, pyramid.bucket_samples, len(pyramid.levels), size, mtime))
+        file.write(np.array([len(level) for level in pyramid.levels], '<i8').tobytes())
+        for level in pyramid.levels:
+            file.write(np.ascontiguousarray(level, np.int8).tobytes())
+
+def load_peaks(file_path, stamp=None):
+    """Map a peaks cache; None if it is missing, damaged or made from another version of the video."""
+    import numpy as np
+
+    if not os.path.exists(file_path) or os.path.getsize(file_path) < HEADER.size:
+        return None
+    with open(file_path, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, sample_rate, bucket_samples, level_count, size, mtime = HEADER.unpack_from(data)
+    if magic != MAGIC or (stamp is not None and (size, mtime) != tuple(stamp)):
+        return None
+
+    counts = np.frombuffer(data, '<i8', count=level_count, offset=HEADER.size)
+    offset = HEADER.size + level_count * 8
+    if offset + int(counts.sum()) * 2 > len(data):
+        return None
+    levels = []
+    for count in counts.tolist():
+        levels.append(np.frombuffer(data, np.int8, count=count * 2, offset=offset).reshape(count, 2))
+        offset += count * 2
+    return PeakPyramid(levels, sample_rate, bucket_samples)
+
+def peaks_for_video(video_path):
+    """Load the cached peak pyramid for a video, computing and caching it first if needed."""
+    stamp = source_stamp(video_path)
+    cache_path = peaks_path(video_path)
+    pyramid = load_peaks(cache_path, stamp)
+    if pyramid is None:
+        from gen_subs import stream_audio
+        pyramid = PeakPyramid(build_pyramid(bucket_peaks(stream_audio(video_path))))
+        temp_path = cache_path + ".tmp"
+        save_peaks(temp_path, pyramid, stamp)
+        os.replace(temp_path, cache_path)
+    return pyramid